@@ -3,3 +3,12 @@ from .local_search import local_search
 from .random_walk import random_walk
 from . import simulated_annealing
 from . import ant_colony_optimization
+from .anytime import solve_iter
+from .decomposition import decomposition
+from .lin_kernighan import lin_kernighan
+from .batch import SolverPool, solve_batch, solve
+from .cache import SolutionCache
+from .dynamic import update_route
+from .genetic import genetic
+from .exact import held_karp, held_karp_path, exact_or_heuristic, optimize_windows
+from .portfolio import race, PORTFOLIO
@@ -1,16 +1,50 @@
 import numpy as np
-from utils import get_distance_matrix
+from utils import get_distance_matrix, Budget, count, timer, record, sample_route, summarize, watch_target_gap
+from .parallel import AntPool
 
 
-def ant_colony_optimization(scenario, discount_factor=9/10, beta=1):
+def ant_colony_optimization(scenario, discount_factor=9/10, beta=1, neighbors=None, batched=True, num_workers=1, seed=None,
+                            dtype=np.float64, budget=None, callback=None, stats=None, target_gap=None):
     # https://en.wikipedia.org/wiki/Ant_colony_optimization_algorithms
 
     # discount_factor: the ratio in which new pheromones replace
     # old ones in each time step.
     # beta: the amount of importance the length of an edge has over the ant's decisions.
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), when given the ants choose
+    # between the unvisited candidates and only fall back to all nodes once none is left.
+    # batched: advance all the ants together, one step of the whole colony at a time (see release_ants_batched)
+    # instead of walking them one by one.
+    # num_workers: split the colony across this many processes (see parallel.AntPool), the ants are batched
+    # seed: seeds the ants of the worker processes, so parallel runs are reproducible
+    # dtype: the type of the distance and pheromone matrices, float32 halves their memory
+    # budget: a utils.Budget to stop by before the pheromones converge, an iteration is one release of the colony
+    # callback: called with the shortest route of the colony's ants after every iteration
+    # stats: a dict or a utils.Stats (see local_search) to count the 'pheromone_iterations' in, a Stats also
+    # times the phases of each iteration and keeps the 'convergence_scores'
+    # target_gap: stop once the colony's shortest route is within this share of a lower bound on its length,
+    # see local_search
+
+    budget = budget or Budget()
+    if target_gap is not None:
+        budget, callback = watch_target_gap(scenario, target_gap, budget, callback, neighbors, stats)
+
+    if num_workers > 1:
+        with AntPool(scenario.shape[0], num_workers, neighbors, seed, dtype) as pool:
+            return run_colony(scenario, discount_factor, beta, pool=pool, dtype=dtype, budget=budget, callback=callback,
+                              stats=stats)
+    return run_colony(scenario, discount_factor, beta, neighbors, batched, dtype=dtype, budget=budget, callback=callback,
+                      stats=stats)
+
+
+def run_colony(scenario, discount_factor, beta, neighbors=None, batched=True, pool=None, dtype=np.float64, budget=None,
+               callback=None, stats=None):
+    # the iterations of ant_colony_optimization, with the ants released by the pool if one is given
+    budget = budget or Budget()
 
     # a matrix holding the distance between each two nodes
-    edge_lengths = get_distance_matrix(scenario)
+    edge_lengths = get_distance_matrix(scenario, dtype)
+    if pool is not None:
+        pool.set_edge_lengths(edge_lengths)
 
     # pheromone amount in each edge
     pheromones = get_initial_pheromones(edge_lengths)
@@ -18,22 +52,54 @@ def ant_colony_optimization(scenario, discount_factor=9/10, beta=1):
     # variables to keep track of the pheromone convergence
     no_convergence_counter, best_convergence_score = test_convergence(pheromones, 0, 0)
 
-    while not did_fully_converge(pheromones) and no_convergence_counter < 10:
+    while no_convergence_counter < 10 and not budget.exhausted():
+        with timer(stats, 'convergence'):
+            if did_fully_converge(pheromones):
+                break
+        budget.spend()
+        count(stats, 'pheromone_iterations')
         # let the ants go wild and release pheromones
-        ant_routes = release_ants(pheromones, edge_lengths, num_ants=scenario.shape[0], beta=beta)
-        pheromone_update_matrix = calculate_produced_pheromones(ant_routes, edge_lengths)
+        with timer(stats, 'release_ants'):
+            if pool is not None:
+                ant_routes, route_lengths = pool.release_ants(pheromones, beta)
+            else:
+                release = release_ants_batched if batched else release_ants
+                ant_routes = release(pheromones, edge_lengths, num_ants=scenario.shape[0], beta=beta, neighbors=neighbors)
+                route_lengths = None
+
+        if callback is not None or stats is not None:
+            shortest_route = get_shortest_route(ant_routes, edge_lengths, route_lengths)
+            sample_route(stats, shortest_route, distance_matrix=edge_lengths)
+            if callback is not None:
+                callback(shortest_route)
+
+        with timer(stats, 'pheromone_update'):
+            pheromone_update_matrix = calculate_produced_pheromones(ant_routes, edge_lengths, route_lengths)
+
+            # normalize the old and new pheromones according to the discount factor
+            pheromones *= discount_factor
+            pheromone_update_matrix /= (pheromone_update_matrix.sum() / (scenario.shape[0] * (1 - discount_factor)))
+
+            # merge old pheromones with new pheromones
+            pheromones += pheromone_update_matrix
 
-        # normalize the old and new pheromones according to the discount factor
-        pheromones *= discount_factor
-        pheromone_update_matrix /= (pheromone_update_matrix.sum() / (scenario.shape[0] * (1 - discount_factor)))
+        # check convergence
+        with timer(stats, 'convergence'):
+            no_convergence_counter, best_convergence_score = test_convergence(pheromones, no_convergence_counter,
+                                                                              best_convergence_score)
+        record(stats, 'convergence_scores', float(best_convergence_score))
 
-        # merge old pheromones with new pheromones
-        pheromones += pheromone_update_matrix
+    route = pheromones_to_route(pheromones)
+    summarize(stats, 'ant_colony_optimization', budget.start_time)
+    return route
 
-        # check convergence
-        no_convergence_counter, best_convergence_score = test_convergence(pheromones, no_convergence_counter, best_convergence_score)
 
-    return pheromones_to_route(pheromones)
+def get_shortest_route(ant_routes, edge_lengths, route_lengths=None):
+    # the shortest of the ants' routes, route_lengths: their lengths if they're already known
+    ant_routes = np.asarray(ant_routes)
+    if route_lengths is None:
+        route_lengths = edge_lengths[ant_routes, np.roll(ant_routes, 1, axis=1)].sum(axis=1)
+    return ant_routes[np.argmin(route_lengths)]
 
 
 def pheromones_to_route(pheromones):
@@ -69,41 +135,121 @@ def get_initial_pheromones(edge_lengths):
     return pheromones
 
 
-def release_ants(pheromones, edge_lengths, num_ants, beta):
+def release_ants(pheromones, edge_lengths, num_ants, beta, neighbors=None):
     # let n ants walk and produce routes
-    return [produce_ant_route(pheromones, edge_lengths, beta) for _ in range(num_ants)]
+    return [produce_ant_route(pheromones, edge_lengths, beta, neighbors) for _ in range(num_ants)]
+
+
+def release_ants_batched(pheromones, edge_lengths, num_ants, beta, neighbors=None):
+    # let n ants walk and produce routes, all at once. returns an array shaped (num_ants, num_nodes)
+    # every step gathers the attraction of each ant's current node to all others, masks out the visited
+    # ones and samples the next node of all the ants with a single search over the cumulative sums
+    return walk_ants(get_transition_weights(pheromones, edge_lengths, beta), num_ants, neighbors)
+
+
+def walk_ants(weights, num_ants, neighbors=None):
+    # the walk of release_ants_batched given the ants' transition weights (see get_transition_weights)
+    num_nodes = weights.shape[0]
+    ants = np.arange(num_ants)
+
+    candidate_weights = None
+    if neighbors is not None:
+        candidate_weights = np.zeros_like(weights)
+        candidate_weights[np.arange(num_nodes)[:, None], neighbors] = weights[np.arange(num_nodes)[:, None], neighbors]
+
+    routes = np.empty((num_ants, num_nodes), dtype=np.int32)
+    routes[:, 0] = np.random.randint(num_nodes, size=num_ants)
+    visited = np.zeros((num_ants, num_nodes), dtype=bool)
+    visited[ants, routes[:, 0]] = True
+
+    for step in range(1, num_nodes):
+        current_nodes = routes[:, step - 1]
+        step_weights = (weights if candidate_weights is None else candidate_weights)[current_nodes]
+        step_weights[visited] = 0
+
+        # ants that visited all of their candidates fall back to all nodes
+        if candidate_weights is not None:
+            stuck = ~(step_weights.sum(axis=1) > 0)
+            if stuck.any():
+                step_weights[stuck] = weights[current_nodes[stuck]] * ~visited[stuck]
+
+        # when nothing is left to attract an ant (e.g. underflowing pheromones) it picks any unvisited node
+        empty = ~(step_weights.sum(axis=1) > 0)
+        step_weights[empty] = ~visited[empty]
+
+        routes[:, step] = sample_rows(step_weights)
+        visited[ants, routes[:, step]] = True
 
+    return routes
 
-def produce_ant_route(pheromones, edge_lengths, beta):
+
+def get_transition_weights(pheromones, edge_lengths, beta):
+    # how attractive is each edge for the ants, the pheromones divided by the edge lengths.
+    # unlike the pheromones it's symmetric, so an ant's options are a single row of it
+    symmetric_pheromones = pheromones + pheromones.T
+    np.fill_diagonal(symmetric_pheromones, 0)
+
+    # nodes sharing a location are as attractive as the closest distinct ones can get
+    symmetric_lengths = np.maximum(edge_lengths, edge_lengths.T)
+    shortest = np.finfo(float).eps * max(symmetric_lengths.max(), 1)
+    return symmetric_pheromones / np.maximum(symmetric_lengths, shortest) ** beta
+
+
+def sample_rows(weights):
+    # pick a column of each row with probability relative to its weight, for all rows at once: a random
+    # point within each row's total weight picks the first column whose cumulative weight is beyond it.
+    # the sums are float64 even for float32 weights, so many tiny weights don't lose the resolution of the
+    # draws, and a zero weight column (whose cumulative weight equals the one before it) is never picked
+    cumulative = np.cumsum(weights, axis=1, dtype=np.float64)
+    targets = np.random.random(len(weights)) * cumulative[:, -1]
+    columns = np.count_nonzero(cumulative <= targets[:, None], axis=1)
+    # a draw rounded up to the row's total takes its last column with a weight
+    last_columns = weights.shape[1] - 1 - np.argmax(weights[:, ::-1] > 0, axis=1)
+    return np.minimum(columns, last_columns)
+
+
+def produce_ant_route(pheromones, edge_lengths, beta, neighbors=None):
     route = [np.random.randint(pheromones.shape[0])]
+    visited = np.zeros(pheromones.shape[0], dtype=bool)
+    visited[route[0]] = True
 
     for _ in range(pheromones.shape[0] - 1):
-        next_node = get_next_node(pheromones, edge_lengths, route, beta)
+        next_node = get_next_node(pheromones, edge_lengths, route, beta, neighbors, visited)
         route.append(next_node)
+        visited[next_node] = True
 
     return route
 
 
-def calculate_produced_pheromones(ant_routes, edge_lengths):
+def calculate_produced_pheromones(ant_routes, edge_lengths, route_lengths=None):
+    # route_lengths: the length of each of the routes if it's already known
+
     # array to hold the new pheromones
-    produced_pheromones = np.zeros(edge_lengths.shape)
+    produced_pheromones = np.zeros(edge_lengths.shape, dtype=np.result_type(edge_lengths.dtype, np.float32))
+    ant_routes = np.asarray(ant_routes)
+    next_nodes = np.roll(ant_routes, 1, axis=1)
     # the length of each route taken by an ant
-    route_lengths = edge_lengths[ant_routes, np.roll(ant_routes, 1, axis=1)].sum(axis=1)
-    # for each route, add pheromones to the its edges.
-    # the longer the route, the less pheromones each edge gets
-    for ant_route, route_length in zip(ant_routes, route_lengths):
-        produced_pheromones[ant_route, np.roll(ant_route, 1)] += 1 / route_length
-
-    # since the array is a mirror of it self on the diagonal, add the lower left pheromones
-    # to the upper right, and then zero-out the lower left
-    right_triangle_indices = np.triu_indices(edge_lengths.shape[0], 1)
-    produced_pheromones[right_triangle_indices] += produced_pheromones.T[right_triangle_indices]
-    produced_pheromones.T[right_triangle_indices] = 0
+    if route_lengths is None:
+        route_lengths = edge_lengths[ant_routes, next_nodes].sum(axis=1)
+
+    # add pheromones to the edges of all the routes in one go, the longer the route the less
+    # pheromones each edge gets. since the array is a mirror of itself on the diagonal,
+    # every edge goes to the upper right triangle
+    np.add.at(
+        produced_pheromones,
+        (np.minimum(ant_routes, next_nodes).ravel(), np.maximum(ant_routes, next_nodes).ravel()),
+        np.repeat(1 / route_lengths, ant_routes.shape[1])
+    )
 
     return produced_pheromones
 
 
-def get_next_node(pheromones, edge_lengths, route, beta):
+def get_next_node(pheromones, edge_lengths, route, beta, neighbors=None, visited=None):
+    if neighbors is not None:
+        next_node = get_next_candidate_node(pheromones, edge_lengths, route[-1], beta, neighbors, visited)
+        if next_node is not None:
+            return next_node
+
     # gather all edge data of current node
     edge_pheromones = get_node_edges(pheromones, route[-1])
     edge_lengths = get_node_edges(edge_lengths, route[-1])
@@ -115,6 +261,21 @@ def get_next_node(pheromones, edge_lengths, route, beta):
     return np.random.choice(pheromones.shape[0], 1, p=probability_vector)[0]
 
 
+def get_next_candidate_node(pheromones, edge_lengths, current_node, beta, neighbors, visited):
+    # choose the next node out of the unvisited candidate neighbors of the current one,
+    # None if there are none to choose from
+    candidates = neighbors[current_node]
+    candidates = candidates[~visited[candidates]]
+
+    # the pheromone matrix only holds its upper right triangle, both matrices are read there
+    low, high = np.minimum(current_node, candidates), np.maximum(current_node, candidates)
+    weights = pheromones[low, high] / edge_lengths[low, high] ** beta
+
+    if candidates.size == 0 or not weights.sum() > 0:
+        return None
+    return int(np.random.choice(candidates, p=weights / weights.sum()))
+
+
 def generate_ant_probability_vector(pheromone_vec, length_vec, route, beta):
     # generate a probability vector for the ant to choose its next edge to walk.
     # ants are more likely to choose shorter edges with more pheromones
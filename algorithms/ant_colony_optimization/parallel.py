@@ -0,0 +1,87 @@
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from . import ant_colony_optimization as colony
+
+# views of the shared matrices inside a worker process, set by attach_worker
+worker_state = {}
+
+
+class AntPool:
+    # a process pool that releases the ants of a colony in parallel, split evenly between the workers.
+    # the transition weights and the edge lengths live in shared memory, written once by the main
+    # process and read by all the workers, so only the routes and their lengths travel between them.
+    # use as a context manager, the processes and the shared memory are released on exit.
+
+    # num_nodes: size of the scenario
+    # num_workers: amount of worker processes
+    # neighbors: candidate neighbor lists for the ants (see colony.release_ants_batched)
+    # seed: base seed of the workers, each one seeds by (seed, iteration, worker) so the routes don't
+    # depend on the scheduling of the tasks
+    # dtype: the type of the shared matrices, float32 halves their memory
+
+    def __init__(self, num_nodes, num_workers, neighbors=None, seed=None, dtype=np.float64):
+        self.num_nodes = num_nodes
+        self.num_workers = num_workers
+        self.seed = np.random.randint(2 ** 31) if seed is None else seed
+        self.iteration = 0
+
+        matrix_bytes = num_nodes * num_nodes * np.dtype(dtype).itemsize
+        self.memory = [SharedMemory(create=True, size=max(matrix_bytes, 1)) for _ in range(2)]
+        self.weights, self.edge_lengths = [
+            np.ndarray((num_nodes, num_nodes), dtype=dtype, buffer=memory.buf) for memory in self.memory
+        ]
+
+        self.pool = Pool(num_workers, initializer=attach_worker,
+                         initargs=([memory.name for memory in self.memory], num_nodes, neighbors, dtype))
+
+    def set_edge_lengths(self, edge_lengths):
+        self.edge_lengths[:] = edge_lengths
+
+    def release_ants(self, pheromones, beta, num_ants=None):
+        # let the ants walk, num_ants defaults to one per node like the serial colony.
+        # returns the routes and their lengths
+        self.weights[:] = colony.get_transition_weights(pheromones, self.edge_lengths, beta)
+
+        num_ants = self.num_nodes if num_ants is None else num_ants
+        ants_per_worker = np.diff(np.linspace(0, num_ants, self.num_workers + 1).astype(int))
+        tasks = [(self.seed, self.iteration, worker, int(worker_ants))
+                 for worker, worker_ants in enumerate(ants_per_worker) if worker_ants > 0]
+        self.iteration += 1
+
+        results = self.pool.map(release_worker_ants, tasks)
+        return np.concatenate([routes for routes, _ in results]), np.concatenate([lengths for _, lengths in results])
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        # the views have to go before the memory they point to can be closed
+        del self.weights, self.edge_lengths
+        for memory in self.memory:
+            memory.close()
+            memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_worker(memory_names, num_nodes, neighbors, dtype):
+    # runs once in every worker, maps the shared matrices
+    memory = [SharedMemory(name=name) for name in memory_names]
+    worker_state['memory'] = memory
+    worker_state['weights'], worker_state['edge_lengths'] = [
+        np.ndarray((num_nodes, num_nodes), dtype=dtype, buffer=block.buf) for block in memory
+    ]
+    worker_state['neighbors'] = neighbors
+
+
+def release_worker_ants(task):
+    seed, iteration, worker, num_ants = task
+    np.random.seed(np.random.SeedSequence([seed, iteration, worker]).generate_state(1))
+
+    routes = colony.walk_ants(worker_state['weights'], num_ants, worker_state['neighbors'])
+    route_lengths = worker_state['edge_lengths'][routes, np.roll(routes, 1, axis=1)].sum(axis=1)
+    return routes, route_lengths
@@ -1,5 +1,7 @@
 import numpy as np
-from .ant_colony_optimization import calculate_produced_pheromones, did_fully_converge, produce_ant_route
+from .parallel import AntPool
+from .ant_colony_optimization import calculate_produced_pheromones, did_fully_converge, produce_ant_route, release_ants_batched, \
+    sample_rows
 
 
 def test_calculate_produced_pheromones():
@@ -60,5 +62,57 @@ def test_produce_ant_route():
 
     ant_route = produce_ant_route(pheromones, edge_lengths, 1)
 
-    assert(len(ant_route) is 4 and np.all(np.in1d([0, 1, 2, 3], ant_route)))
+    assert(len(ant_route) == 4 and np.all(np.isin([0, 1, 2, 3], ant_route)))
 
+
+
+def test_release_ants_batched():
+    # every ant of the colony walks a legit route, with and without candidate neighbors
+    pheromones = np.triu(np.random.random((6, 6)), 1)
+    edge_lengths = np.triu(np.random.random((6, 6)), 1)
+    edge_lengths += edge_lengths.T
+
+    for neighbors in [None, np.array([[1], [2], [3], [4], [5], [0]])]:
+        ant_routes = release_ants_batched(pheromones, edge_lengths, 10, 1, neighbors)
+        assert(ant_routes.shape == (10, 6) and np.all(np.sort(ant_routes, axis=1) == np.arange(6)))
+
+
+def test_sample_rows():
+    # columns are picked by their weight, zero weights are never picked
+    weights = np.array([[0.0, 1.0, 0.0, 3.0],
+                        [2.0, 0.0, 0.0, 0.0]])
+    samples = np.array([sample_rows(weights) for _ in range(2000)])
+
+    assert(np.all(samples[:, 1] == 0) and np.all(np.isin(samples[:, 0], [1, 3])))
+    assert(0.7 < np.mean(samples[:, 0] == 3) < 0.8)
+
+    # a float32 row of many tiny weights keeps the draws unbiased, and its zero weights are never picked
+    weights = np.full((500, 5000), 1e-8, dtype=np.float32)
+    weights[:, ::2] = 0
+    samples = sample_rows(weights)
+    assert(np.all(samples % 2 == 1) and 0.45 < np.mean(samples < 2500) < 0.55)
+
+
+def test_ant_pool():
+    # the ants released in parallel walk legit routes of the right length, reproducibly for a seed
+    scenario = np.random.random((8, 2))
+    edge_lengths = np.linalg.norm(scenario - scenario[:, None], axis=2)
+    pheromones = np.triu(np.ones((8, 8)), 1)
+
+    results = []
+    for _ in range(2):
+        with AntPool(8, 2, seed=5) as pool:
+            pool.set_edge_lengths(edge_lengths)
+            results.append(pool.release_ants(pheromones, 1))
+
+    (routes, lengths), (other_routes, _) = results
+    assert(routes.shape == (8, 8) and np.all(np.sort(routes, axis=1) == np.arange(8)))
+    assert(np.allclose(lengths, edge_lengths[routes, np.roll(routes, 1, axis=1)].sum(axis=1)))
+    assert(np.array_equal(routes, other_routes))
+
+    # the shared matrices are kept in the colony's dtype, in the workers too
+    with AntPool(8, 2, seed=5, dtype=np.float32) as pool:
+        pool.set_edge_lengths(edge_lengths)
+        routes, lengths = pool.release_ants(pheromones, 1)
+        assert(pool.weights.dtype == pool.edge_lengths.dtype == np.float32 and lengths.dtype == np.float32)
+        assert(pool.memory[0].size < 8 * 8 * 8)
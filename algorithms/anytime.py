@@ -0,0 +1,79 @@
+import queue
+import inspect
+import threading
+import numpy as np
+from utils import calculate_journey_distance, Budget
+from .local_search import local_search
+
+
+def solve_iter(scenario, algorithm=local_search, time_limit=None, deadline=np.inf, max_iterations=np.inf,
+               cancel_token=None, report_interval=10, **kwargs):
+    # run a solver in the background and yield (elapsed, route_length, route) every time it reaches a route
+    # shorter than all the ones yielded before, so the caller can take the best route so far at any moment.
+    # elapsed is the milliseconds from the start until the route was reached, route is an array of node indices.
+    # stops once the budget runs out or the solver finishes, closing the generator early cancels the solver
+
+    # algorithm: any of the solvers taking a budget and a callback, such as local_search,
+    # simulated_annealing.basic / advanced or ant_colony_optimization
+    # time_limit, deadline, max_iterations, cancel_token: when to stop, see utils.Budget. they replace the
+    # solver's own time limit, which is kept when none of time_limit, deadline and max_iterations is given
+    # (a solver with a schedule over its budget, such as the annealing's temperature, follows it only with a limit)
+    # report_interval: the least amount of milliseconds between two routes taken from the solver, since
+    # measuring a route costs about as much as a move. the solver's final route is always taken
+    # kwargs: passed on to the solver
+
+    if time_limit is None:
+        own_limit = inspect.signature(algorithm).parameters.get('time_limit')
+        time_limit = np.inf
+        if deadline == np.inf and max_iterations == np.inf and own_limit is not None and \
+                isinstance(own_limit.default, (int, float)):
+            time_limit = own_limit.default
+
+    routes = queue.Queue()
+    stop = threading.Event()
+    budget = Budget(time_limit, deadline, max_iterations, stop)
+    last_report = [-np.inf]
+
+    def report(route):
+        # keep a copy of the current route of the solver, the solver keeps changing the original
+        elapsed = budget.elapsed()
+        if elapsed - last_report[0] >= report_interval:
+            last_report[0] = elapsed
+            routes.put((elapsed, np.array(route)))
+
+    def run():
+        try:
+            route = algorithm(scenario, budget=budget, callback=report, **kwargs)
+            routes.put((budget.elapsed(), np.array(route)))
+        except BaseException as error:
+            routes.put(error)
+        finally:
+            routes.put(None)
+
+    solver = threading.Thread(target=run, daemon=True)
+    solver.start()
+    best_length = np.inf
+
+    try:
+        while True:
+            # the solver only sees the internal token, a cancel token of the caller is passed on to it
+            if cancel_token is not None and cancel_token.is_set():
+                stop.set()
+            try:
+                item = routes.get(timeout=report_interval / 1000)
+            except queue.Empty:
+                continue
+
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            elapsed, route = item
+            route_length = calculate_journey_distance(scenario[route])
+            if route_length < best_length:
+                best_length = route_length
+                yield elapsed, route_length, route
+    finally:
+        stop.set()
+        solver.join()
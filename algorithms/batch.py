@@ -0,0 +1,169 @@
+import atexit
+import asyncio
+import os
+import random
+import threading
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from utils import calculate_journey_distance, generate_scenario, time_stamp
+from .local_search import local_search
+
+# the worker's view of the batch buffer, set by solve_chunk
+worker_state = {}
+
+
+class SolverPool:
+    # a persistent process pool for solving many small scenarios. the workers are started and warmed up once
+    # (imports done, every code path of a first solve run). a batch of scenarios is stacked into one array in
+    # shared memory, which is kept and only grown between batches, so the workers map it once and each task
+    # is just the bounds of its scenarios in it. use as a context manager, the processes and the shared
+    # memory are released on exit.
+
+    # num_workers: amount of worker processes, one per cpu when not given
+    # capacity: the amount of coordinates the shared buffer holds at first
+
+    def __init__(self, num_workers=None, capacity=2 ** 16):
+        self.num_workers = num_workers or os.cpu_count()
+        # the buffer comes first, so the workers share the main process's resource tracker instead of starting
+        # their own, which would unlink the buffer once they exit
+        self.memory = None
+        self.reserve(capacity)
+        self.pool = Pool(self.num_workers, initializer=warm_worker)
+        # a batch owns the buffer until its results are back
+        self.lock = threading.Lock()
+
+    def reserve(self, capacity):
+        # make sure the buffer holds at least capacity coordinates, at least doubling it when it grows
+        size = capacity * np.dtype(np.float64).itemsize
+        if self.memory is not None:
+            if self.memory.size >= size:
+                return
+            size = max(size, 2 * self.memory.size)
+            self.release()
+        self.memory = SharedMemory(create=True, size=max(size, 1))
+
+    def release(self):
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+    def solve_batch(self, scenarios, algorithm=local_search, seed=None, chunksize=None, **params):
+        # solve every scenario with algorithm(scenario, **params). returns a (route, length, milliseconds)
+        # tuple per scenario, in order, the milliseconds being the solve's own time in its worker
+
+        # scenarios: a list of scenarios with the same amount of dimensions, or one (num_scenarios, num_nodes,
+        # dimensions) array of equally sized ones
+        # algorithm: any solver function, it's sent to the workers by name
+        # seed: seeds the solve of each scenario by (seed, index), so a batch is reproducible
+        # chunksize: scenarios per task, about four tasks per worker when not given
+        if len(scenarios) == 0:
+            return []
+        sizes = np.array([len(scenario) for scenario in scenarios])
+        dimensions = scenarios[0].shape[-1]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        seed = np.random.randint(2 ** 31) if seed is None else seed
+        chunksize = chunksize or max(1, len(scenarios) // (4 * self.num_workers))
+
+        with self.lock:
+            self.reserve(offsets[-1] * dimensions)
+            stacked = np.ndarray((offsets[-1], dimensions), dtype=np.float64, buffer=self.memory.buf)
+            if isinstance(scenarios, np.ndarray):
+                stacked[:] = scenarios.reshape(-1, dimensions)
+            else:
+                np.concatenate(scenarios, out=stacked)
+            del stacked
+
+            tasks = [(self.memory.name, offsets[-1], dimensions,
+                      [(index, offsets[index], offsets[index + 1]) for index in range(start, min(start + chunksize, len(scenarios)))],
+                      algorithm, params, seed)
+                     for start in range(0, len(scenarios), chunksize)]
+            return [result for results in self.pool.map(solve_chunk, tasks) for result in results]
+
+    async def solve(self, scenario, algorithm=local_search, seed=None, **params):
+        # solve a single scenario in a worker without blocking the event loop, returns a
+        # (route, length, milliseconds) tuple like solve_batch. the scenario is pickled, which is
+        # cheap for a single small one
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        seed = np.random.randint(2 ** 31) if seed is None else seed
+        self.pool.apply_async(solve_scenario, (np.asarray(scenario, dtype=np.float64), algorithm, params, [seed]),
+                              callback=lambda result: loop.call_soon_threadsafe(set_result, future, result),
+                              error_callback=lambda error: loop.call_soon_threadsafe(set_exception, future, error))
+        return await future
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        if self.memory is not None:
+            self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def set_result(future, result):
+    # the solve may have been cancelled while it ran
+    if not future.done():
+        future.set_result(result)
+
+
+def set_exception(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+
+default_pool = []
+
+
+def get_default_pool():
+    # a SolverPool shared by every solve_batch and solve called without a pool, started on the first call
+    # and closed when the interpreter exits
+    if not default_pool:
+        default_pool.append(SolverPool())
+        atexit.register(default_pool[0].close)
+    return default_pool[0]
+
+
+def solve_batch(scenarios, algorithm=local_search, pool=None, **params):
+    # see SolverPool.solve_batch, on the default pool unless given one
+    return (pool or get_default_pool()).solve_batch(scenarios, algorithm, **params)
+
+
+async def solve(scenario, algorithm=local_search, pool=None, **params):
+    # see SolverPool.solve, on the default pool unless given one
+    return await (pool or get_default_pool()).solve(scenario, algorithm, **params)
+
+
+def warm_worker():
+    # runs once in every worker, a first solve loads the rest of the modules and fills the caches
+    local_search(generate_scenario(20), use_queue=True)
+
+
+def solve_chunk(task):
+    # solve the scenarios of a task from the shared buffer, mapping it only when it's a new one
+    name, num_coordinates, dimensions, items, algorithm, params, seed = task
+    if worker_state.get('name') != name:
+        if 'memory' in worker_state:
+            del worker_state['stacked']
+            worker_state['memory'].close()
+        worker_state['memory'] = SharedMemory(name=name)
+        worker_state['name'] = name
+    worker_state['stacked'] = np.ndarray((num_coordinates, dimensions), dtype=np.float64, buffer=worker_state['memory'].buf)
+
+    return [solve_scenario(worker_state['stacked'][start: end], algorithm, params, [seed, index])
+            for index, start, end in items]
+
+
+def solve_scenario(scenario, algorithm, params, entropy):
+    # some solvers draw from python's random module (see random_walk), both are seeded
+    state = np.random.SeedSequence(entropy).generate_state(1)
+    np.random.seed(state)
+    random.seed(int(state[0]))
+    start = time_stamp()
+    route = algorithm(scenario, **params)
+    milliseconds = time_stamp() - start
+    return route, calculate_journey_distance(scenario[route]), milliseconds
@@ -0,0 +1,237 @@
+import os
+import glob
+import hashlib
+import inspect
+import tempfile
+import numpy as np
+from collections import OrderedDict
+from utils import count
+from .local_search import local_search
+from .dynamic import insert_nodes
+
+# parameters left out of the cache keys, they don't change which route a solver returns
+UNKEYED_PARAMS = ('budget', 'callback', 'stats')
+# parameters built from the scenario itself, which is keyed already (and differs on a near hit), they are keyed
+# by what else changes the routes: the width of the neighbor lists and the kind of distances (see get_oracle_key)
+SCENARIO_PARAMS = ('neighbors', 'distance_matrix')
+
+
+class SolutionCache:
+    # remembers the routes solvers returned, keyed by a hash of the scenario's coordinates, the solver and its
+    # parameters. recent routes are kept in memory (least recently used first out), every route is also written
+    # to a directory, whose oldest files are deleted once it grows past a size. an exact hit returns the
+    # cached route without solving. a near hit, the same solver and parameters on the same points with a few
+    # added or removed, starts solvers that take an initial_route (such as local_search or
+    # simulated_annealing.advanced) from the cached route, the removed nodes dropped from it and the added ones
+    # inserted where they lengthen it the least
+
+    # directory: where the routes are stored on disk, a new temporary directory when not given
+    # memory_size: the amount of routes kept in memory
+    # disk_size: bytes the directory may take before its least recently used files are deleted
+    # max_change: the share of nodes that may be added and removed together for a near hit, 0 turns them off
+
+    def __init__(self, directory=None, memory_size=256, disk_size=2 ** 30, max_change=0.1):
+        self.directory = directory or tempfile.mkdtemp(prefix='solutions-')
+        os.makedirs(self.directory, exist_ok=True)
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.max_change = max_change
+        # key: (solver key, scenario, route)
+        self.memory = OrderedDict()
+        # key: (solver key, number of nodes) of every route on disk, from the file names, so near hits are
+        # looked for without opening the files. routes other processes write later are only exact hits
+        self.index = {}
+        for path in glob.glob(os.path.join(self.directory, '*.npz')):
+            solver_key, num_nodes, key = os.path.basename(path)[:-len('.npz')].split('-')
+            self.index[key] = (solver_key, int(num_nodes))
+
+    def solve(self, scenario, algorithm=local_search, stats=None, **params):
+        # the route of algorithm(scenario, **params), from the cache when it's there. counts 'cache_hits',
+        # 'cache_near_hits' and 'cache_misses' in stats, which is also passed on to the solver
+        # (a simulated annealing warm started from a near hit may want a colder temperature_schedule in params)
+        scenario = np.ascontiguousarray(scenario, dtype=np.float64)
+        solver_key = get_solver_key(algorithm, params)
+        key = get_key(scenario, solver_key)
+
+        route = self.get(key)
+        if route is not None:
+            count(stats, 'cache_hits')
+            return route.tolist()
+
+        near = None
+        parameters = inspect.signature(algorithm).parameters
+        if self.max_change > 0 and 'initial_route' in parameters:
+            near = self.find_near(scenario, solver_key)
+        if near is not None:
+            count(stats, 'cache_near_hits')
+            params['initial_route'], queued_nodes = near
+            if 'queued_nodes' in parameters:
+                params['queued_nodes'] = queued_nodes
+        else:
+            count(stats, 'cache_misses')
+        if stats is not None:
+            params['stats'] = stats
+
+        route = algorithm(scenario, **params)
+        # a copy, the caller may change its scenario afterwards
+        self.put(key, solver_key, scenario.copy(), np.array(route, dtype=np.int32))
+        return route
+
+    def get(self, key):
+        # the cached route of a key, or None, from memory or else from disk
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            solver_key, scenario, route = self.memory[key]
+            self.touch(key, solver_key, len(scenario))
+            return route
+
+        paths = glob.glob(os.path.join(self.directory, '*-{}.npz'.format(key)))
+        if not paths:
+            return None
+        solver_key, scenario, route = self.load(paths[0])
+        self.index[key] = (solver_key, len(scenario))
+        self.remember(key, solver_key, scenario, route)
+        self.touch(key, solver_key, len(scenario))
+        return route
+
+    def put(self, key, solver_key, scenario, route):
+        self.remember(key, solver_key, scenario, route)
+
+        # write to a temporary file first, so other processes never read a partial one
+        path = self.get_path(key, solver_key, len(scenario))
+        handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as file:
+            np.savez(file, scenario=scenario, route=route)
+        os.replace(temporary_path, path)
+        self.index[key] = (solver_key, len(scenario))
+        self.evict()
+
+    def remember(self, key, solver_key, scenario, route):
+        self.memory[key] = (solver_key, scenario, route)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get_path(self, key, solver_key, num_nodes):
+        return os.path.join(self.directory, '{}-{}-{}.npz'.format(solver_key, num_nodes, key))
+
+    def load(self, path):
+        with np.load(path) as data:
+            return os.path.basename(path).split('-')[0], data['scenario'], data['route']
+
+    def touch(self, key, solver_key, num_nodes):
+        # mark the file of a route that was used as recently used for evict, another process may have
+        # evicted it already
+        try:
+            os.utime(self.get_path(key, solver_key, num_nodes))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        # delete the least recently used files until the directory fits in disk_size
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.npz')), key=os.path.getmtime)
+        sizes = [os.path.getsize(path) for path in paths]
+        total = sum(sizes)
+        for path, size in zip(paths[:-1], sizes):
+            if total <= self.disk_size:
+                break
+            os.remove(path)
+            self.index.pop(os.path.basename(path)[:-len('.npz')].split('-')[-1], None)
+            total -= size
+
+    def find_near(self, scenario, solver_key):
+        # a warm start route for scenario from the cached route of the same solver with the fewest changed
+        # nodes, and the nodes whose edges changed in it (for a solver's work queue, see local_search), or None
+        # when every cached route has more than max_change changed nodes. the candidates come from the index,
+        # the ones closest in size first, as the difference in size is the least amount of changes, and only
+        # the ones that could still beat the best so far are opened
+        max_changes = int(self.max_change * len(scenario))
+        candidates = {key: num_nodes for key, (cached_solver_key, num_nodes) in self.index.items()
+                      if cached_solver_key == solver_key and abs(num_nodes - len(scenario)) <= max_changes}
+        candidates.update((key, len(cached)) for key, (cached_solver_key, cached, _) in self.memory.items()
+                          if cached_solver_key == solver_key and abs(len(cached) - len(scenario)) <= max_changes)
+        if not candidates:
+            return None
+
+        lookup = {}
+        for node, point in enumerate(scenario):
+            lookup.setdefault(point.tobytes(), []).append(node)
+
+        best_key, best_route, best_changes = None, None, max_changes + 1
+        for key in sorted(candidates, key=lambda key: abs(candidates[key] - len(scenario))):
+            if abs(candidates[key] - len(scenario)) >= best_changes:
+                break
+            if key in self.memory:
+                _, cached, route = self.memory[key]
+            else:
+                try:
+                    _, cached, route = self.load(self.get_path(key, solver_key, candidates[key]))
+                except FileNotFoundError:
+                    # evicted by another process
+                    del self.index[key]
+                    continue
+            matches = match_nodes(lookup, cached)
+            num_removed = np.count_nonzero(matches < 0)
+            changes = num_removed + len(scenario) - (len(cached) - num_removed)
+            if changes < best_changes:
+                best_key, best_route, best_changes = key, matches[route], changes
+
+        if best_route is None:
+            return None
+        self.touch(best_key, solver_key, candidates[best_key])
+        # the successor of every node in the cached route, where it has one in the new scenario
+        successors = np.full(len(scenario), -1, dtype=np.int64)
+        kept = (best_route >= 0) & (np.roll(best_route, -1) >= 0)
+        successors[best_route[kept]] = np.roll(best_route, -1)[kept]
+
+        best_route = best_route[best_route >= 0]
+        route, _ = insert_nodes(scenario, best_route, np.setdiff1d(np.arange(len(scenario)), best_route))
+        next_nodes = np.roll(route, -1)
+        changed = successors[route] != next_nodes
+        return route, np.unique(np.concatenate([route[changed], next_nodes[changed]]))
+
+
+def get_solver_key(algorithm, params):
+    # a hash of the solver and the parameters that change its routes, arrays by their contents
+    parts = [algorithm.__module__, algorithm.__qualname__]
+    for name, value in sorted(params.items()):
+        if name in UNKEYED_PARAMS:
+            continue
+        if name in SCENARIO_PARAMS and value is not None:
+            value = np.shape(value)[1:] if name == 'neighbors' else get_oracle_key(value)
+        elif isinstance(value, np.ndarray):
+            value = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest() + str(value.shape)
+        parts.append('{}={!r}'.format(name, value))
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
+
+
+def get_oracle_key(distance_matrix):
+    # what sets the distances of a distance matrix or oracle apart besides the scenario: its kind, the type of
+    # its distances and a TSPLIB edge weight type (see utils.get_distance_oracle)
+    nodes = np.zeros(1, dtype=np.int64)
+    return (type(distance_matrix).__name__, str(np.asarray(distance_matrix[nodes, nodes]).dtype),
+            getattr(distance_matrix, 'edge_weight_type', None))
+
+
+def get_key(scenario, solver_key):
+    # a hash of the coordinates (in float64) and the solver key
+    digest = hashlib.sha256(solver_key.encode())
+    digest.update(str(scenario.shape).encode())
+    digest.update(scenario.tobytes())
+    return digest.hexdigest()
+
+
+def match_nodes(lookup, cached):
+    # the node at each of the cached scenario's coordinates in lookup (coordinate bytes: nodes), -1 where
+    # there is none. nodes with equal coordinates are matched in order
+    matches = np.full(len(cached), -1, dtype=np.int64)
+    taken = {}
+    for node, point in enumerate(cached):
+        point = point.tobytes()
+        nodes = lookup.get(point, ())
+        used = taken.get(point, 0)
+        if used < len(nodes):
+            matches[node] = nodes[used]
+            taken[point] = used + 1
+    return matches
+
@@ -0,0 +1,202 @@
+import numpy as np
+from utils import get_neighbor_lists, get_node_distances, get_hilbert_order
+
+
+# constructions build a first route quickly, for the solvers to improve on. all of them return an array
+# of node indices and take about O(n log n) time
+
+
+def nearest_neighbor(scenario, start=0, points_per_cell=2):
+    # always move to the closest unvisited node, starting at start. the unvisited nodes are kept in a grid
+    # and deleted from their cell once visited, so finding the next node only looks at the cells around it
+
+    # points_per_cell: average amount of nodes in each cell of the grid
+
+    num_nodes = scenario.shape[0]
+    route = np.empty(num_nodes, dtype=np.int32)
+    if num_nodes == 0:
+        return route
+
+    # the grid only works on the plane, anything else is searched by brute force
+    if scenario.shape[1] != 2:
+        return nearest_neighbor_brute_force(scenario, start)
+
+    grid_size = max(1, int(np.sqrt(num_nodes / points_per_cell)))
+    corner = scenario.min(axis=0)
+    cell_width = max((scenario.max(axis=0) - corner).max() / grid_size, np.finfo(float).tiny)
+    cells = np.minimum(((scenario - corner) / cell_width).astype(np.int64), grid_size - 1)
+    cell_ids = cells[:, 0] * grid_size + cells[:, 1]
+
+    # the unvisited nodes of a cell are the first cell_sizes of its slice of order, a visited node is
+    # swapped with the last unvisited one of its cell
+    order = np.argsort(cell_ids, kind='stable')
+    cell_starts = np.searchsorted(cell_ids[order], np.arange(grid_size ** 2))
+    cell_sizes = np.bincount(cell_ids, minlength=grid_size ** 2)
+    grid_sizes = cell_sizes.reshape(grid_size, grid_size)
+    slots = np.empty(num_nodes, dtype=np.int64)
+    slots[order] = np.arange(num_nodes)
+
+    def visit(node):
+        cell = cell_ids[node]
+        last = cell_starts[cell] + cell_sizes[cell] - 1
+        other = order[last]
+        order[slots[node]], order[last] = other, node
+        slots[other], slots[node] = slots[node], last
+        cell_sizes[cell] -= 1
+
+    def get_unvisited(cell_x, cell_y, radius):
+        # the unvisited nodes in the square of cells around a cell
+        low_x, low_y = max(cell_x - radius, 0), max(cell_y - radius, 0)
+        xs, ys = np.nonzero(grid_sizes[low_x: cell_x + radius + 1, low_y: cell_y + radius + 1])
+        ids = (xs + low_x) * grid_size + ys + low_y
+        return np.concatenate([order[cell_starts[cell]: cell_starts[cell] + cell_sizes[cell]] for cell in ids])
+
+    route[0] = start
+    visit(start)
+
+    for step in range(1, num_nodes):
+        current = route[step - 1]
+        cell_x, cell_y = cells[current]
+
+        # grow the square around the current node until it holds an unvisited node
+        radius = 1
+        while not grid_sizes[max(cell_x - radius, 0): cell_x + radius + 1, max(cell_y - radius, 0): cell_y + radius + 1].any():
+            radius *= 2
+        candidates = get_unvisited(cell_x, cell_y, radius)
+        distances = get_node_distances(scenario, current, candidates)
+
+        # nodes outside the square are at least radius cells away, when the closest one found is further
+        # than that, look again in a square that surely holds anything closer
+        if distances.min() > radius * cell_width:
+            candidates = get_unvisited(cell_x, cell_y, int(distances.min() / cell_width) + 1)
+            distances = get_node_distances(scenario, current, candidates)
+
+        route[step] = candidates[np.argmin(distances)]
+        visit(route[step])
+
+    return route
+
+
+def nearest_neighbor_brute_force(scenario, start=0):
+    # same as nearest_neighbor by comparing the current node to all the unvisited ones
+    num_nodes = scenario.shape[0]
+    route = np.empty(num_nodes, dtype=np.int32)
+    visited = np.zeros(num_nodes, dtype=bool)
+    route[0] = start
+    visited[start] = True
+
+    for step in range(1, num_nodes):
+        remaining_nodes = np.flatnonzero(~visited)
+        route[step] = remaining_nodes[np.argmin(get_node_distances(scenario, route[step - 1], remaining_nodes))]
+        visited[route[step]] = True
+    return route
+
+
+def greedy_edge(scenario, neighbors=None):
+    # add the edges from the shortest to the longest, skipping any edge that would give a node a third
+    # edge or close a cycle too early. only the edges to the candidate neighbors are considered at first,
+    # then the ends of the resulting paths are matched with each other until a single path is left
+
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), computed when not given
+
+    num_nodes = scenario.shape[0]
+    if num_nodes < 3:
+        return np.arange(num_nodes, dtype=np.int32)
+
+    degrees = [0] * num_nodes
+    parents = list(range(num_nodes))
+    adjacency = [[] for _ in range(num_nodes)]
+    num_edges = 0
+
+    neighbors = get_neighbor_lists(scenario) if neighbors is None else neighbors
+    ends, num_neighbors = np.arange(num_nodes), neighbors.shape[1]
+
+    while num_edges < num_nodes - 1:
+        for a, b in zip(*get_candidate_edges(scenario, ends, neighbors)):
+            if degrees[a] < 2 and degrees[b] < 2 and find_root(parents, a) != find_root(parents, b):
+                parents[find_root(parents, a)] = find_root(parents, b)
+                degrees[a] += 1
+                degrees[b] += 1
+                adjacency[a].append(b)
+                adjacency[b].append(a)
+                num_edges += 1
+
+        # match the ends of the paths, looking further when none of the candidates could be joined
+        new_ends = np.flatnonzero(np.array(degrees) < 2)
+        num_neighbors = num_neighbors if len(new_ends) < len(ends) else num_neighbors * 2
+        ends = new_ends
+        neighbors = get_neighbor_lists(scenario[ends], min(num_neighbors, len(ends) - 1))
+
+    # walk the path from one of its ends, the last node closes the route back to the first
+    route = np.empty(num_nodes, dtype=np.int32)
+    previous, current = -1, int(ends[0])
+    for step in range(num_nodes):
+        route[step] = current
+        previous, current = current, next((node for node in adjacency[current] if node != previous), -1)
+    return route
+
+
+def get_candidate_edges(scenario, nodes, neighbors):
+    # the edges between the given nodes and their candidate neighbors (indices into nodes), each once,
+    # sorted from the shortest to the longest. returns the two lists of their endpoints
+    first = np.repeat(nodes, neighbors.shape[1])
+    second = nodes[neighbors.ravel()]
+    first, second = np.minimum(first, second), np.maximum(first, second)
+
+    unique = np.unique(first.astype(np.int64) * scenario.shape[0] + second)
+    first, second = unique // scenario.shape[0], unique % scenario.shape[0]
+    by_length = np.argsort(get_node_distances(scenario, first, second), kind='stable')
+    return first[by_length].tolist(), second[by_length].tolist()
+
+
+def find_root(parents, node):
+    # the root of a node's set in a union-find forest, halving the path on the way
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]
+        node = parents[node]
+    return node
+
+
+def hilbert_curve(scenario, neighbors=None):
+    # visit the nodes in their order along a Hilbert curve (see utils.get_hilbert_order), about 40%
+    # longer than an optimal route on uniform scenarios but takes only a sort
+    return get_hilbert_order(scenario).astype(np.int32)
+
+
+def double_tree(scenario, neighbors=None):
+    # a minimum spanning tree walked depth first, skipping the nodes that were already visited,
+    # at most twice as long as an optimal route. the tree is built by kruskal's algorithm over the edges
+    # to the candidate neighbors, looking further while the candidates leave it in several parts
+
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), computed when not given
+
+    num_nodes = scenario.shape[0]
+    parents = list(range(num_nodes))
+    adjacency = [[] for _ in range(num_nodes)]
+    num_edges = 0
+
+    neighbors = get_neighbor_lists(scenario) if neighbors is None else neighbors
+    while num_edges < num_nodes - 1:
+        for a, b in zip(*get_candidate_edges(scenario, np.arange(num_nodes), neighbors)):
+            root_a, root_b = find_root(parents, a), find_root(parents, b)
+            if root_a != root_b:
+                parents[root_a] = root_b
+                adjacency[a].append(b)
+                adjacency[b].append(a)
+                num_edges += 1
+        if num_edges < num_nodes - 1:
+            neighbors = get_neighbor_lists(scenario, min(2 * neighbors.shape[1], num_nodes - 1))
+
+    # the order the nodes are first reached in by a depth first walk
+    route = np.empty(num_nodes, dtype=np.int32)
+    visited = [False] * num_nodes
+    stack, step = [0], 0
+    while stack:
+        node = stack.pop()
+        if visited[node]:
+            continue
+        visited[node] = True
+        route[step] = node
+        step += 1
+        stack.extend(reversed(adjacency[node]))
+    return route
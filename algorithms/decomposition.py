@@ -0,0 +1,131 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from utils import get_partition, get_neighbor_lists, get_node_distances, get_distance_matrix, time_stamp, timer, summarize, \
+    Budget
+from .local_search import local_search, improve_from_queue
+from .simulated_annealing import advanced
+from .exact import held_karp, EXACT_SIZE
+
+
+# the solvers a cluster can be solved with, and the arguments they get unless told otherwise
+CLUSTER_SOLVERS = {
+    'local_search': (local_search, {'use_queue': True}),
+    'simulated_annealing.advanced': (advanced, {'use_queue': True, 'time_limit': 1000}),
+}
+
+
+def decomposition(scenario, cluster_size=1000, partition='grid', solver='local_search', num_workers=1, solver_kwargs=None,
+                  repair_window=10, num_neighbors=8, seed=None, budget=None, callback=None, stats=None):
+    # a solver for scenarios too big for the others, which hold O(n^2) state or do O(n^2) work per move.
+    # the scenario is split into spatial clusters, each is solved on its own, the sub-routes are stitched
+    # together in the order of the clusters and the seams between them are repaired by a local search
+
+    # cluster_size: the average amount of nodes in a cluster
+    # partition: how the scenario is split, 'grid', 'kmeans' or 'hilbert' (see utils.get_partition)
+    # solver: the solver of the clusters, one of CLUSTER_SOLVERS, every cluster gets candidate neighbor lists
+    # and a distance matrix
+    # num_workers: solve the clusters in this many processes
+    # solver_kwargs: arguments of the cluster solver, on top of its defaults in CLUSTER_SOLVERS
+    # repair_window: the nodes within this many route positions of a seam start the repair queue
+    # (see local_search.improve_from_queue), the repair follows the moves from there
+    # num_neighbors: the size of the candidate neighbor lists of the repair
+    # seed: seeds each cluster's solver and the partition, so runs are reproducible
+    # budget, callback: see local_search, they only apply to the repair
+    # stats: a dict or a utils.Stats (see local_search), also gets the 'cities_per_second' of the whole run
+
+    if solver not in CLUSTER_SOLVERS:
+        raise ValueError('solver should be one of {}, got {!r}'.format(list(CLUSTER_SOLVERS), solver))
+
+    start_time = time_stamp()
+    num_nodes = scenario.shape[0]
+
+    with timer(stats, 'partition'):
+        clusters = get_partition(scenario, cluster_size, partition, seed)
+
+    with timer(stats, 'solve_clusters'):
+        seeds = np.random.SeedSequence(seed).spawn(len(clusters)) if seed is not None else [None] * len(clusters)
+        tasks = [(scenario[cluster], solver, solver_kwargs or {}, cluster_seed) for cluster, cluster_seed in zip(clusters, seeds)]
+        if num_workers > 1:
+            with ProcessPoolExecutor(num_workers) as pool:
+                sub_routes = list(pool.map(solve_cluster, *zip(*tasks), chunksize=max(1, len(tasks) // (4 * num_workers))))
+        else:
+            sub_routes = [solve_cluster(*task) for task in tasks]
+        tours = [cluster[sub_route] for cluster, sub_route in zip(clusters, sub_routes)]
+
+    with timer(stats, 'stitch'):
+        route, seams = stitch_tours(scenario, tours)
+
+    with timer(stats, 'repair'):
+        if len(tours) > 1 and num_nodes > 7:
+            windows = (seams[:, None] + np.arange(-repair_window, repair_window)).ravel() % num_nodes
+            improve_from_queue(scenario, route, np.unique(route[windows]), budget or Budget(),
+                               neighbors=get_neighbor_lists(scenario, num_neighbors), max_pop_length=3, stats=stats,
+                               callback=callback)
+
+    if stats is not None:
+        stats['cities_per_second'] = num_nodes / max((time_stamp() - start_time) / 1000, 1e-9)
+    summarize(stats, 'decomposition', start_time)
+    return route.tolist()
+
+
+def solve_cluster(sub_scenario, solver, solver_kwargs, seed=None):
+    # the route over a cluster's nodes, as indices into the cluster
+    num_nodes = sub_scenario.shape[0]
+    # too few nodes for any move to change the route
+    if num_nodes < 5:
+        return np.arange(num_nodes)
+    # few enough to be solved exactly, in about the time of a heuristic
+    if num_nodes <= EXACT_SIZE:
+        return np.array(held_karp(sub_scenario))
+
+    if seed is not None:
+        np.random.seed(seed.generate_state(1))
+    function, kwargs = CLUSTER_SOLVERS[solver]
+    kwargs = dict(kwargs, neighbors=get_neighbor_lists(sub_scenario), distance_matrix=get_distance_matrix(sub_scenario),
+                  **solver_kwargs)
+    return np.array(function(sub_scenario, **kwargs))
+
+
+def stitch_tours(scenario, tours):
+    # join the closed routes of the clusters into one route, in their order. each route is opened
+    # by removing the edge that makes for the cheapest connection: from the end of the previous cluster's
+    # path into the new path, and from the new path's end towards the next cluster's center.
+    # returns the route and the positions where the paths of the clusters start
+
+    centers = np.array([scenario[tour].mean(axis=0) for tour in tours])
+    previous_end = centers[-1]
+    paths = []
+
+    for index, tour in enumerate(tours):
+        if len(tour) > 1:
+            next_center = centers[(index + 1) % len(tours)]
+            following = np.roll(tour, -1)
+            edges = get_node_distances(scenario, tour, following)
+
+            # removing the edge (tour[k], tour[k + 1]) the path either goes forward from tour[k + 1] to tour[k]
+            # or backwards from tour[k] to tour[k + 1]
+            forward = get_point_distances(scenario, following, previous_end) + \
+                get_point_distances(scenario, tour, next_center) - edges
+            backward = get_point_distances(scenario, tour, previous_end) + \
+                get_point_distances(scenario, following, next_center) - edges
+
+            best_forward, best_backward = np.argmin(forward), np.argmin(backward)
+            if forward[best_forward] <= backward[best_backward]:
+                tour = np.roll(tour, -(best_forward + 1))
+            else:
+                tour = np.roll(tour, -(best_backward + 1))[::-1]
+
+        paths.append(tour)
+        previous_end = scenario[tour[-1]]
+
+    seams = np.cumsum([0] + [len(path) for path in paths[:-1]])
+    return np.concatenate(paths).astype(np.int32), seams
+
+
+def get_point_distances(scenario, nodes, point):
+    # distances from the given nodes to a single point
+    squared = 0
+    for axis in range(scenario.shape[1]):
+        deltas = scenario[nodes, axis] - point[axis]
+        squared = squared + deltas * deltas
+    return np.sqrt(squared)
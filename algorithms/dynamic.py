@@ -0,0 +1,140 @@
+import numpy as np
+from utils import get_node_distances, get_neighbor_lists, time_stamp, Budget, count, timer, summarize
+from .local_search import improve_from_queue
+
+
+def update_route(scenario, route, added=None, removed=None, neighbors=None, budget=None, stats=None, callback=None,
+                 use_segment_flip=True, use_pop=True, max_pop_length=1):
+    # patch a solved route for stops that were added or cancelled instead of solving again. the removed nodes
+    # are spliced out, the added ones placed where they lengthen the route the least, and a local_search queue
+    # (see local_search.improve_from_queue) runs only from the nodes whose edges changed. with the neighbor
+    # lists of the old scenario given they are patched too, only the lists the change touches are searched
+    # again instead of building them all.
+    # returns (scenario, route, neighbors, nodes): the new scenario, the remaining nodes in their order followed
+    # by the added ones, its route and neighbor lists, and the old index of each of its nodes (-1 for the added)
+
+    # added: the coordinates of the new stops, shaped (num_added, dimensions)
+    # removed: the indices of the cancelled nodes in scenario
+    # neighbors: the candidate neighbor lists of scenario (see utils.get_neighbor_lists), patched to the ones
+    # of the new scenario (see update_neighbor_lists), built from scratch when not given
+    # budget: a utils.Budget for the local search, runs until the queue drains when not given
+    # stats, callback, use_segment_flip, use_pop, max_pop_length: see local_search
+
+    start_time = time_stamp()
+    budget = budget or Budget()
+    route = np.asarray(route, dtype=np.int64)
+    added = np.empty((0, scenario.shape[1])) if added is None else np.asarray(added, dtype=np.float64).reshape(-1, scenario.shape[1])
+    removed = np.unique(np.asarray([] if removed is None else removed, dtype=np.int64))
+    count(stats, 'nodes_added', len(added))
+    count(stats, 'nodes_removed', len(removed))
+
+    # the new index of every old node, -1 for the removed ones
+    kept = np.ones(len(scenario), dtype=bool)
+    kept[removed] = False
+    new_indices = np.where(kept, np.cumsum(kept) - 1, -1)
+    nodes = np.concatenate([np.flatnonzero(kept), np.full(len(added), -1)])
+    new_scenario = np.concatenate([scenario[kept], added])
+    added_nodes = np.arange(np.count_nonzero(kept), len(new_scenario))
+
+    with timer(stats, 'splice'):
+        # the nodes left on either side of a removed stretch of the route get a new edge
+        gone = ~kept[route]
+        touched = route[(np.roll(gone, 1) | np.roll(gone, -1)) & ~gone]
+        route = new_indices[route[~gone]]
+        touched = list(new_indices[touched])
+
+    with timer(stats, 'neighbors'):
+        if neighbors is None:
+            neighbors = get_neighbor_lists(new_scenario)
+        else:
+            neighbors = update_neighbor_lists(new_scenario, new_indices[neighbors[kept]], added_nodes)
+
+    with timer(stats, 'insertion'):
+        route, inserted_at = insert_nodes(new_scenario, route, added_nodes, neighbors)
+        touched.extend(inserted_at)
+
+    queued_nodes = np.unique(np.array(touched + list(added_nodes), dtype=np.int64))
+    route = route.astype(np.int32)
+    improve_from_queue(new_scenario, route, queued_nodes, budget, use_segment_flip, use_pop, neighbors=neighbors,
+                       stats=stats, max_pop_length=max_pop_length, callback=callback)
+
+    summarize(stats, 'dynamic.update_route', start_time)
+    return new_scenario, route.tolist(), neighbors, nodes
+
+
+def update_neighbor_lists(scenario, neighbors, added_nodes):
+    # the neighbor lists of scenario, from the lists of its old nodes (in new indices, -1 for removed nodes)
+    # followed by the added nodes, the same as built from scratch. an old list that kept all its neighbors can
+    # only change by added nodes nearer than its farthest neighbor, and is merged with them. the lists that
+    # lost a neighbor and the added nodes' lists are searched by brute force, so the work grows with the size
+    # of the change (times the scenario for the lost neighbors), not with the scenario alone
+    num_old = len(scenario) - len(added_nodes)
+    num_neighbors = min(neighbors.shape[1] if neighbors.ndim == 2 else 0, len(scenario) - 1)
+    if num_neighbors <= 0 or num_old <= 2 * num_neighbors:
+        return get_neighbor_lists(scenario, num_neighbors=max(num_neighbors, 10))
+    neighbors = neighbors[:, :num_neighbors]
+    new_neighbors = np.empty((len(scenario), num_neighbors), dtype=np.int32)
+    new_neighbors[:num_old] = neighbors
+
+    lost = (neighbors < 0).any(axis=1)
+    searched = np.concatenate([np.flatnonzero(lost), added_nodes])
+    for start in range(0, len(searched), 1024):
+        rows = searched[start: start + 1024]
+        distances = get_node_distances(scenario, rows[:, None], np.arange(len(scenario)))
+        distances[np.arange(len(rows)), rows] = np.inf
+        new_neighbors[rows] = get_nearest(distances, np.arange(len(scenario)), num_neighbors)
+
+    if len(added_nodes) > 0:
+        farthest = get_node_distances(scenario, np.arange(num_old), np.maximum(neighbors[:, -1], 0))
+        rows = np.flatnonzero(~lost & (get_node_distances(scenario, added_nodes[:, None], np.arange(num_old)) < farthest).any(axis=0))
+        candidates = np.concatenate([neighbors[rows], np.broadcast_to(added_nodes, (len(rows), len(added_nodes)))], axis=1)
+        new_neighbors[rows] = get_nearest(get_node_distances(scenario, rows[:, None], candidates), candidates, num_neighbors)
+    return new_neighbors
+
+
+def get_nearest(distances, candidates, num_neighbors):
+    # the num_neighbors candidates of each row with the smallest distances, from near to far. candidates is
+    # shaped like distances, or a single row shared by all of them
+    nearest = np.argpartition(distances, num_neighbors - 1, axis=1)[:, :num_neighbors]
+    sorting = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1)
+    nearest = np.take_along_axis(nearest, sorting, axis=1)
+    if candidates.ndim == 1:
+        return candidates[nearest]
+    return np.take_along_axis(candidates, nearest, axis=1)
+
+
+def insert_nodes(scenario, route, nodes, neighbors=None):
+    # insert the nodes into the route one by one, each between the two consecutive nodes where it adds the
+    # least length (the placing half of a pop, see utils.get_pop_gains). with neighbor lists only the edges
+    # at its candidates already in the route are tried, all of them otherwise.
+    # returns the new route and the nodes next to the insertions
+    route = np.asarray(route, dtype=np.int64)
+    positions = np.full(len(scenario), -1, dtype=np.int64)
+    positions[route] = np.arange(len(route))
+    touched = []
+
+    for node in nodes:
+        if len(route) < 2:
+            route = np.append(route, node)
+            positions[route] = np.arange(len(route))
+            continue
+
+        # the insertions right before the spots at these positions
+        spots = np.arange(len(route))
+        if neighbors is not None:
+            candidates = positions[neighbors[node]]
+            candidates = candidates[candidates >= 0]
+            if len(candidates) > 0:
+                spots = np.unique(np.concatenate([candidates, candidates + 1]) % len(route))
+
+        before, after = route[spots - 1], route[spots]
+        costs = get_node_distances(scenario, before, node) + get_node_distances(scenario, node, after) - \
+            get_node_distances(scenario, before, after)
+        spot = int(spots[np.argmin(costs)])
+        touched.extend([int(route[spot - 1]), int(route[spot])])
+
+        route = np.insert(route, spot, node)
+        # only the positions from the insertion on moved
+        positions[route[spot:]] = np.arange(spot, len(route))
+
+    return route, touched
@@ -0,0 +1,155 @@
+import numpy as np
+from utils import get_node_distances, time_stamp, Budget, count, timer, summarize
+from .local_search import local_search
+
+# the most nodes held_karp takes, its tables grow with 2 ** num_nodes * num_nodes (about 50 MB at 20 nodes),
+# and the size up to which exact_or_heuristic solves exactly instead of running the heuristic
+MAX_EXACT_SIZE = 20
+EXACT_SIZE = 12
+# above this many nodes the costs are kept as float32, halving the biggest table
+FLOAT32_SIZE = 16
+
+
+def held_karp(scenario, distance_matrix=None, stats=None):
+    # the optimal route, by the Held-Karp dynamic program over subsets of the nodes (see solve_subsets), in
+    # time growing with 2 ** num_nodes * num_nodes ** 2. for up to MAX_EXACT_SIZE nodes
+
+    # distance_matrix: a distance matrix or oracle (see utils.get_distance_oracle) to look the distances up in
+    # instead of computing them from the scenario
+    # stats: a dict or a utils.Stats (see local_search) for the 'subsets' solved
+
+    start_time = time_stamp()
+    num_nodes = scenario.shape[0]
+    if num_nodes < 4:
+        return list(range(num_nodes))
+    distances = get_submatrix(scenario, np.arange(num_nodes), distance_matrix)
+    with timer(stats, 'held_karp'):
+        costs, parents = solve_subsets(distances, stats)
+    # the route closes from its last node back to node 0
+    full = costs.shape[0] - 1
+    end = int(np.argmin(costs[full] + distances[1:, 0]))
+    route = [0] + [node + 1 for node in trace_back(parents, full, end)]
+    summarize(stats, 'held_karp', start_time)
+    return route
+
+
+def held_karp_path(scenario, start, end, distance_matrix=None, stats=None):
+    # the shortest path from the start node to the end node through every node of the scenario, by the same
+    # dynamic program as held_karp. for the order of a segment of a route between two fixed nodes (see
+    # optimize_windows). returns the nodes in order, start first and end last
+
+    # distance_matrix, stats: see held_karp
+
+    num_nodes = scenario.shape[0]
+    if start == end:
+        raise ValueError('a path needs two different end nodes, got {} twice'.format(start))
+    # the start node goes first, the subsets are of the others
+    nodes = np.concatenate([[start], np.delete(np.arange(num_nodes), start)])
+    if num_nodes < 4:
+        middle = [int(node) for node in nodes[1:] if node != end]
+        return [start] + middle + [end]
+    distances = get_submatrix(scenario, nodes, distance_matrix)
+    with timer(stats, 'held_karp'):
+        costs, parents = solve_subsets(distances, stats)
+    last = int(np.flatnonzero(nodes == end)[0]) - 1
+    return [start] + [int(nodes[node + 1]) for node in trace_back(parents, costs.shape[0] - 1, last)]
+
+
+def get_submatrix(scenario, nodes, distance_matrix=None):
+    # the distances between the nodes, from the distance matrix or oracle when given
+    if distance_matrix is None:
+        return get_node_distances(scenario, nodes[:, None], nodes[None, :])
+    return np.asarray(distance_matrix[nodes[:, None], nodes[None, :]], dtype=np.float64)
+
+
+def solve_subsets(distances, stats=None):
+    # the Held-Karp tables of paths from node 0: costs[subset, node] is the length of the shortest path from
+    # node 0 through the subset of the other nodes (bit i for node i + 1) ending at node + 1, and parents the
+    # node before it. the subsets are solved a layer of one size at a time, all of a layer's subsets ending at
+    # a node at once. a node outside the subset costs infinity, so it's never picked as the one before
+    num_nodes = len(distances)
+    if num_nodes > MAX_EXACT_SIZE:
+        raise ValueError('held_karp takes up to {} nodes, got {}'.format(MAX_EXACT_SIZE, num_nodes))
+    num_others = num_nodes - 1
+    dtype = np.float32 if num_nodes > FLOAT32_SIZE else np.float64
+    costs = np.full((2 ** num_others, num_others), np.inf, dtype=dtype)
+    parents = np.full((2 ** num_others, num_others), -1, dtype=np.int8)
+    singles = 2 ** np.arange(num_others)
+    costs[singles, np.arange(num_others)] = distances[0, 1:]
+
+    between = distances[1:, 1:].astype(dtype)
+    subsets = np.arange(2 ** num_others)
+    sizes = np.bitwise_count(subsets)
+    for size in range(2, num_others + 1):
+        layer = subsets[sizes == size]
+        count(stats, 'subsets', len(layer))
+        for node in range(num_others):
+            ending = layer[(layer >> node) & 1 == 1]
+            # the paths through the rest of the subset, then on to the node
+            lengths = costs[ending ^ (1 << node)] + between[:, node]
+            before = np.argmin(lengths, axis=1)
+            parents[ending, node] = before
+            costs[ending, node] = lengths[np.arange(len(ending)), before]
+    return costs, parents
+
+
+def trace_back(parents, subset, node):
+    # the nodes of the path ending at node through the subset, from the first after node 0 to node
+    path = []
+    while node >= 0:
+        path.append(node)
+        subset, node = subset ^ (1 << node), int(parents[subset, node])
+    return path[::-1]
+
+
+def exact_or_heuristic(scenario, algorithm=local_search, exact_size=EXACT_SIZE, distance_matrix=None, stats=None, **params):
+    # held_karp for scenarios of up to exact_size nodes, where it takes about as long as the heuristics and is
+    # sure to be optimal, algorithm(scenario, **params) for bigger ones
+    # algorithm: any solver function
+    # distance_matrix, stats: passed on to either solver
+    if scenario.shape[0] <= min(exact_size, MAX_EXACT_SIZE):
+        return held_karp(scenario, distance_matrix=distance_matrix, stats=stats)
+    return algorithm(scenario, distance_matrix=distance_matrix, stats=stats, **params)
+
+
+def optimize_windows(scenario, route, window=8, distance_matrix=None, budget=None, callback=None, stats=None):
+    # reorder every window of the route's positions optimally between the two nodes around it (held_karp_path),
+    # sliding the windows along the route by half of one, in place. it finds the moves of any combination of
+    # 2-opt and or-opt within a window, so it can improve a local_search route further.
+    # returns the amount the route got shorter
+
+    # window: the amount of nodes reordered at a time, up to MAX_EXACT_SIZE - 2
+    # budget: a utils.Budget to stop by, an iteration is one window
+    # callback: called with the route after every improved window
+    # distance_matrix, stats: see held_karp, stats counts the 'windows' and the 'windows_improved'
+
+    start_time = time_stamp()
+    budget = budget or Budget()
+    num_nodes = len(route)
+    window = min(window, MAX_EXACT_SIZE - 2, num_nodes - 2)
+    improvement = 0.0
+    if window < 2:
+        return improvement
+
+    for position in range(0, num_nodes, max(1, window // 2)):
+        if budget.exhausted():
+            break
+        budget.spend()
+        count(stats, 'windows')
+        positions = np.arange(position - 1, position + window + 1) % num_nodes
+        nodes = np.asarray(route)[positions]
+        distances = get_submatrix(scenario, nodes, distance_matrix)
+        old_length = distances[np.arange(window + 1), np.arange(1, window + 2)].sum()
+
+        order = held_karp_path(scenario[nodes], 0, window + 1, distance_matrix=distances)
+        new_length = distances[order[:-1], order[1:]].sum()
+        if new_length < old_length - 1e-9:
+            count(stats, 'windows_improved')
+            improvement += old_length - new_length
+            for inner, node in zip(positions[1:-1], nodes[order[1:-1]]):
+                route[inner] = node
+            if callback is not None:
+                callback(route)
+
+    summarize(stats, 'exact.optimize_windows', start_time)
+    return improvement
@@ -0,0 +1,364 @@
+import numpy as np
+from multiprocessing import Pool
+from utils import calculate_journey_distances, get_neighbor_lists, get_node_distances, time_stamp, Budget, count, timer, \
+    record, summarize
+from .local_search import local_search
+
+# the ways genetic can combine two parent routes into a child (see order_crossover and edge_assembly_crossover)
+CROSSOVERS = ('ox', 'eax')
+
+# the scenario and the neighbor lists inside a worker process, set by attach_worker
+worker_state = {}
+
+
+def genetic(scenario, pop_size=100, num_children=None, crossover='ox', mutation_rate=0.1, polish=False, neighbors=None,
+            num_workers=1, patience=100, seed=None, time_limit=np.inf, budget=None, callback=None, stats=None):
+    # a genetic algorithm: a population of routes, kept as one (pop_size, num_nodes) array, breeds children from
+    # pairs of parents picked by binary tournaments, a share of the children is mutated (a random segment is
+    # reversed) and the shortest distinct routes of the parents and the children survive to the next
+    # generation. the route lengths of a whole generation are computed at once, the crossover and the mutation
+    # are done on all the children together where they can be
+
+    # pop_size: the amount of routes that survive each generation
+    # num_children: children bred per generation, pop_size when not given
+    # crossover: 'ox' (order crossover, a segment of one parent and the rest in the other's order, done for all
+    # the children at once) or 'eax' (edge assembly crossover, which swaps a cycle of alternating edges of the two
+    # parents and merges the resulting subtours, child by child but much closer to both parents)
+    # mutation_rate: the share of children that get a random segment reversed
+    # polish: improve every child by local_search (with the queue, from the nodes whose edges the crossover
+    # changed with 'eax'), a memetic algorithm. with polish or 'eax' the initial population is made of polished
+    # copies of a local_search route, each kicked by a few double bridges, random routes otherwise
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists) for 'eax' and polish, built when not given
+    # num_workers: breed the children in this many processes, worth it with 'eax' or polish
+    # patience: stop after this many generations without a shorter route
+    # seed: seeds the population and every generation, so runs are reproducible with an iteration budget and
+    # the same num_workers
+    # time_limit, budget: see local_search, an iteration is one generation
+    # callback: called with the shortest route whenever it gets shorter
+    # stats: a dict or a utils.Stats (see local_search) to count the 'generations' and 'children' in,
+    # a Stats also times the phases and records the 'shortest_lengths' of every generation
+
+    if crossover not in CROSSOVERS:
+        raise ValueError('crossover should be one of {}, got {!r}'.format(list(CROSSOVERS), crossover))
+
+    start_time = time_stamp()
+    budget = budget or Budget(time_limit)
+    num_nodes = scenario.shape[0]
+    num_children = num_children or pop_size
+    seed = np.random.randint(2 ** 31) if seed is None else seed
+    random = np.random.default_rng(np.random.SeedSequence([seed]))
+    if num_nodes < 5:
+        return list(range(num_nodes))
+    neighbors = get_neighbor_lists(scenario) if neighbors is None else neighbors
+
+    pool = Pool(num_workers, initializer=attach_worker, initargs=(scenario, neighbors)) if num_workers > 1 else None
+    try:
+        def breed_all(parents_a, parents_b, generation, polish=polish, queued_nodes=None):
+            # the children of a generation and their lengths, the batch split into a chunk per worker
+            num_chunks = 1 if pool is None else num_workers
+            chunks = [(parents_a[chunk], None if parents_b is None else parents_b[chunk], crossover, mutation_rate, polish,
+                       budget.deadline, [seed, generation, index], None if queued_nodes is None else [queued_nodes[i] for i in chunk])
+                      for index, chunk in enumerate(np.array_split(np.arange(len(parents_a)), num_chunks))]
+            if pool is None:
+                results = [breed(scenario, neighbors, *chunks[0])]
+            else:
+                results = pool.map(breed_task, chunks)
+            return np.concatenate([children for children, _ in results]), np.concatenate([lengths for _, lengths in results])
+
+        with timer(stats, 'initial_population'):
+            if polish or crossover == 'eax':
+                # local optima to start from, random ones take too long to polish: kicked copies of one.
+                # local_search draws from numpy's global generator
+                np.random.seed(random.integers(2 ** 31))
+                route = local_search(scenario, neighbors=neighbors, use_queue=True, budget=Budget(deadline=budget.deadline))
+                population, kicked_nodes = kick(np.array(route, dtype=np.int32), pop_size, random)
+                population, lengths = breed_all(population, None, 0, polish=True, queued_nodes=kicked_nodes)
+            else:
+                population = np.argsort(random.random((pop_size, num_nodes)), axis=1).astype(np.int32)
+                population, lengths = breed_all(population, None, 0)
+
+        best_length, stagnation, generation = np.inf, 0, 0
+        while stagnation < patience and not budget.exhausted():
+            budget.spend()
+            generation += 1
+            count(stats, 'generations')
+
+            with timer(stats, 'selection'):
+                parents_a = select_parents(lengths, num_children, random)
+                parents_b = select_parents(lengths, num_children, random)
+            with timer(stats, 'breeding'):
+                children, child_lengths = breed_all(population[parents_a], population[parents_b], generation)
+            count(stats, 'children', num_children)
+
+            with timer(stats, 'survival'):
+                population, lengths = select_survivors(np.concatenate([population, children]),
+                                                       np.concatenate([lengths, child_lengths]), pop_size)
+            record(stats, 'shortest_lengths', lengths[0])
+
+            if lengths[0] < best_length - 1e-9:
+                best_length, stagnation = lengths[0], 0
+                if callback is not None:
+                    callback(population[0])
+            else:
+                stagnation += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    summarize(stats, 'genetic', start_time)
+    return population[0].tolist()
+
+
+def select_parents(lengths, num_parents, random):
+    # binary tournaments: of two random routes, the shorter one is a parent
+    contestants = random.integers(len(lengths), size=(num_parents, 2))
+    return np.where(lengths[contestants[:, 0]] <= lengths[contestants[:, 1]], contestants[:, 0], contestants[:, 1])
+
+
+def select_survivors(routes, lengths, pop_size):
+    # the pop_size shortest routes, sorted, each length only once so copies of a route don't take over the
+    # population. short of distinct lengths, the copies fill the rest
+    order = np.argsort(lengths, kind='stable')
+    _, distinct = np.unique(np.round(lengths[order], 9), return_index=True)
+    order = np.concatenate([order[distinct], np.delete(order, distinct)])[:pop_size]
+    return routes[order], lengths[order]
+
+
+def attach_worker(scenario, neighbors):
+    # runs once in every worker
+    worker_state['scenario'] = scenario
+    worker_state['neighbors'] = neighbors
+
+
+def breed_task(task):
+    return breed(worker_state['scenario'], worker_state['neighbors'], *task)
+
+
+def breed(scenario, neighbors, parents_a, parents_b, crossover, mutation_rate, polish, deadline, entropy, queued_nodes=None):
+    # the children of the parent pairs, mutated and polished until the deadline, and their lengths. without
+    # parents_b the parents_a are only mutated and polished, from their queued_nodes when given. local_search
+    # draws from numpy's global generator, which is seeded too
+    state = np.random.SeedSequence(entropy)
+    random = np.random.default_rng(state)
+    np.random.seed(state.generate_state(1))
+    queued_nodes = [None] * len(parents_a) if queued_nodes is None else list(queued_nodes)
+
+    if parents_b is None:
+        children = parents_a.copy()
+    elif crossover == 'ox':
+        children = order_crossover(parents_a, parents_b, random)
+    else:
+        children = np.empty_like(parents_a)
+        for index, (parent_a, parent_b) in enumerate(zip(parents_a, parents_b)):
+            children[index], queued_nodes[index] = edge_assembly_crossover(scenario, parent_a, parent_b, neighbors, random)
+
+    mutated = mutate(children, mutation_rate, random)
+    if polish:
+        for index, child in enumerate(children):
+            # a mutated child's new edges aren't tracked, its whole route is queued
+            nodes = None if index in mutated else queued_nodes[index]
+            if nodes is None or len(nodes) > 0:
+                children[index] = local_search(scenario, initial_route=child, neighbors=neighbors, use_queue=True,
+                                               queued_nodes=nodes, budget=Budget(deadline=deadline))
+    return children, calculate_journey_distances(scenario[children])
+
+
+def order_crossover(parents_a, parents_b, random):
+    # each child keeps a random segment of its first parent in place, and the other nodes follow in the
+    # order of the second parent, starting after the segment (OX). all the children at once
+    num_children, num_nodes = parents_a.shape
+    rows = np.arange(num_children)[:, None]
+    ends = np.sort(random.integers(num_nodes + 1, size=(num_children, 2)), axis=1)
+    positions = np.arange(num_nodes)
+    in_segment = (positions >= ends[:, :1]) & (positions < ends[:, 1:])
+
+    # the nodes of the segments
+    taken = np.zeros((num_children, num_nodes), dtype=bool)
+    taken[rows, parents_a] = in_segment
+
+    # both the free positions and the second parent's nodes go around the route from the segment's end, every
+    # row has as many free positions as nodes left, so the flattened masks line them up
+    rotation = (ends[:, 1:] + positions) % num_nodes
+    free_positions = ~np.take_along_axis(in_segment, rotation, axis=1)
+    nodes_b = np.take_along_axis(parents_b, rotation, axis=1)
+    left = ~np.take_along_axis(taken, nodes_b, axis=1)
+
+    children = parents_a.copy()
+    children[np.broadcast_to(rows, rotation.shape)[free_positions], rotation[free_positions]] = nodes_b[left]
+    return children
+
+
+def kick(route, num_routes, random, max_length=30):
+    # copies of the route, each but the first with some of its segments swapped with the segment right after
+    # them (double bridges), both up to max_length nodes long, a few edges changed that 2-opt can't undo.
+    # returns the routes and the nodes of each whose edges changed
+    num_nodes = len(route)
+    routes = np.tile(route, (num_routes, 1))
+    kicked_nodes = [np.empty(0, dtype=np.int64)]
+    num_kicks = max(1, num_nodes // 100)
+    max_length = max(1, min(max_length, num_nodes // 2 - 1))
+    for row in routes[1:]:
+        nodes = []
+        for start, first, second in zip(random.integers(num_nodes, size=num_kicks), random.integers(1, max_length + 1, size=num_kicks),
+                                        random.integers(1, max_length + 1, size=num_kicks)):
+            row[:] = np.roll(row, -start)
+            end = first + second
+            nodes.extend(row[[-1, 0, first - 1, first, end - 1, end % num_nodes]].tolist())
+            row[:end] = np.concatenate([row[first:end], row[:first]])
+        kicked_nodes.append(np.unique(nodes))
+    return routes, kicked_nodes
+
+
+def mutate(children, mutation_rate, random):
+    # reverse a random segment of a share of the children in place, returns the indices of the mutated ones
+    mutated = np.flatnonzero(random.random(len(children)) < mutation_rate)
+    if len(mutated) == 0:
+        return set()
+    ends = np.sort(random.integers(children.shape[1], size=(len(mutated), 2)), axis=1)
+    positions = np.arange(children.shape[1])
+    inside = (positions >= ends[:, :1]) & (positions <= ends[:, 1:])
+    children[mutated] = np.take_along_axis(children[mutated], np.where(inside, ends.sum(axis=1)[:, None] - positions, positions), axis=1)
+    return set(mutated.tolist())
+
+
+def edge_assembly_crossover(scenario, route_a, route_b, neighbors, random):
+    # EAX with a single AB-cycle: a cycle of edges taken alternately from the two parents (and not in both) is
+    # found by a random walk, the first parent's edges of it are swapped for the second parent's, which splits
+    # the route into subtours, and the subtours are merged, the smallest one first, by the cheapest exchange of
+    # an edge of it and an edge at one of its nodes' candidate neighbors (2-opt between subtours).
+    # returns the child route and the nodes whose edges changed
+    adjacency_a, adjacency_b = get_adjacency(route_a), get_adjacency(route_b)
+    cycle = get_ab_cycle(adjacency_a, adjacency_b, random)
+    if cycle is None:
+        return route_a.copy(), np.empty(0, dtype=np.int64)
+
+    adjacency = adjacency_a.tolist()
+    for index in range(len(cycle) - 1):
+        # the edges at even indices are the first parent's, they're removed before any edge is added
+        if index % 2 == 0:
+            node, other = cycle[index], cycle[index + 1]
+            adjacency[node][adjacency[node].index(other)] = -1
+            adjacency[other][adjacency[other].index(node)] = -1
+    for index in range(1, len(cycle) - 1, 2):
+        node, other = cycle[index], cycle[index + 1]
+        adjacency[node][adjacency[node].index(-1)] = other
+        adjacency[other][adjacency[other].index(-1)] = node
+
+    changed = set(cycle)
+    merge_subtours(scenario, adjacency, neighbors, changed)
+    return adjacency_to_route(adjacency), np.array(sorted(changed), dtype=np.int64)
+
+
+def get_adjacency(route):
+    # the two neighbors of every node in the route, the one before it and the one after it
+    adjacency = np.empty((len(route), 2), dtype=np.int64)
+    adjacency[route, 0] = np.roll(route, 1)
+    adjacency[route, 1] = np.roll(route, -1)
+    return adjacency
+
+
+def get_ab_cycle(adjacency_a, adjacency_b, random):
+    # a random AB-cycle, the nodes of a closed walk whose edges are alternately the first and the second parent's,
+    # starting with the first's, leaving out the edges the parents share. None when the parents are the same
+    shared_a = (adjacency_a[:, :, None] == adjacency_b[:, None, :]).any(axis=2)
+    shared_b = (adjacency_b[:, :, None] == adjacency_a[:, None, :]).any(axis=2)
+    starts = np.flatnonzero(~shared_a.all(axis=1))
+    if len(starts) == 0:
+        return None
+    # the unshared edges left at a node of each parent, listed the first time the walk reaches it
+    adjacency, shares = [adjacency_a.tolist(), adjacency_b.tolist()], [shared_a.tolist(), shared_b.tolist()]
+    remaining = [{}, {}]
+
+    def get_remaining(parent, node):
+        if node not in remaining[parent]:
+            remaining[parent][node] = [other for other, shared in zip(adjacency[parent][node], shares[parent][node]) if not shared]
+        return remaining[parent][node]
+
+    # walk until a node is reached again an even amount of edges after leaving it, the part of the walk in
+    # between then alternates and closes
+    node = int(random.choice(starts))
+    walk = [node]
+    left_at = {(node, 0): 0}
+    while True:
+        parent = (len(walk) - 1) % 2
+        options = get_remaining(parent, node)
+        other = options[int(random.integers(len(options)))]
+        options.remove(other)
+        get_remaining(parent, other).remove(node)
+        walk.append(other)
+        node = other
+        position = len(walk) - 1
+        if (node, position % 2) in left_at:
+            start = left_at[(node, position % 2)]
+            cycle = walk[start:]
+            # the cycle has to start with an edge of the first parent
+            return cycle if start % 2 == 0 else cycle[1:] + cycle[1:2]
+        left_at[(node, position % 2)] = position
+
+
+def merge_subtours(scenario, adjacency, neighbors, changed):
+    # join the subtours of the adjacency lists into one route, in place, adding the nodes of the exchanged
+    # edges to changed
+    num_nodes = len(adjacency)
+    labels = [-1] * num_nodes
+    sizes = []
+    for start in range(num_nodes):
+        if labels[start] >= 0:
+            continue
+        previous, node, size = -1, start, 0
+        while labels[node] < 0:
+            labels[node] = len(sizes)
+            size += 1
+            previous, node = node, adjacency[node][1] if adjacency[node][0] == previous else adjacency[node][0]
+        sizes.append(size)
+    if len(sizes) == 1:
+        return
+
+    labels, sizes = np.array(labels), np.array(sizes)
+    while np.count_nonzero(sizes) > 1:
+        label = np.flatnonzero(sizes == sizes[sizes > 0].min())[0]
+        nodes = np.flatnonzero(labels == label)
+        # the subtour's edges (node, next) and every other node's edges (other, other_next), (node, other) and
+        # (next, other_next) or (node, other_next) and (next, other) replace them
+        edges = np.array([(node, next_node) for node in nodes for next_node in adjacency[node]])
+        others = neighbors[edges[:, 0]]
+        if (labels[others] == label).all():
+            others = np.broadcast_to(np.flatnonzero(labels != label), (len(edges), num_nodes - len(nodes)))
+        other_adjacency = np.array(adjacency)[others]
+
+        node, next_node = edges[:, 0, None, None], edges[:, 1, None, None]
+        other, other_next = others[:, :, None], other_adjacency
+        removed = get_node_distances(scenario, node, next_node) + get_node_distances(scenario, other, other_next)
+        gains = np.stack([get_node_distances(scenario, node, other) + get_node_distances(scenario, next_node, other_next),
+                          get_node_distances(scenario, node, other_next) + get_node_distances(scenario, next_node, other)]) - removed
+        gains[:, labels[others] == label] = np.inf
+        option, edge, candidate, side = np.unravel_index(np.argmin(gains), gains.shape)
+
+        node, next_node = int(edges[edge, 0]), int(edges[edge, 1])
+        other, other_next = int(others[edge, candidate]), int(other_adjacency[edge, candidate, side])
+        if option == 1:
+            other, other_next = other_next, other
+        replace(adjacency, node, next_node, other)
+        replace(adjacency, next_node, node, other_next)
+        replace(adjacency, other, other_next, node)
+        replace(adjacency, other_next, other, next_node)
+        changed.update([node, next_node, other, other_next])
+
+        merged_label = labels[other]
+        labels[nodes] = merged_label
+        sizes[merged_label] += sizes[label]
+        sizes[label] = 0
+
+
+def replace(adjacency, node, old, new):
+    adjacency[node][adjacency[node].index(old)] = new
+
+
+def adjacency_to_route(adjacency):
+    route = [0]
+    previous, node = -1, 0
+    for _ in range(len(adjacency) - 1):
+        previous, node = node, adjacency[node][1] if adjacency[node][0] == previous else adjacency[node][0]
+        route.append(node)
+    return np.array(route, dtype=np.int32)
@@ -1,22 +1,43 @@
 import numpy as np
+from utils import time_stamp, summarize
+from .construction import nearest_neighbor
 
 
-def greedy(scenario):
+def greedy(scenario, neighbors=None, stats=None):
     # an algorithm that always moves to the closest node
 
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), when given the closest unvisited
+    # candidate is taken and the remaining nodes are only scanned once all candidates were visited
+    # stats: a utils.Stats to report the run time of the construction to
+
+    start_time = time_stamp()
+    if neighbors is not None:
+        route = greedy_over_candidates(scenario, neighbors)
+    else:
+        # the same route, with the unvisited nodes kept in a grid rather than scanned at every step
+        route = nearest_neighbor(scenario).tolist()
+    summarize(stats, 'greedy', start_time)
+    return route
+
+
+def greedy_over_candidates(scenario, neighbors):
     route = [0]
+    visited = np.zeros(len(scenario), dtype=bool)
+    visited[0] = True
 
-    # while there are still unvisited nodes, add the nearest node to the route
     while len(route) < len(scenario):
-        remaining_nodes = np.arange(len(scenario))[~np.isin(range(len(scenario)), route)]
-        route.append(
-            remaining_nodes[
-                find_nearest_node(
-                    scenario[route[-1]],
-                    scenario[remaining_nodes]
-                )
-            ]
-        )
+        # candidate lists are sorted from near to far, so the first unvisited one is the closest
+        candidates = neighbors[route[-1]]
+        candidates = candidates[~visited[candidates]]
+
+        if candidates.size > 0:
+            next_node = candidates[0]
+        else:
+            remaining_nodes = np.flatnonzero(~visited)
+            next_node = remaining_nodes[find_nearest_node(scenario[route[-1]], scenario[remaining_nodes])]
+
+        route.append(int(next_node))
+        visited[next_node] = True
     return route
 
 
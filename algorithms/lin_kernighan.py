@@ -0,0 +1,216 @@
+import numpy as np
+from collections import deque
+from utils import get_neighbor_lists, get_node_distances, random_arange, Budget, count, timer, summarize, \
+    time_stamp, watch_target_gap
+from .local_search import CONSTRUCTIONS, TOURS
+
+
+def lin_kernighan(scenario, neighbors=None, max_depth=5, breadth=(5, 3, 1), num_kicks=0, kick_length=50,
+                  construction='greedy_edge', tour='array', time_limit=np.inf, distance_matrix=None, budget=None,
+                  callback=None, stats=None, target_gap=None):
+    # a variable depth search in the style of Lin and Kernighan: around each node a chain of 2-opt flips is
+    # built, each removing the edge just added to close the route and adding one to a candidate neighbor,
+    # for as long as the removed edges outweigh the added ones. the best closed route along the chain is kept,
+    # so a chain of depth k is a sequential k+1-opt move (or-opt and 3-opt moves included from depth 2).
+    # once no chain helps (a local optimum), the route is kicked: two neighboring segments swap places
+    # (a double bridge) and the chains repair the kicked area, the kick is undone unless the route got no longer
+
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), computed when not given
+    # max_depth: the most flips in a chain
+    # breadth: how many candidates are tried at each depth of a chain before giving up, the last one
+    # for all the deeper ones
+    # num_kicks: how many kicks to try after reaching a local optimum, stops earlier when the time is up
+    # kick_length: the most nodes in each of the two swapped segments of a kick
+    # construction: how the initial route is built, one of local_search.CONSTRUCTIONS
+    # tour: the tour structure the flips are done on, one of local_search.TOURS (see utils.tour)
+    # time_limit, distance_matrix, budget, stats: see local_search, an iteration is one chain search
+    # callback: called with the route whenever it gets shorter, after the first descent and every kept kick
+    # target_gap: stop kicking once the route is within this share of a lower bound on its length, see local_search
+
+    start_time = time_stamp()
+    budget = budget or Budget(time_limit)
+    if construction not in CONSTRUCTIONS:
+        raise ValueError('construction should be one of {}, got {!r}'.format(list(CONSTRUCTIONS), construction))
+    if tour not in TOURS:
+        raise ValueError('tour should be one of {}, got {!r}'.format(list(TOURS), tour))
+
+    neighbors = get_neighbor_lists(scenario) if neighbors is None else neighbors
+    if target_gap is not None:
+        budget, callback = watch_target_gap(scenario, target_gap, budget, callback, neighbors, stats)
+    with timer(stats, 'construction'):
+        route = np.array(CONSTRUCTIONS[construction](scenario, neighbors), dtype=np.int32)
+    if len(route) < 8:
+        summarize(stats, 'lin_kernighan', start_time)
+        return route.tolist()
+
+    tour = TOURS[tour](route)
+    neighbor_distances = get_tour_distances(scenario, np.arange(len(route))[:, None], neighbors, distance_matrix)
+    with timer(stats, 'lin_kernighan'):
+        improve_lin_kernighan(scenario, tour, random_arange(len(route)), neighbors, budget, max_depth, breadth,
+                              distance_matrix, stats, neighbor_distances=neighbor_distances)
+    if callback is not None:
+        callback(tour.sequence())
+
+    kick = 0
+    while kick < num_kicks and not budget.exhausted():
+        kick += 1
+        journal = []
+        with timer(stats, 'kick'):
+            change, kicked_nodes = apply_double_bridge(scenario, tour, kick_length, distance_matrix, journal)
+        with timer(stats, 'lin_kernighan'):
+            change += improve_lin_kernighan(scenario, tour, kicked_nodes, neighbors, budget, max_depth, breadth,
+                                            distance_matrix, stats, journal, neighbor_distances)
+        count(stats, 'kicks')
+
+        if change <= 0:
+            count(stats, 'kicks_accepted')
+            if change < 0 and callback is not None:
+                callback(tour.sequence())
+        else:
+            # undo the flips from the last one, each flip(a, b) left the path going from b to a
+            for a, b in reversed(journal):
+                tour.flip(b, a)
+
+    summarize(stats, 'lin_kernighan', start_time)
+    return tour.sequence().tolist()
+
+
+def improve_lin_kernighan(scenario, tour, queued_nodes, neighbors, budget=None, max_depth=5, breadth=(5, 3, 1),
+                          distance_matrix=None, stats=None, journal=None, neighbor_distances=None):
+    # improve the tour in place by chains of flips around one node at a time, from a queue with "don't-look"
+    # bits as in local_search.improve_from_queue, trying the chains that start with the edge after the node
+    # and with the edge before it. returns the change in the length of the route (negative when shorter)
+
+    # tour: an ArrayTour or a TwoLevelTour
+    # journal: a list that gets the (a, b) of every tour.flip(a, b) done, in order
+    # neighbor_distances: the distances from each node to its candidate neighbors, computed when not given
+
+    def get_distances(nodes_a, nodes_b):
+        return get_tour_distances(scenario, nodes_a, nodes_b, distance_matrix)
+
+    if neighbor_distances is None:
+        neighbor_distances = get_distances(np.arange(len(tour))[:, None], neighbors)
+    queue = deque(int(node) for node in queued_nodes)
+    in_queue = np.zeros(len(tour), dtype=bool)
+    in_queue[list(queue)] = True
+    budget = budget or Budget()
+    total_change = 0
+
+    while queue and not budget.exhausted():
+        node = queue.popleft()
+        in_queue[node] = False
+        budget.spend()
+
+        for forward in (True, False):
+            flips = []
+            change = find_chain(tour, node, forward, get_distances, neighbors, neighbor_distances, max_depth, breadth,
+                                flips, stats)
+            if change < 0:
+                break
+        if change >= 0:
+            continue
+
+        total_change += change
+        count(stats, 'moves_accepted')
+        if journal is not None:
+            journal.extend(flips)
+
+        # the ends of the flipped paths had their edges changed
+        for touched_node in {node for flip in flips for node in flip} | {int(tour.next(node)), int(tour.prev(node))}:
+            if not in_queue[touched_node]:
+                in_queue[touched_node] = True
+                queue.append(touched_node)
+
+    return total_change
+
+
+def find_chain(tour, t1, forward, get_distances, neighbors, neighbor_distances, max_depth, breadth, flips, stats=None):
+    # search a chain of flips starting by removing the edge from t1 to t2, the node after it in the given
+    # direction, and apply the best closed one. at each depth an edge from t2 to a candidate neighbor t3
+    # is added and the edge from t3 to t4, the node before t3, is removed: flipping the path from t2 to t4
+    # joins t2 with t3 and leaves t4 next to t1, the next t2. the candidates are tried by the length change
+    # so far, only while it is negative and without removing an edge added earlier in the chain.
+    # returns the change in the length of the route by the applied chain, 0 when none shortens it
+
+    # flips: a list that gets the (a, b) of every tour.flip(a, b) of the applied chain
+    successor, predecessor = (tour.next, tour.prev) if forward else (tour.prev, tour.next)
+    added = set()
+    best = [0, 0]  # the change of the best closed chain and its amount of flips
+
+    def search(t2, change, depth):
+        # change: the length change so far, counting the edge from t1 to t2 as removed
+        candidates = neighbors[t2]
+        befores = predecessor(candidates)
+        added_lengths = change + neighbor_distances[t2]
+        # the removed edges and the edges that would close the route, in a single lookup
+        removed, closing = get_distances(befores, np.array([candidates, np.full_like(candidates, t1)]))
+        changes = added_lengths - removed
+        count(stats, 'moves_evaluated', len(candidates))
+
+        valid = (added_lengths < 0) & (candidates != t1) & (befores != t2)
+        tries = breadth[min(depth, len(breadth) - 1)]
+        for index in np.flatnonzero(valid)[np.argsort(changes[valid], kind='stable')][:tries].tolist():
+            t3, t4 = int(candidates[index]), int(befores[index])
+            if (min(t3, t4), max(t3, t4)) in added:
+                continue
+
+            flips.append((t2, t4) if forward else (t4, t2))
+            tour.flip(*flips[-1])
+            added.add((min(t2, t3), max(t2, t3)))
+
+            closed = changes[index] + closing[index]
+            if closed < best[0]:
+                best[:] = closed, len(flips)
+            if depth + 1 < max_depth:
+                search(t4, changes[index], depth + 1)
+            if best[1] > 0:
+                return
+
+            added.discard((min(t2, t3), max(t2, t3)))
+            a, b = flips.pop()
+            tour.flip(b, a)
+
+    t2 = int(successor(t1))
+    search(t2, -get_distances(t1, t2), 0)
+
+    # undo the flips after the best closed chain
+    while len(flips) > best[1]:
+        a, b = flips.pop()
+        tour.flip(b, a)
+    return best[0]
+
+
+def apply_double_bridge(scenario, tour, kick_length=50, distance_matrix=None, journal=None):
+    # swap two neighboring segments of random lengths after a random node, by three flips.
+    # returns the change in the length of the route and the nodes at the ends of the changed edges
+
+    # journal: a list that gets the (a, b) of every tour.flip(a, b) done, in order
+    num_nodes = len(tour)
+    lengths = np.random.randint(1, max(2, min(kick_length, (num_nodes - 2) // 2) + 1), size=2)
+
+    # the route goes p, b1 ... b2, c1 ... c2, q
+    p = int(np.random.randint(num_nodes))
+    b1 = b2 = int(tour.next(p))
+    for _ in range(lengths[0] - 1):
+        b2 = int(tour.next(b2))
+    c1 = c2 = int(tour.next(b2))
+    for _ in range(lengths[1] - 1):
+        c2 = int(tour.next(c2))
+    q = int(tour.next(c2))
+
+    removed = get_tour_distances(scenario, np.array([p, b2, c2]), np.array([b1, c1, q]), distance_matrix)
+    added = get_tour_distances(scenario, np.array([p, c2, b2]), np.array([c1, b1, q]), distance_matrix)
+
+    # p, c2 ... c1, b2 ... b1, q, then each segment turned back around
+    for a, b in [(b1, c2), (c2, c1), (b2, b1)]:
+        tour.flip(a, b)
+        if journal is not None:
+            journal.append((a, b))
+    return added.sum() - removed.sum(), [p, b1, b2, c1, c2, q]
+
+
+def get_tour_distances(scenario, nodes_a, nodes_b, distance_matrix=None):
+    # distances between the given nodes, looked up in the distance matrix when given
+    if distance_matrix is not None:
+        return distance_matrix[nodes_a, nodes_b]
+    return get_node_distances(scenario, nodes_a, nodes_b)
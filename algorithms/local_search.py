@@ -1,39 +1,278 @@
 import numpy as np
-from utils import time_stamp, xy_route_to_indices_route, find_segment_flip, find_pop
+from collections import deque
+from utils import time_stamp, find_segment_flip, find_pop, apply_segment_flip, apply_pop, random_arange, count, Budget, \
+    timer, sample_route, summarize, ArrayTour, TwoLevelTour, move_node, get_node_distances, \
+    get_neighbor_lists, sorted_sum, watch_target_gap
 from .random_walk import random_walk
 from .greedy import greedy
+from .construction import nearest_neighbor, greedy_edge, hilbert_curve, double_tree
 
 
-def local_search(scenario, initiate_greedy=True, use_segment_flip=True, use_pop=True, time_limit=np.inf):
+# the ways local_search can build its initial route, each called with the scenario and the candidate neighbor lists
+CONSTRUCTIONS = {
+    'greedy': greedy,
+    'random': lambda scenario, neighbors: random_walk(scenario),
+    'nearest_neighbor': lambda scenario, neighbors: nearest_neighbor(scenario),
+    'greedy_edge': greedy_edge,
+    'hilbert': hilbert_curve,
+    'double_tree': double_tree,
+}
 
-    stop_time = time_stamp() + time_limit
+# the tour structures improve_tour can run on (see utils.tour)
+TOURS = {
+    'array': ArrayTour,
+    'two_level': TwoLevelTour,
+}
 
-    # initiate a route
-    if initiate_greedy:
-        route = scenario[greedy(scenario)]
+
+def local_search(scenario, initiate_greedy=True, use_segment_flip=True, use_pop=True, time_limit=np.inf, flip_mode='first',
+                 neighbors=None, use_queue=False, stats=None, distance_matrix=None, max_pop_length=1, budget=None,
+                 callback=None, construction=None, tour=None, initial_route=None, queued_nodes=None, target_gap=None):
+    # flip_mode: how segment flips are picked, 'first' or 'best' improvement (see utils.find_segment_flip)
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), when given the initial greedy route
+    # and the moves are restricted to them
+    # use_queue: improve the route node by node from a work queue with "don't-look" bits, instead of searching
+    # the whole route again after every move (see improve_from_queue)
+    # stats: a dict that gets filled with the amount of evaluated and accepted moves, and the moves evaluated per second,
+    # or a utils.Stats that also times the construction and the move searches and samples the route length
+    # distance_matrix: a distance matrix or oracle (see utils.get_distance_oracle) to look the distances up in
+    # instead of computing them from the scenario
+    # max_pop_length: pops move segments of up to this many consecutive nodes (or-opt), see utils.find_pop
+    # budget: a utils.Budget to stop by instead of time_limit, an iteration is one move search
+    # callback: called with the route after every accepted move, the route is changed in place afterwards
+    # construction: how the initial route is built, one of CONSTRUCTIONS (see algorithms.construction),
+    # 'greedy' or 'random' by initiate_greedy when not given
+    # tour: with use_queue, run the queue on this tour structure, one of TOURS, with 2-opt and single node
+    # or-opt moves (see improve_tour) instead of the route array
+    # initial_route: the route to improve (node indices) instead of constructing one
+    # queued_nodes: with use_queue, the nodes the queue starts with, such as the ones around the changes of a
+    # slightly changed initial_route, every node in random order when not given
+    # target_gap: stop once the route is within this share of a lower bound on its length (see
+    # utils.get_lower_bound), 0.01 for 1%. the bound takes up to a tenth of the budget's time
+
+    start_time = time_stamp()
+    budget = budget or Budget(time_limit)
+    if target_gap is not None:
+        budget, callback = watch_target_gap(scenario, target_gap, budget, callback, neighbors, stats)
+
+    # initiate a route of indices pointing to nodes in the scenario
+    if construction is None:
+        construction = 'greedy' if initiate_greedy else 'random'
+    if construction not in CONSTRUCTIONS:
+        raise ValueError('construction should be one of {}, got {!r}'.format(list(CONSTRUCTIONS), construction))
+    if initial_route is not None:
+        route = np.array(initial_route, dtype=np.int32)
     else:
-        route = scenario[random_walk(scenario)]
+        with timer(stats, 'construction'):
+            route = np.array(CONSTRUCTIONS[construction](scenario, neighbors), dtype=np.int32)
+
+    if queued_nodes is None:
+        queued_nodes = random_arange(len(route))
+
+    if use_queue and tour is not None:
+        if tour not in TOURS:
+            raise ValueError('tour should be one of {}, got {!r}'.format(list(TOURS), tour))
+        tour = TOURS[tour](route)
+        improve_tour(scenario, tour, queued_nodes, get_neighbor_lists(scenario) if neighbors is None else neighbors,
+                     budget, stats, distance_matrix, callback)
+        summarize(stats, 'local_search', start_time)
+        return tour.sequence().tolist()
 
-    while time_stamp() < stop_time:
+    if use_queue:
+        improve_from_queue(scenario, route, queued_nodes, budget, use_segment_flip, use_pop, flip_mode,
+                           neighbors, stats, distance_matrix=distance_matrix, max_pop_length=max_pop_length, callback=callback)
+        summarize(stats, 'local_search', start_time)
+        return route.tolist()
+
+    while not budget.exhausted():
+        budget.spend()
         if use_segment_flip:
             # the two endpoints of the segment to flip
-            segment_start, segment_end = find_segment_flip(route)
+            with timer(stats, 'find_segment_flip'):
+                segment_start, segment_end = find_segment_flip(route, mode=flip_mode, scenario=scenario,
+                                                               distance_matrix=distance_matrix, neighbors=neighbors, stats=stats)
 
             if segment_start is not None:
-                route[segment_start + 1: segment_end] = route[segment_end - 1: segment_start: -1]
+                apply_segment_flip(route, segment_start, segment_end)
+                count(stats, 'moves_accepted')
+                sample_route(stats, route, scenario, distance_matrix)
+                if callback is not None:
+                    callback(route)
                 continue
 
-        if use_pop:
-            pop_from, place_at = find_pop(route)
-            # if found a pop that shortens the route
+        if use_pop and improve_by_pop(route, scenario, distance_matrix, neighbors, stats, max_pop_length):
+            sample_route(stats, route, scenario, distance_matrix)
+            if callback is not None:
+                callback(route)
+            continue
+        break
+
+    summarize(stats, 'local_search', start_time)
+    return route.tolist()
+
+
+def improve_from_queue(scenario, route, queued_nodes, budget=None, use_segment_flip=True, use_pop=True,
+                       flip_mode='first', neighbors=None, stats=None, get_threshold=None, refill=False, distance_matrix=None,
+                       max_pop_length=1, callback=None):
+    # improve the route in place by looking for moves around one node at a time.
+    # each node has a "don't-look" bit, set while it is out of the queue: once no move around a node
+    # helps it is left alone, until a move touches one of its edges and queues it again.
+    # returns once the queue drains (a local optimum) or when the time is up.
+
+    # queued_nodes: the nodes to look at first, in order
+    # budget: a utils.Budget to stop by, an iteration is looking at one node. runs until done when not given
+    # get_threshold: called before looking at each node for the threshold of its moves (see utils.find_segment_flip),
+    # moves are only accepted if they shorten the route when not given
+    # refill: queue all the nodes again in random order whenever the queue drains, running until the time is up,
+    # each refill is counted as a restart
+    # distance_matrix, max_pop_length, callback: see local_search
+
+    # the moves are applied on an ArrayTour over the route, which keeps the positions up to date
+    tour = ArrayTour(route)
+    positions = tour.positions
+    queue = deque(int(node) for node in queued_nodes)
+    in_queue = np.zeros(len(route), dtype=bool)
+    in_queue[list(queue)] = True
+    budget = budget or Budget()
+
+    while not budget.exhausted():
+        if not queue:
+            if not refill:
+                break
+            queue.extend(int(node) for node in random_arange(len(route)))
+            in_queue[:] = True
+            count(stats, 'restarts')
+
+        node = queue.popleft()
+        in_queue[node] = False
+        budget.spend()
+        threshold = 0 if get_threshold is None else get_threshold()
+        touched_nodes = None
+
+        if use_segment_flip:
+            with timer(stats, 'find_segment_flip'):
+                segment_start, segment_end = find_segment_flip(route, threshold, mode=flip_mode, scenario=scenario,
+                                                               distance_matrix=distance_matrix, neighbors=neighbors,
+                                                               nodes=[node], positions=positions, stats=stats)
+            if segment_start is not None:
+                touched_nodes = get_nodes_at(route, [segment_start, segment_start + 1, segment_end - 1, segment_end])
+                tour.apply_segment_flip(segment_start, segment_end)
+
+        for segment_length in range(1, max_pop_length + 1):
+            if touched_nodes is not None or not use_pop:
+                break
+            with timer(stats, 'find_pop'):
+                pop_from, place_at = find_pop(route, threshold, scenario=scenario, distance_matrix=distance_matrix,
+                                              neighbors=neighbors, nodes=[node], positions=positions, stats=stats,
+                                              segment_length=segment_length)
             if pop_from is not None:
-                # simulating a python list pop() and insert() using math
+                segment_end = pop_from + segment_length
+                touched_nodes = get_nodes_at(route, [pop_from - 1, pop_from, segment_end - 1, segment_end, place_at - 1, place_at])
+                tour.apply_pop(pop_from, place_at, segment_length)
 
-                if pop_from > place_at:
-                    route[place_at:pop_from + 1] = route[np.r_[pop_from, place_at:pop_from]]
-                else:
-                    route[pop_from:place_at] = route[np.r_[pop_from + 1:place_at, pop_from]]
+        if touched_nodes is None:
+            continue
+
+        count(stats, 'moves_accepted')
+        sample_route(stats, route, scenario, distance_matrix)
+        if callback is not None:
+            callback(route)
+
+        # the nodes next to the changed edges are worth another look, the current one included
+        for touched_node in touched_nodes:
+            if not in_queue[touched_node]:
+                in_queue[touched_node] = True
+                queue.append(int(touched_node))
+
+
+def improve_tour(scenario, tour, queued_nodes, neighbors, budget=None, stats=None, distance_matrix=None, callback=None):
+    # improve_from_queue on a tour structure (see utils.tour) instead of the route array, nothing here depends on
+    # route positions. around each node the best of the 2-opt moves adding an edge to one of its candidate
+    # neighbors and the moves of the node itself next to one of them (or-opt) is applied, by flips only
+
+    # tour: an ArrayTour or a TwoLevelTour, changed in place
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists)
+    # budget, stats, distance_matrix: see improve_from_queue
+    # callback: called with the tour's route after every accepted move
+
+    def get_distances(nodes_a, nodes_b):
+        if distance_matrix is not None:
+            return distance_matrix[nodes_a, nodes_b]
+        return get_node_distances(scenario, nodes_a, nodes_b)
+
+    queue = deque(int(node) for node in queued_nodes)
+    in_queue = np.zeros(len(tour), dtype=bool)
+    in_queue[list(queue)] = True
+    budget = budget or Budget()
+
+    while queue and not budget.exhausted():
+        node = queue.popleft()
+        in_queue[node] = False
+        budget.spend()
+
+        with timer(stats, 'find_move'):
+            following, preceding = int(tour.next(node)), int(tour.prev(node))
+            candidates = neighbors[node]
+            nexts, prevs = tour.next(candidates), tour.prev(candidates)
+            to_candidates = get_distances(node, candidates)
+            to_following, to_preceding = get_distances(node, following), get_distances(node, preceding)
+            candidate_nexts, candidate_prevs = get_distances(candidates, nexts), get_distances(candidates, prevs)
+
+            # each gain is zero for the moves that don't change the route, such as a 2-opt with the
+            # following node as the candidate, except the or-opt moves masked out
+            bridged = get_distances(preceding, following)
+            gains = np.stack([
+                # 2-opt replacing the edges after the node and after the candidate
+                (to_candidates + get_distances(following, nexts)) - (to_following + candidate_nexts),
+                # 2-opt replacing the edges before the node and before the candidate
+                (to_candidates + get_distances(preceding, prevs)) - (to_preceding + candidate_prevs),
+                # the node moved to after the candidate
+                np.where(candidates != preceding, sorted_sum(bridged, to_candidates, get_distances(node, nexts)) -
+                         sorted_sum(to_preceding, to_following, candidate_nexts), np.inf),
+                # the node moved to before the candidate
+                np.where(candidates != following, sorted_sum(bridged, to_candidates, get_distances(node, prevs)) -
+                         sorted_sum(to_preceding, to_following, candidate_prevs), np.inf),
+            ])
+        count(stats, 'moves_evaluated', gains.size)
+
+        kind, best = np.unravel_index(np.argmin(gains), gains.shape)
+        if gains[kind, best] >= 0:
+            continue
+        candidate, candidate_next, candidate_prev = int(candidates[best]), int(nexts[best]), int(prevs[best])
+
+        if kind == 0:
+            tour.flip(following, candidate)
+        elif kind == 1:
+            tour.flip(candidate, preceding)
+        else:
+            move_node(tour, node, candidate if kind == 2 else candidate_prev)
+        count(stats, 'moves_accepted')
+        if callback is not None:
+            callback(tour.sequence())
+
+        # the nodes next to the changed edges are worth another look, the current one included
+        for touched_node in (node, following, preceding, candidate, candidate_next, candidate_prev):
+            if not in_queue[touched_node]:
+                in_queue[touched_node] = True
+                queue.append(touched_node)
+
+
+def improve_by_pop(route, scenario, distance_matrix=None, neighbors=None, stats=None, max_pop_length=1):
+    # apply the first pop that shortens the route, trying single nodes before longer segments.
+    # returns whether one was found
+    for segment_length in range(1, max_pop_length + 1):
+        with timer(stats, 'find_pop'):
+            pop_from, place_at = find_pop(route, scenario=scenario, distance_matrix=distance_matrix, neighbors=neighbors,
+                                          stats=stats, segment_length=segment_length)
+        # if found a pop that shortens the route
+        if pop_from is not None:
+            apply_pop(route, pop_from, place_at, segment_length)
+            count(stats, 'moves_accepted')
+            return True
+    return False
+
+
+def get_nodes_at(route, route_positions):
+    # the nodes at the given positions of the route, wrapping around its end
+    return route[np.array(route_positions) % len(route)]
 
-                continue
-        break
-    return xy_route_to_indices_route(scenario, route)
@@ -0,0 +1,230 @@
+import inspect
+import queue
+import random
+import numpy as np
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+from utils import calculate_journey_distance, get_neighbor_lists, get_lower_bound, time_stamp, Budget, summarize
+from .local_search import local_search
+from .simulated_annealing import advanced
+from .ant_colony_optimization import ant_colony_optimization
+
+# the solvers race runs when not told otherwise: (name, solver function, arguments), the names tell the
+# solvers apart in the report, so the same function can run with several variants of its arguments
+PORTFOLIO = [
+    ('local_search', local_search, {'use_queue': True}),
+    ('simulated_annealing.advanced', advanced, {'use_queue': True}),
+    ('ant_colony_optimization', ant_colony_optimization, {}),
+]
+
+# the fields at the start of the shared state, then a row per solver of its own shortest route's length, the
+# time it was found and the solver's restarts, then the incumbent route
+LENGTH, OWNER, FOUND_AT, STOP = range(4)
+NUM_FIELDS = 4
+SOLVER_FIELDS = ('length', 'time_to_best', 'restarts')
+
+
+def race(scenario, solvers=None, time_limit=10000, budget=None, patience=None, target_length=None, target_gap=None,
+         share_interval=None, report_interval=10, seed=None, callback=None, stats=None):
+    # run several solvers at once on the scenario, each in its own process, and return the shortest route any
+    # of them reaches. the scenario and the incumbent (the shortest route so far, its length, which solver
+    # found it and when) live in shared memory, every solver publishes its routes there as it goes. all of them
+    # stop at the deadline, once the incumbent is short enough or stalls, or when they've all finished.
+    # with share_interval the solvers that can start from a route (an initial_route argument) restart from the
+    # incumbent whenever another one holds a shorter route than theirs, warm started mid run
+
+    # solvers: a list of (name, solver function, arguments), PORTFOLIO when not given. every solver gets the
+    # budget and its own callback, and candidate neighbor lists built once for all of them if it takes them
+    # time_limit, budget: see local_search, the deadline is shared by all the solvers
+    # patience: stop once the incumbent hasn't gotten shorter for this many milliseconds, so a solver that
+    # dominates early doesn't wait for the others to finish
+    # target_length: stop once the incumbent is this short
+    # target_gap: stop once the incumbent is within this share of a lower bound (see utils.get_lower_bound),
+    # 0.01 for 1%. the bound is computed before the race starts
+    # share_interval: the least milliseconds between two checks of a solver for a shorter incumbent to restart
+    # from, no sharing when not given
+    # report_interval: the least milliseconds between two routes a solver publishes, since measuring a route
+    # costs about as much as a move. a solver's final route is always published
+    # seed: seeds every solver by (seed, its index), so their runs don't depend on each other
+    # callback: called with the incumbent route whenever it gets shorter, checked every report_interval
+    # stats: a dict or a utils.Stats (see local_search) that gets the 'winner' (the name of the solver that
+    # found the route), the 'time_to_best' (milliseconds from the start until it was found) and the 'solvers':
+    # per name the 'length' of its shortest route, its 'time_to_best', its 'restarts' and any 'error'
+
+    start_time = time_stamp()
+    budget = budget or Budget(time_limit)
+    solvers = PORTFOLIO if solvers is None else solvers
+    names = [name for name, _, _ in solvers]
+    if len(set(names)) != len(names):
+        raise ValueError('the solvers need different names, got {}'.format(names))
+    num_nodes, dimensions = scenario.shape
+    seed = np.random.randint(2 ** 31) if seed is None else seed
+
+    neighbors = get_neighbor_lists(scenario) if num_nodes > 10 else None
+    if target_gap is not None:
+        bound = get_lower_bound(scenario, neighbors, budget=Budget(time_limit=0.1 * (budget.deadline - time_stamp())))
+        target_length = min(target_length or np.inf, bound * (1 + target_gap))
+
+    # the memory comes first, so the solvers share the main process's resource tracker (see batch.SolverPool)
+    memory = [SharedMemory(create=True, size=max(scenario.nbytes, 1)),
+              SharedMemory(create=True, size=8 * (NUM_FIELDS + len(solvers) * len(SOLVER_FIELDS)) + 4 * num_nodes)]
+    shared_scenario, fields, table, incumbent = map_memory(memory, num_nodes, dimensions, len(solvers))
+    shared_scenario[:] = scenario
+    fields[:] = [np.inf, -1, np.inf, 0]
+    table[:] = [np.inf, np.nan, 0]
+
+    context = multiprocessing.get_context()
+    lock = context.Lock()
+    results = context.Queue()
+    processes = []
+    for index, (name, algorithm, params) in enumerate(solvers):
+        accepted = inspect.signature(algorithm).parameters
+        params = dict(params)
+        if 'neighbors' in accepted and neighbors is not None:
+            params.setdefault('neighbors', neighbors)
+        # only solvers that take a route can be warm started
+        interval = share_interval if 'initial_route' in accepted else None
+        processes.append(context.Process(
+            target=run_solver,
+            args=([block.name for block in memory], num_nodes, dimensions, len(solvers), lock, results, index, algorithm, params,
+                  budget.deadline, start_time, interval, report_interval, [seed, index])))
+    for process in processes:
+        process.start()
+
+    errors = {}
+    best_length, last_improvement, stop_time = np.inf, time_stamp(), np.inf
+    try:
+        finished = 0
+        while finished < len(processes):
+            try:
+                index, error = results.get(timeout=report_interval / 1000)
+                finished += 1
+                if error is not None:
+                    errors[names[index]] = error
+            except queue.Empty:
+                pass
+
+            with lock:
+                length, route = fields[LENGTH], incumbent.copy()
+            if length < best_length:
+                best_length, last_improvement = length, time_stamp()
+                if callback is not None:
+                    callback(route)
+
+            if fields[STOP] == 0 and (budget.exhausted() or (target_length is not None and best_length <= target_length) or
+                                      (patience is not None and time_stamp() - last_improvement >= patience)):
+                fields[STOP], stop_time = 1, min(time_stamp(), budget.deadline)
+            # the routes the solvers published are in the incumbent already, one that doesn't finish soon after
+            # the stop is ended
+            if time_stamp() > stop_time + 10 * report_interval:
+                break
+
+        with lock:
+            winner, found_at, route = int(fields[OWNER]), fields[FOUND_AT], incumbent.tolist()
+        # a solver that never published a route has no time_to_best
+        solver_stats = {name: {'length': length, 'time_to_best': None if np.isnan(found) else found, 'restarts': int(restarts),
+                               'error': errors.get(name)} for name, (length, found, restarts) in zip(names, table.tolist())}
+        if winner < 0:
+            raise RuntimeError('no solver reached a route: {}'.format('; '.join(errors.values()) or 'out of time'))
+    finally:
+        # the solvers aren't daemons, so they can have worker pools of their own
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        del shared_scenario, fields, table, incumbent
+        for block in memory:
+            block.close()
+            block.unlink()
+
+    if stats is not None:
+        stats['winner'] = names[winner]
+        stats['time_to_best'] = found_at
+        stats['solvers'] = solver_stats
+    summarize(stats, 'portfolio.race', start_time)
+    return route
+
+
+def map_memory(memory, num_nodes, dimensions, num_solvers):
+    # the views of the shared blocks: the scenario, the fields (see LENGTH), the solvers' rows and the incumbent
+    scenario = np.ndarray((num_nodes, dimensions), dtype=np.float64, buffer=memory[0].buf)
+    fields = np.ndarray(NUM_FIELDS, dtype=np.float64, buffer=memory[1].buf)
+    table = np.ndarray((num_solvers, len(SOLVER_FIELDS)), dtype=np.float64, buffer=memory[1].buf, offset=8 * NUM_FIELDS)
+    incumbent = np.ndarray(num_nodes, dtype=np.int32, buffer=memory[1].buf, offset=8 * (NUM_FIELDS + table.size))
+    return scenario, fields, table, incumbent
+
+
+class RestartToken:
+    # the cancel token of a solver in the race: set once the race stops, or, checked at most every
+    # share_interval, once the incumbent is shorter than the shortest route the solver held
+
+    def __init__(self, fields, get_held_length, share_interval=None):
+        self.fields = fields
+        self.get_held_length = get_held_length
+        self.share_interval = share_interval
+        self.next_check = time_stamp() + (share_interval or 0)
+
+    def is_set(self):
+        if self.fields[STOP] != 0:
+            return True
+        if self.share_interval is None or time_stamp() < self.next_check:
+            return False
+        self.next_check = time_stamp() + self.share_interval
+        return self.fields[LENGTH] < self.get_held_length()
+
+
+def run_solver(memory_names, num_nodes, dimensions, num_solvers, lock, results, index, algorithm, params, deadline,
+               start_time, share_interval, report_interval, entropy):
+    # runs in the solver's process: the solver runs, restarted from the incumbent whenever the token asks for it
+    # or it finishes with the incumbent shorter than its own route. its shortest route goes to its row of the
+    # table as it's found, (index, error) to the results queue once it's done
+    state = np.random.SeedSequence(entropy).generate_state(1)
+    np.random.seed(state)
+    random.seed(int(state[0]))
+    memory = [SharedMemory(name=name) for name in memory_names]
+    scenario, fields, table, incumbent = map_memory(memory, num_nodes, dimensions, num_solvers)
+    row = table[index]
+    # held: the shortest route the solver found or was restarted from
+    own = {'held': np.inf, 'last_report': -np.inf}
+    error = None
+
+    def publish(route, force=False):
+        now = time_stamp()
+        if not force and now - own['last_report'] < report_interval:
+            return
+        own['last_report'] = now
+        length = calculate_journey_distance(scenario[np.asarray(route)])
+        if length < row[0]:
+            row[:2] = [length, now - start_time]
+        own['held'] = min(own['held'], length)
+        if length < fields[LENGTH]:
+            with lock:
+                if length < fields[LENGTH]:
+                    incumbent[:] = route
+                    fields[[LENGTH, OWNER, FOUND_AT]] = [length, index, now - start_time]
+
+    try:
+        initial_route = None
+        while True:
+            token = RestartToken(fields, lambda: own['held'], share_interval)
+            kwargs = dict(params) if initial_route is None else dict(params, initial_route=initial_route)
+            # the budget starts with the race, so a schedule over its progress (such as the annealing's temperature)
+            # goes on where it was after a restart instead of starting over
+            budget = Budget(deadline=deadline, cancel_token=token)
+            budget.start_time = start_time
+            route = algorithm(scenario, budget=budget, callback=publish, **kwargs)
+            publish(route, force=True)
+            if share_interval is None or fields[STOP] != 0 or time_stamp() >= deadline:
+                break
+            with lock:
+                if not fields[LENGTH] < own['held']:
+                    break
+                initial_route, own['held'] = incumbent.copy(), fields[LENGTH]
+            row[2] += 1
+    except Exception as exception:
+        error = '{}: {!r}'.format(getattr(algorithm, '__name__', algorithm), exception)
+    finally:
+        del scenario, fields, table, row, incumbent
+        for block in memory:
+            block.close()
+        results.put((index, error))
@@ -1,2 +1,3 @@
 from .basic import simulated_annealing as basic
 from .advanced import simulated_annealing as advanced
+from .parallel import parallel_annealing
@@ -1,9 +1,13 @@
 import numpy as np
-from utils import time_stamp, xy_route_to_indices_route, find_segment_flip, find_pop, get_average_edge_length, calculate_journey_distance
+from utils import find_segment_flip, find_pop, apply_segment_flip, apply_pop, get_average_edge_length, random_arange, Budget, \
+    count, timer, sample_route, summarize, watch_target_gap
+from ..local_search import improve_from_queue
 from .tools import get_temperature
 
 
-def simulated_annealing(scenario, time_limit=40000, use_flips=True, use_pops=True):
+def simulated_annealing(scenario, time_limit=40000, use_flips=True, use_pops=True, neighbors=None, use_queue=False,
+                        distance_matrix=None, budget=None, callback=None, stats=None, initial_route=None,
+                        temperature_schedule=None, target_gap=None):
     # simulated annealing (described here: # https://en.wikipedia.org/wiki/Simulated_annealing)
     # is generally an optimization algorithm that tweaks the state by a little each time
     # until reaching optimum. in order not to get stuck in local optima, the process sometimes
@@ -15,47 +19,80 @@ def simulated_annealing(scenario, time_limit=40000, use_flips=True, use_pops=Tru
     # flips and node pops.
 
     # time_limit: amount of allowed computation time in milliseconds
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists) to restrict the moves to
+    # use_queue: pick the nodes to tweak around from a work queue with "don't-look" bits
+    # (see local_search.improve_from_queue) instead of searching the whole route for each tweak
+    # distance_matrix: a distance matrix or oracle (see utils.get_distance_oracle) to look the distances up in
+    # budget: a utils.Budget to stop by instead of time_limit, the temperature is lowered over its time or
+    # iterations (one iteration per tweak attempt, or per node looked at with use_queue)
+    # callback: called with the route after every tweak, the route is changed in place afterwards
+    # stats: a dict or a utils.Stats to report the evaluated and accepted tweaks in, see local_search
+    # initial_route: the route to start from (node indices), a random one when not given
+    # temperature_schedule: a function of the budget's progress (from 0 to 1) giving the temperature,
+    # tools.get_temperature when not given
+    # target_gap: stop once the route is within this share of a lower bound on its length, see local_search
 
-    start_time = time_stamp()
+    budget = budget or Budget(time_limit)
+    if target_gap is not None:
+        budget, callback = watch_target_gap(scenario, target_gap, budget, callback, neighbors, stats)
+    temperature_schedule = temperature_schedule or (lambda progress: get_temperature(progress, 1))
     counter = 0
     # normalizer that makes the scale (width and height) of the scenario irrelevant
     distance_normalizer = get_average_edge_length(scenario)
 
-    # initiate a route randomly
-    route = scenario.copy()
-    np.random.shuffle(route)
+    # initiate a route of indices pointing to nodes in the scenario randomly
+    if initial_route is None:
+        route = np.random.permutation(scenario.shape[0]).astype(np.int32)
+    else:
+        route = np.array(initial_route, dtype=np.int32)
 
-    while time_stamp() < start_time + time_limit:
+    if use_queue:
+        improve_from_queue(
+            scenario, route, random_arange(len(route)), budget, use_flips, use_pops, neighbors=neighbors,
+            get_threshold=lambda: get_random_threshold(temperature_schedule(budget.progress()), distance_normalizer),
+            refill=True, distance_matrix=distance_matrix, callback=callback, stats=stats
+        )
+        summarize(stats, 'simulated_annealing.advanced', budget.start_time)
+        return route.tolist()
+
+    while not budget.exhausted():
+        budget.spend()
         # figure the current temperature
-        stamp = time_stamp()
-        temperature = get_temperature(stamp - start_time, time_limit)
+        temperature = temperature_schedule(budget.progress())
 
         # get a random threshold, route length changes below that threshold will be accepted
         random_threshold = get_random_threshold(temperature, distance_normalizer)
 
         if use_flips:
             # the two endpoints of the segment to flip
-            segment_start, segment_end = find_segment_flip(route, threshold=random_threshold)
+            with timer(stats, 'find_segment_flip'):
+                segment_start, segment_end = find_segment_flip(route, threshold=random_threshold, scenario=scenario,
+                                                               distance_matrix=distance_matrix, neighbors=neighbors, stats=stats)
 
             # if succeeded to find a flip below the threshold
             if segment_start is not None:
-                route[segment_start + 1: segment_end] = route[segment_end - 1: segment_start: -1]
+                apply_segment_flip(route, segment_start, segment_end)
                 counter += 1
+                count(stats, 'moves_accepted')
+                sample_route(stats, route, scenario, distance_matrix)
+                if callback is not None:
+                    callback(route)
 
         if use_pops:
-            pop_from, place_at = find_pop(route, threshold=random_threshold)
+            with timer(stats, 'find_pop'):
+                pop_from, place_at = find_pop(route, threshold=random_threshold, scenario=scenario,
+                                              distance_matrix=distance_matrix, neighbors=neighbors, stats=stats)
             # if succeeded to find a pop below the threshold
             if pop_from is not None:
-                # simulating a python list pop() and insert() using math
-
-                if pop_from > place_at:
-                    route[place_at:pop_from + 1] = route[np.r_[pop_from, place_at:pop_from]]
-                else:
-                    route[pop_from:place_at] = route[np.r_[pop_from + 1:place_at, pop_from]]
+                apply_pop(route, pop_from, place_at)
+                count(stats, 'moves_accepted')
+                sample_route(stats, route, scenario, distance_matrix)
+                if callback is not None:
+                    callback(route)
                 continue
-    # turn the coordinates route to indices route each pointing
-    # to its corresponding node in the original scenario array.
-    return xy_route_to_indices_route(scenario, route)
+
+    summarize(stats, 'simulated_annealing.advanced', budget.start_time)
+    return route.tolist()
 
 
 def get_random_threshold(temperature, distance_normalizer):
@@ -1,9 +1,14 @@
 import numpy as np
-from utils import time_stamp, xy_route_to_indices_route, get_average_edge_length
-from .tools import get_temperature
+from utils import calculate_journey_distance, get_average_edge_length, get_position_distances, Budget, count, timer, sample_route, \
+    summarize
+from .tools import get_temperature, build_sum_tree, update_sum_tree, sample_sum_tree
 
+# the lowest temperature the thresholds are computed at, a schedule reaching 0 would divide by it
+MIN_TEMPERATURE = 1e-6
 
-def simulated_annealing(scenario, time_limit=20000):
+
+def simulated_annealing(scenario, time_limit=20000, temperature_steps=200, budget=None, callback=None, stats=None,
+                        initial_route=None, temperature_schedule=None):
     # simulated annealing (described here: # https://en.wikipedia.org/wiki/Simulated_annealing)
     # is generally an optimization algorithm that tweaks the state by a little each time
     # until reaching optimum. in order not to get stuck in local optima, the process sometimes
@@ -13,51 +18,88 @@ def simulated_annealing(scenario, time_limit=20000):
 
     # the basic version only mutates the route using swaps, AKA a swap between two consecutive nodes
 
-    # time_limit: amount of allowed computation time in milliseconds
+    # the swaps are picked rejection free: each iteration makes a swap, chosen with a chance relative to its
+    # threshold (see get_thresholds). the thresholds are kept in a sum tree, so a pick costs O(log n) instead
+    # of a scan over all of them, and only the few thresholds affected by a swap are updated. since every
+    # iteration swaps, the route keeps wandering around the optimum late in the run, the shortest route it
+    # passed is returned rather than the last one
 
-    start_time = time_stamp()
+    # time_limit: amount of allowed computation time in milliseconds
+    # temperature_steps: the temperature is lowered in this many steps over the time limit, since
+    # every change of it recomputes all the thresholds
+    # budget: a utils.Budget to stop by instead of time_limit, an iteration is one swap
+    # callback: called with the route after every swap, the route is changed in place afterwards
+    # stats: a dict or a utils.Stats (see local_search), the evaluated moves are the energies computed
+    # initial_route: the route to start from (node indices), a random one when not given
+    # temperature_schedule: a function of the budget's progress (from 0 to 1) giving the temperature,
+    # tools.get_temperature when not given
+
+    budget = budget or Budget(time_limit)
+    temperature_schedule = temperature_schedule or (lambda progress: get_temperature(progress, 1))
 
     scenario_len = scenario.shape[0]
 
     # normalizer that makes the scale (width and height) of the scenario irrelevant
     distance_normalizer = get_average_edge_length(scenario)
 
-    # initiate a route randomly
-    route = scenario.copy()
-    np.random.shuffle(route)
+    # initiate a route of indices pointing to nodes in the scenario randomly
+    if initial_route is None:
+        route = np.random.permutation(scenario_len).astype(np.int32)
+    else:
+        route = np.array(initial_route, dtype=np.int32)
 
     # score of each possible swap
-    energy_deltas = get_energy_deltas(route, distance_normalizer, np.arange(scenario_len))
-
-    while time_stamp() < start_time + time_limit:
-        # figure the current temperature
-        stamp = time_stamp()
-        temperature = get_temperature(stamp - start_time, time_limit)
-
-        # get the thresholds for all swaps
-        thresholds = get_thresholds(energy_deltas, temperature)
-
-        # get a random number
-        random_num = np.random.random()
-
-        # get a random swap with threshold above the random number
-        available_swaps = np.arange(thresholds.shape[0])[thresholds > random_num]
-
-        if available_swaps.size > 0:
-            winner_swap = np.random.choice(available_swaps, 1)[0]
-
-            # swap the nodes
-            i, j = swap_index_to_node_indices(winner_swap, scenario_len)
-            route[[i, j]] = route[[j, i]]
-
-            # recalculate the affected energies
-            affected_indices = get_indices_affected_by_swap(winner_swap, scenario_len)
-            new_energy_deltas = get_energy_deltas(route, distance_normalizer, affected_indices)
-            energy_deltas[affected_indices] = new_energy_deltas
-
-    # turn the coordinates route to indices route each pointing
-    # to its corresponding node in the original scenario array.
-    return xy_route_to_indices_route(scenario, route)
+    with timer(stats, 'get_energy_deltas'):
+        energy_deltas = get_energy_deltas(route, distance_normalizer, np.arange(scenario_len), scenario)
+    count(stats, 'moves_evaluated', scenario_len)
+
+    # the length of the route is followed swap by swap, and the shortest route is copied only when a swap is
+    # about to make it longer, so the copies are few
+    length = calculate_journey_distance(scenario[route])
+    best_length, best_route = np.inf, None
+    next_temperature_step = 0
+
+    while not budget.exhausted():
+        budget.spend()
+        progress = budget.progress()
+
+        if progress >= next_temperature_step:
+            # figure the current temperature and the thresholds for all swaps
+            temperature = temperature_schedule(progress)
+            with timer(stats, 'temperature_steps'):
+                thresholds = build_sum_tree(get_thresholds(energy_deltas, temperature))
+            next_temperature_step = progress + 1 / temperature_steps
+
+        # nothing can pass once the temperature gets too low for the thresholds to hold
+        if not thresholds[1] > 0:
+            continue
+
+        # get a random swap, each by its threshold
+        winner_swap = sample_sum_tree(thresholds, np.random.random() * thresholds[1])
+
+        delta = energy_deltas[winner_swap] * distance_normalizer
+        if delta > 0 and length < best_length:
+            best_length, best_route = length, route.copy()
+        length += delta
+
+        # swap the nodes
+        i, j = swap_index_to_node_indices(winner_swap, scenario_len)
+        route[[i, j]] = route[[j, i]]
+        count(stats, 'moves_accepted')
+        sample_route(stats, route, scenario)
+        if callback is not None:
+            callback(route)
+
+        # recalculate the affected energies
+        affected_indices = get_indices_affected_by_swap(winner_swap, scenario_len)
+        with timer(stats, 'get_energy_deltas'):
+            new_energy_deltas = get_energy_deltas(route, distance_normalizer, affected_indices, scenario)
+        count(stats, 'moves_evaluated', len(affected_indices))
+        energy_deltas[affected_indices] = new_energy_deltas
+        update_sum_tree(thresholds, affected_indices, get_thresholds(new_energy_deltas, temperature))
+
+    summarize(stats, 'simulated_annealing.basic', budget.start_time)
+    return route.tolist() if length < best_length else best_route.tolist()
 
 
 def swap_index_to_node_indices(i, scenario_length):
@@ -66,11 +108,10 @@ def swap_index_to_node_indices(i, scenario_length):
 
 
 def get_thresholds(energies, temperature):
-    # calculate a threshold for the activation of each route mutation
-    return np.minimum(
-        np.exp(-1 * energies / temperature),
-        1
-    )
+    # calculate a threshold for the activation of each route mutation, the temperature is kept above
+    # MIN_TEMPERATURE and the exponent at most 0 (a threshold of 1), so neither divides nor overflows
+    temperature = max(temperature, MIN_TEMPERATURE)
+    return np.exp(np.minimum(-1 * energies / temperature, 0))
 
 
 def get_indices_affected_by_swap(swap_index, scenario_length):
@@ -78,27 +119,26 @@ def get_indices_affected_by_swap(swap_index, scenario_length):
     return np.arange(swap_index - 2, swap_index + 3) % scenario_length
 
 
-def get_energy_deltas(route, normalizer, relevant_indices):
+def get_energy_deltas(route, normalizer, relevant_indices, scenario=None):
     # calculate the change in energy (score) for each permutation of swapping two consecutive nodes
     # in the route
 
     # normalizer: a scalar to make sure the size of the scenario's field doesn't affect the energies.
-    
-    # create four rolled versions of the graph (a swap affects edges between 4 nodes)
-    matrices = [np.roll(route, 1 - n, axis=0)[relevant_indices] for n in range(4)]
-    
-    # calculate the vectors of the two edges added and two edges removed by each swap
-    # the four vector groups are piled up for efficiency
-    piled_edge_vectors = np.concatenate((
-        matrices[2] - matrices[0],
-        matrices[3] - matrices[1],
-        matrices[1] - matrices[0],
-        matrices[3] - matrices[2]
-    ))
-
-    # figure the magnitude of each vector and split them back to initial four groups
-    norms = np.linalg.norm(piled_edge_vectors, axis=1)
-    unpiled_norms = np.split(norms, 4)
+    # scenario: when given, the route holds indices into it instead of coordinates
+
+    # positions of the four nodes around each swap (a swap affects edges between 4 nodes),
+    # only the relevant ones are looked up so updating a few energies doesn't cost a pass over the route
+    positions = [(relevant_indices + n - 1) % len(route) for n in range(4)]
+
+    # calculate the magnitudes of the two edges added and two edges removed by each swap
+    # the four groups are piled up for efficiency
+    norms = get_position_distances(
+        route,
+        np.concatenate((positions[2], positions[3], positions[1], positions[3])),
+        np.concatenate((positions[0], positions[1], positions[0], positions[2])),
+        scenario
+    )
+    unpiled_norms = norms.reshape(4, -1)
 
     # subtract the magnitudes of the two removed edges from the two added ones to get the total change of
     # journey length by each swap, then divide it by the normalizer.
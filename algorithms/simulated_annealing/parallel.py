@@ -0,0 +1,165 @@
+import numpy as np
+from multiprocessing import Pool
+from utils import get_average_edge_length, calculate_journey_distance, time_stamp, Budget, count, timer, record, summarize
+from .basic import simulated_annealing as basic
+from .advanced import simulated_annealing as advanced
+from .tools import get_temperature
+
+# the chains parallel_annealing can run, and the time limit of each when none is given
+VARIANTS = {
+    'basic': (basic, 20000),
+    'advanced': (advanced, 40000),
+}
+
+# the scenario and the chain arguments inside a worker process, set by attach_worker
+worker_state = {}
+
+
+def parallel_annealing(scenario, variant='advanced', mode='multi_start', num_workers=4, time_limit=None, num_replicas=None,
+                       exchange_interval=1000, exchange_iterations=None, temperature_ratio=4, seed=None, budget=None,
+                       callback=None, stats=None, **kwargs):
+    # several simulated annealing chains in as many processes, sharing the wall clock time of a single chain.
+    # the scenario is sent to every process once, after that only index routes travel between them.
+    # mode 'multi_start' runs independent chains from different random routes over the whole time and keeps
+    # the shortest route. mode 'tempering' runs replicas on a ladder of temperatures, the coldest one on the
+    # chain's own schedule and every next one hotter by a constant factor, in rounds. after each round
+    # neighboring replicas swap their routes by the replica exchange rule, so good routes sink to the cold
+    # end while the hot replicas keep exploring
+
+    # variant: 'basic' or 'advanced', the chain to run (see VARIANTS)
+    # num_workers: the amount of worker processes
+    # time_limit: the wall clock milliseconds of the whole run, the variant's own default when not given
+    # num_replicas: the amount of chains, one per worker when not given
+    # exchange_interval: milliseconds between two exchanges of 'tempering'
+    # exchange_iterations: iterations of each replica between two exchanges instead of exchange_interval,
+    # with a seed and an iteration budget the whole run is reproducible
+    # temperature_ratio: the hottest replica's temperature over the coldest one's, the ladder is geometric
+    # seed: seeds every chain by (seed, round, chain) and the exchanges, so the random numbers don't depend on
+    # the scheduling of the processes
+    # budget: a utils.Budget to stop by instead of time_limit, its iterations are the iterations of each chain
+    # with 'multi_start' and the rounds with 'tempering'. a cancel token is only checked between rounds
+    # callback: called with the shortest route so far after every round, or once by 'multi_start'
+    # stats: a dict or a utils.Stats (see local_search) for the 'rounds', 'exchanges' and 'exchanges_accepted',
+    # a Stats also times the rounds and records the 'replica_lengths' and 'replica_temperatures' after each one
+    # kwargs: passed on to every chain, such as neighbors or use_queue for the advanced variant
+
+    if variant not in VARIANTS:
+        raise ValueError('variant should be one of {}, got {!r}'.format(list(VARIANTS), variant))
+    if mode not in ('multi_start', 'tempering'):
+        raise ValueError("mode should be 'multi_start' or 'tempering', got {!r}".format(mode))
+
+    budget = budget or Budget(VARIANTS[variant][1] if time_limit is None else time_limit)
+    num_replicas = num_replicas or num_workers
+    seed = np.random.randint(2 ** 31) if seed is None else seed
+
+    with Pool(num_workers, initializer=attach_worker, initargs=(scenario, variant, kwargs)) as pool:
+        if mode == 'multi_start':
+            with timer(stats, 'rounds'):
+                tasks = [(None, None, budget.deadline, budget.max_iterations, [seed, 0, chain]) for chain in range(num_replicas)]
+                results = pool.map(run_chain, tasks)
+            count(stats, 'rounds')
+            route, length = min(results, key=lambda result: result[1])
+            record(stats, 'replica_lengths', [length for _, length in results])
+            if callback is not None:
+                callback(route)
+        else:
+            route = run_tempering(scenario, pool, budget, num_replicas, exchange_interval, exchange_iterations,
+                                  temperature_ratio, seed, callback, stats)
+
+    summarize(stats, 'simulated_annealing.parallel', budget.start_time)
+    return route.tolist()
+
+
+def run_tempering(scenario, pool, budget, num_replicas, exchange_interval, exchange_iterations, temperature_ratio, seed,
+                  callback=None, stats=None):
+    # the rounds of parallel_annealing's 'tempering' mode, returns the shortest route seen
+    random = np.random.RandomState(np.random.SeedSequence([seed]).generate_state(1))
+    # the energies of the chains are route lengths over the average edge length (see advanced.get_random_threshold)
+    distance_normalizer = get_average_edge_length(scenario)
+    ladder = np.geomspace(1, temperature_ratio, num_replicas)
+    routes = [None] * num_replicas
+    best_route, best_length = None, np.inf
+    iterations_per_round = np.inf if exchange_iterations is None else exchange_iterations
+    round_index = 0
+    # how long the last round took and where it ended in the schedule
+    round_time, end_progress = 0, 0
+
+    while not budget.exhausted():
+        # the part of the schedule the round covers, by its iterations or its time. a round of iterations
+        # under a deadline is expected to take as long as the last one, whichever budget runs out sooner sets
+        # it. it starts where the last round ended when that was further, so the replicas never heat up again
+        start_progress = max(budget.progress(), end_progress)
+        round_start = time_stamp()
+        if exchange_iterations is not None:
+            deadline = budget.deadline
+            end_progress = (budget.iterations + 1) / budget.max_iterations if budget.max_iterations < np.inf else start_progress
+            if budget.deadline < np.inf:
+                end_progress = max(end_progress, (round_start + round_time - budget.start_time) /
+                                   max(budget.deadline - budget.start_time, 1e-9))
+            end_progress = min(max(end_progress, start_progress), 1)
+        else:
+            deadline = min(budget.deadline, time_stamp() + exchange_interval)
+            end_progress = (deadline - budget.start_time) / (budget.deadline - budget.start_time) \
+                if budget.deadline < np.inf else start_progress
+
+        with timer(stats, 'rounds'):
+            tasks = [((routes[replica], (scale, start_progress, end_progress), deadline, iterations_per_round,
+                       [seed, round_index, replica])) for replica, scale in enumerate(ladder)]
+            results = pool.map(run_chain, tasks)
+        budget.spend()
+        round_time = time_stamp() - round_start
+        round_index += 1
+        count(stats, 'rounds')
+
+        routes = [route for route, _ in results]
+        lengths = [length for _, length in results]
+        record(stats, 'replica_lengths', lengths)
+        shortest = int(np.argmin(lengths))
+        if lengths[shortest] < best_length:
+            best_route, best_length = routes[shortest].copy(), lengths[shortest]
+            if callback is not None:
+                callback(best_route)
+
+        # exchange between the even or the odd pairs of neighboring temperatures, in turns, at the
+        # temperatures the round ended at
+        temperatures = ladder * get_temperature(min(end_progress, 1), 1)
+        record(stats, 'replica_temperatures', temperatures.tolist())
+        for replica in range(round_index % 2, num_replicas - 1, 2):
+            hotter = replica + 1
+            if not temperatures[replica] > 0:
+                continue
+            count(stats, 'exchanges')
+            exponent = (lengths[replica] - lengths[hotter]) / distance_normalizer * \
+                (1 / temperatures[replica] - 1 / temperatures[hotter])
+            if exponent >= 0 or random.random() < np.exp(exponent):
+                count(stats, 'exchanges_accepted')
+                routes[replica], routes[hotter] = routes[hotter], routes[replica]
+                lengths[replica], lengths[hotter] = lengths[hotter], lengths[replica]
+
+    return best_route
+
+
+def attach_worker(scenario, variant, kwargs):
+    # runs once in every worker
+    worker_state['scenario'] = scenario
+    worker_state['solver'] = VARIANTS[variant][0]
+    worker_state['kwargs'] = kwargs
+
+
+def run_chain(task):
+    # one chain from the given route (a random one when None) until the deadline or after the iterations.
+    # its schedule is a (scale, start, end) part of tools.get_temperature, the chain's own when None.
+    # returns the route and its length
+    route, schedule, deadline, max_iterations, entropy = task
+    np.random.seed(np.random.SeedSequence(entropy).generate_state(1))
+    scenario = worker_state['scenario']
+
+    temperature_schedule = None
+    if schedule is not None:
+        scale, start, end = schedule
+        temperature_schedule = lambda progress: scale * get_temperature(start + (end - start) * progress, 1)
+
+    route = worker_state['solver'](scenario, budget=Budget(deadline=deadline, max_iterations=max_iterations),
+                                   initial_route=route, temperature_schedule=temperature_schedule, **worker_state['kwargs'])
+    route = np.array(route, dtype=np.int32)
+    return route, calculate_journey_distance(scenario[route])
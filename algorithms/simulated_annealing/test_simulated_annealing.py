@@ -1,6 +1,10 @@
 import numpy as np
-from utils import calculate_journey_distance, generate_scenario, get_average_edge_length
+from utils import calculate_journey_distance, generate_scenario, get_average_edge_length, Budget, Stats
 from .basic import get_energy_deltas, swap_index_to_node_indices
+from .basic import simulated_annealing as basic
+from .advanced import simulated_annealing as advanced
+from .parallel import parallel_annealing
+from .tools import build_sum_tree, update_sum_tree, sample_sum_tree
 
 
 def test_energy_function():
@@ -31,3 +35,60 @@ def test_energy_function():
         # compare'em
         post_distance = calculate_journey_distance(temp_scenario) / normalizer
         assert(round(pre_distance + energies[i], 3) == round(post_distance, 3))
+
+
+def test_duplicate_nodes():
+    # the returned routes are permutations of the scenario even when nodes share coordinates
+    scenario = generate_scenario(12)
+    scenario[5] = scenario[2]
+
+    for algorithm in [basic, advanced]:
+        route = algorithm(scenario, time_limit=50)
+        assert (sorted(route) == list(range(12)))
+
+
+def test_basic_returns_shortest():
+    # the route returned is the shortest one the swaps passed, also with a schedule down to temperature 0
+    scenario = generate_scenario(30)
+    for schedule in [None, lambda progress: 0.0]:
+        lengths = []
+        route = basic(scenario, budget=Budget(max_iterations=3000), temperature_schedule=schedule,
+                      callback=lambda route: lengths.append(calculate_journey_distance(scenario[route])))
+        assert (sorted(route) == list(range(30)))
+        assert (calculate_journey_distance(scenario[route]) <= min(lengths) + 1e-9)
+
+
+def test_sum_tree():
+    # the tree keeps the total of its weights through updates, and samples the leaf a value falls on
+    weights = np.array([1.0, 0.0, 2.0, 0.5, 1.5])
+    tree = build_sum_tree(weights)
+    assert (tree[1] == 5)
+
+    weights[[1, 4]] = [3.0, 0.0]
+    update_sum_tree(tree, [1, 4], [3.0, 0.0])
+    assert (tree[1] == 6.5)
+
+    cumulative = np.cumsum(weights)
+    for value in np.linspace(0, 6.5, 50, endpoint=False):
+        assert (sample_sum_tree(tree, value) == np.searchsorted(cumulative, value, side='right'))
+
+    # a value rounded past the total still lands on a weighted leaf
+    assert (sample_sum_tree(tree, 7) == 3)
+
+
+def test_parallel_annealing():
+    # both modes return a permutation, and with an iteration budget the same seed gives the same route
+    scenario = generate_scenario(30)
+    for mode in ['multi_start', 'tempering']:
+        routes = [parallel_annealing(scenario, 'advanced', mode, num_workers=2, budget=Budget(max_iterations=4),
+                                     exchange_iterations=50, seed=0) for _ in range(2)]
+        assert (sorted(routes[0]) == list(range(30)))
+        assert (routes[0] == routes[1])
+
+    # rounds of iterations under a time limit still follow the schedule, the cold replica cools round by round
+    stats = Stats()
+    parallel_annealing(scenario, 'advanced', 'tempering', num_workers=2, time_limit=2000, exchange_iterations=200,
+                       stats=stats, seed=0)
+    coldest = [temperatures[0] for temperatures in stats['replica_temperatures']]
+    assert (len(coldest) >= 3 and coldest[-1] < coldest[1] < coldest[0])
+    assert (all(later <= earlier for earlier, later in zip(coldest, coldest[1:])))
@@ -1,6 +1,55 @@
+import numpy as np
+
+
 def get_temperature(time_passed, total_time, cooling_scalar=2):
     # determines the temperature AKA the relative likelihood of bad swaps
     # to be picked
     # cooling_scalar: higher values lean more towards good swaps
 
     return (1 - (time_passed / total_time)) ** 2 / cooling_scalar
+
+
+# a sum tree is a binary tree over a set of weights where every node holds the sum of its two children,
+# stored in a list: the root at 1, the children of node i at 2i and 2i + 1, and the leaves at the end.
+# it samples a weight proportionally and updates one in O(log n). it's built with numpy but walked as a
+# python list, which is much faster for single items
+
+
+def build_sum_tree(weights):
+    capacity = 1 << max(len(weights) - 1, 0).bit_length()
+    tree = np.zeros(2 * capacity)
+    tree[capacity: capacity + len(weights)] = weights
+
+    # fill a whole level at a time, from the leaves up
+    level = capacity
+    while level > 1:
+        tree[level // 2: level] = tree[level: 2 * level: 2] + tree[level + 1: 2 * level: 2]
+        level //= 2
+    return tree.tolist()
+
+
+def update_sum_tree(tree, indices, weights):
+    # set the weights of the given leaves and fix the sums above them
+    capacity = len(tree) // 2
+    nodes = set()
+    for index, weight in zip(np.asarray(indices).tolist(), np.asarray(weights).tolist()):
+        tree[capacity + index] = weight
+        nodes.add((capacity + index) // 2)
+
+    while nodes:
+        for node in nodes:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+        nodes = {node // 2 for node in nodes if node > 1}
+
+
+def sample_sum_tree(tree, value):
+    # the leaf where a value between 0 and the total weight falls, going over the leaves in order
+    capacity = len(tree) // 2
+    node = 1
+    while node < capacity:
+        node *= 2
+        # rounding can leave the value a bit above a subtree's total, never step into an empty one
+        if value >= tree[node] and tree[node + 1] > 0:
+            value -= tree[node]
+            node += 1
+    return node - capacity
@@ -0,0 +1,48 @@
+import threading
+import numpy as np
+from utils import calculate_journey_distance, generate_scenario, time_stamp, Budget
+from .anytime import solve_iter
+from .local_search import local_search
+from .simulated_annealing import advanced
+
+
+def test_solve_iter():
+    # every yielded route is a valid route, shorter than the one before it
+    scenario = generate_scenario(40)
+    results = list(solve_iter(scenario, local_search, report_interval=0))
+    assert (len(results) > 0)
+
+    lengths = [route_length for _, route_length, _ in results]
+    assert (lengths == sorted(lengths, reverse=True) and len(set(lengths)) == len(lengths))
+    for elapsed, route_length, route in results:
+        assert (sorted(route) == list(range(40)))
+        assert (np.isclose(route_length, calculate_journey_distance(scenario[route])))
+
+
+def test_solve_iter_budgets():
+    scenario = generate_scenario(40)
+
+    # an iteration budget stops the solver regardless of its time limit
+    budget = Budget(max_iterations=50)
+    advanced(scenario, time_limit=np.inf, budget=budget)
+    assert (budget.iterations == 50)
+
+    # a cancelled solver stops long before its deadline
+    cancel_token = threading.Event()
+    start_time = time_stamp()
+    for _ in solve_iter(scenario, advanced, time_limit=60000, cancel_token=cancel_token):
+        cancel_token.set()
+    assert (time_stamp() - start_time < 10000)
+
+    # without limits the solver keeps its own time limit, any limit given replaces it
+    budgets = []
+
+    def solver(scenario, time_limit=500, budget=None, callback=None):
+        budgets.append(budget)
+        return list(range(len(scenario)))
+
+    list(solve_iter(scenario, solver))
+    list(solve_iter(scenario, solver, max_iterations=5))
+    list(solve_iter(scenario, solver, time_limit=200))
+    assert (np.allclose([budget.deadline - budget.start_time for budget in budgets], [500, np.inf, 200]))
+
@@ -0,0 +1,29 @@
+import asyncio
+import numpy as np
+from utils import generate_scenario
+from .batch import SolverPool
+from .greedy import greedy
+from .local_search import local_search
+
+
+def test_solve_batch():
+    scenarios = [generate_scenario(size) for size in [12, 30, 7, 25, 18]]
+    with SolverPool(2, capacity=8) as pool:
+        # results come back in order, the buffer grows to fit the batch
+        results = pool.solve_batch(scenarios, local_search, seed=0, use_queue=True, initiate_greedy=False)
+        assert ([sorted(route) for route, _, _ in results] == [list(range(len(scenario))) for scenario in scenarios])
+        assert (all(milliseconds >= 0 for _, _, milliseconds in results))
+
+        # the same seed gives the same routes, whatever the chunks
+        again = pool.solve_batch(scenarios, local_search, seed=0, chunksize=1, use_queue=True, initiate_greedy=False)
+        assert ([route for route, _, _ in again] == [route for route, _, _ in results])
+
+        # equally sized scenarios as a single array
+        stacked = np.stack([generate_scenario(10) for _ in range(4)])
+        assert ([route for route, _, _ in pool.solve_batch(stacked, greedy)] ==
+                [greedy(scenario) for scenario in stacked])
+
+        async def solve_all():
+            return await asyncio.gather(*[pool.solve(scenario, greedy) for scenario in scenarios])
+
+        assert ([route for route, _, _ in asyncio.run(solve_all())] == [greedy(scenario) for scenario in scenarios])
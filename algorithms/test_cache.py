@@ -0,0 +1,78 @@
+import os
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, get_distance_oracle
+from .cache import SolutionCache, get_solver_key
+from .local_search import local_search
+
+
+def test_solution_cache(tmp_path):
+    scenario = generate_scenario(60)
+    calls = []
+
+    def solver(scenario, initial_route=None, **params):
+        calls.append(initial_route)
+        return local_search(scenario, initial_route=initial_route, use_queue=True)
+
+    # a miss solves, an exact hit returns the same route without solving, also from a new cache on the same directory
+    stats = {}
+    cache = SolutionCache(str(tmp_path))
+    route = cache.solve(scenario, solver, stats=stats)
+    assert (cache.solve(scenario.copy(), solver, stats=stats) == route)
+    assert (SolutionCache(str(tmp_path)).solve(scenario, solver) == route)
+    assert (len(calls) == 1 and stats == {'cache_misses': 1, 'cache_hits': 1})
+
+    # other parameters are another key
+    cache.solve(scenario, solver, max_pop_length=2, stats=stats)
+    assert (len(calls) == 2 and calls[-1] is None)
+
+    # a near hit starts from the cached route, the removed nodes dropped and the added ones inserted
+    changed = np.concatenate([np.delete(scenario, [3, 17], axis=0), generate_scenario(2)])
+    route = cache.solve(changed, solver, stats=stats)
+    assert (stats['cache_near_hits'] == 1 and sorted(calls[-1]) == list(range(60)))
+    assert (sorted(route) == list(range(60)))
+    assert (calculate_journey_distance(changed[route]) <= calculate_journey_distance(changed[calls[-1]]) + 1e-9)
+
+    # too many changes start cold
+    cache.solve(generate_scenario(60), solver, stats=stats)
+    assert (calls[-1] is None and stats['cache_misses'] == 3)
+
+
+def test_solver_keys():
+    # the neighbor lists and distances of a scenario are keyed by their width and kind, not by their contents
+    scenario, other = generate_scenario(30), generate_scenario(30)
+    keys = [get_solver_key(local_search, params) for params in [
+        {}, {'neighbors': get_neighbor_lists(scenario, 5)}, {'neighbors': get_neighbor_lists(other, 5)},
+        {'neighbors': get_neighbor_lists(scenario, 8)}, {'distance_matrix': get_distance_oracle(scenario, 'dense')},
+        {'distance_matrix': get_distance_oracle(other, 'dense')},
+        {'distance_matrix': get_distance_oracle(scenario, 'dense', dtype=np.float64)}]]
+    assert (keys[1] == keys[2] and keys[4] == keys[5])
+    assert (len({keys[0], keys[1], keys[3], keys[4], keys[6]}) == 5)
+
+
+def test_solution_cache_recent_use(tmp_path):
+    # a near hit, also from a new cache on the same directory, marks only the route it starts from as used
+    scenarios = [generate_scenario(50), generate_scenario(50)]
+    cache = SolutionCache(str(tmp_path))
+    for scenario in scenarios:
+        cache.solve(scenario, local_search)
+    paths = [os.path.join(str(tmp_path), name) for name in sorted(os.listdir(str(tmp_path)))]
+    for path in paths:
+        os.utime(path, (1, 1))
+
+    stats = {}
+    SolutionCache(str(tmp_path), memory_size=0).solve(np.delete(scenarios[1], 5, axis=0), local_search, stats=stats)
+    assert (stats['cache_near_hits'] == 1)
+    used = [path for path in paths if os.path.getmtime(path) > 1]
+    with np.load(used[0]) as data:
+        assert (len(used) == 1 and np.array_equal(data['scenario'], scenarios[1]))
+
+
+def test_solution_cache_eviction(tmp_path):
+    # the directory is kept under its size, dropping the least recently used routes first
+    cache = SolutionCache(str(tmp_path), memory_size=1, disk_size=10000)
+    scenarios = [generate_scenario(200) for _ in range(4)]
+    for scenario in scenarios:
+        cache.solve(scenario, local_search)
+    files = [name for name in os.listdir(str(tmp_path))]
+    assert (0 < len(files) < 4)
+    assert (sum(os.path.getsize(os.path.join(str(tmp_path), name)) for name in files) <= 10000)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from utils import calculate_journey_distance, generate_scenario
+from .construction import nearest_neighbor, nearest_neighbor_brute_force, greedy_edge, hilbert_curve, double_tree
+from .local_search import local_search
+
+
+def test_constructions():
+    # every construction visits each node once, also with clustered and duplicate nodes
+    scenario = np.concatenate((generate_scenario(300), generate_scenario(100, 5), generate_scenario(3)[[0, 0, 1]]))
+    for construct in [nearest_neighbor, greedy_edge, hilbert_curve, double_tree]:
+        route = construct(scenario)
+        assert (sorted(route.tolist()) == list(range(403)))
+
+    for num_nodes in [1, 2, 3]:
+        for construct in [nearest_neighbor, greedy_edge, hilbert_curve, double_tree]:
+            assert (sorted(construct(generate_scenario(num_nodes)).tolist()) == list(range(num_nodes)))
+
+
+def test_nearest_neighbor():
+    # the grid finds the same route as comparing to every unvisited node
+    scenario = generate_scenario(500)
+    assert (np.array_equal(nearest_neighbor(scenario, start=7), nearest_neighbor_brute_force(scenario, start=7)))
+
+
+def test_local_search_construction():
+    scenario = generate_scenario(60)
+    greedy_edge_length = calculate_journey_distance(scenario[greedy_edge(scenario)])
+    route = local_search(scenario, construction='greedy_edge')
+    assert (calculate_journey_distance(scenario[route]) <= greedy_edge_length)
+
+    with pytest.raises(ValueError):
+        local_search(scenario, construction='christofides')
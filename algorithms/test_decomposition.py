@@ -0,0 +1,25 @@
+import numpy as np
+from utils import calculate_journey_distance, generate_scenario
+from .decomposition import decomposition, stitch_tours
+from .greedy import greedy
+
+
+def test_decomposition():
+    # a route over all the nodes, no worse than a greedy one, for each partition
+    scenario = generate_scenario(400)
+    greedy_length = calculate_journey_distance(scenario[greedy(scenario)])
+    for partition in ['grid', 'kmeans', 'hilbert']:
+        route = decomposition(scenario, cluster_size=60, partition=partition, seed=0)
+        assert (sorted(route) == list(range(400)))
+        assert (calculate_journey_distance(scenario[route]) < greedy_length)
+
+    # the same seed gives the same route
+    assert (decomposition(scenario, cluster_size=60, seed=1) == decomposition(scenario, cluster_size=60, seed=1))
+
+
+def test_stitch_tours():
+    # two square tours side by side are joined through their closest sides
+    scenario = np.array([[0, 0], [0, 1], [1, 1], [1, 0], [3, 0], [3, 1], [4, 1], [4, 0]], dtype=float)
+    route, seams = stitch_tours(scenario, [np.arange(4), np.arange(4, 8)])
+    assert (sorted(route) == list(range(8)) and seams.tolist() == [0, 4])
+    assert (np.isclose(calculate_journey_distance(scenario[route]), 10))
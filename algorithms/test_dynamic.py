@@ -0,0 +1,34 @@
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists
+from .dynamic import update_route, update_neighbor_lists
+from .local_search import local_search
+
+
+def test_update_route():
+    scenario = generate_scenario(300)
+    neighbors = get_neighbor_lists(scenario)
+    route = local_search(scenario, neighbors=neighbors, use_queue=True)
+    added = generate_scenario(4)
+    removed = sorted({route[0], route[1], 150, 7})
+
+    new_scenario, new_route, new_neighbors, nodes = update_route(scenario, route, added, removed, neighbors)
+    assert (sorted(new_route) == list(range(304 - len(removed))))
+    assert (np.array_equal(new_scenario[nodes >= 0], scenario[nodes[nodes >= 0]]))
+    assert (np.array_equal(new_scenario[nodes < 0], added))
+    assert (set(nodes[nodes >= 0]) == set(range(300)) - set(removed))
+
+    # the patched neighbor lists are the ones built from scratch, and the patched route is about as short
+    # as a new solve
+    assert (np.array_equal(new_neighbors, get_neighbor_lists(new_scenario)))
+    resolved = local_search(new_scenario, neighbors=new_neighbors, use_queue=True)
+    assert (calculate_journey_distance(new_scenario[new_route]) < 1.05 * calculate_journey_distance(new_scenario[resolved]))
+
+
+def test_update_neighbor_lists():
+    # a node's lost neighbor is replaced and an added node close by joins its list
+    scenario = generate_scenario(50)
+    neighbors = get_neighbor_lists(scenario, num_neighbors=5)
+    neighbors[3, 2] = -1
+    scenario = np.concatenate([scenario, scenario[[10]] + 1e-3])
+    updated = update_neighbor_lists(scenario, neighbors, np.array([50]))
+    assert (np.array_equal(updated, get_neighbor_lists(scenario, num_neighbors=5)))
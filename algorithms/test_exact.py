@@ -0,0 +1,31 @@
+import itertools
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_distance_matrix
+from .exact import held_karp, held_karp_path, exact_or_heuristic, optimize_windows
+from .local_search import local_search
+
+
+def test_held_karp():
+    # as short as the shortest of all the routes, and the path between two fixed nodes as short as any
+    scenario = generate_scenario(8)
+    shortest = min(calculate_journey_distance(scenario[[0] + list(order)]) for order in itertools.permutations(range(1, 8)))
+    route = held_karp(scenario, distance_matrix=get_distance_matrix(scenario))
+    assert (sorted(route) == list(range(8)))
+    assert (abs(calculate_journey_distance(scenario[route]) - shortest) < 1e-9)
+
+    path = held_karp_path(scenario, 5, 2)
+    lengths = [np.linalg.norm(np.diff(scenario[[5] + list(order) + [2]], axis=0), axis=1).sum()
+               for order in itertools.permutations([0, 1, 3, 4, 6, 7])]
+    assert (path[0] == 5 and path[-1] == 2 and sorted(path) == list(range(8)))
+    assert (abs(np.linalg.norm(np.diff(scenario[path], axis=0), axis=1).sum() - min(lengths)) < 1e-9)
+
+
+def test_optimize_windows():
+    # the windows only make the route shorter, by the amount they return
+    scenario = generate_scenario(200)
+    route = np.array(local_search(scenario, use_queue=True))
+    length = calculate_journey_distance(scenario[route])
+    improvement = optimize_windows(scenario, route)
+    assert (sorted(route) == list(range(200)))
+    assert (abs(length - improvement - calculate_journey_distance(scenario[route])) < 1e-6)
+    assert (len(exact_or_heuristic(scenario[:10])) == 10 and len(exact_or_heuristic(scenario[:30])) == 30)
@@ -0,0 +1,32 @@
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, Budget
+from .genetic import genetic, order_crossover, edge_assembly_crossover
+from .local_search import local_search
+
+
+def test_crossovers():
+    # the children are routes through every node
+    scenario = generate_scenario(60)
+    neighbors = get_neighbor_lists(scenario)
+    random = np.random.default_rng(0)
+    parents_a = np.argsort(random.random((20, 60)), axis=1).astype(np.int32)
+    parents_b = np.argsort(random.random((20, 60)), axis=1).astype(np.int32)
+    for child in order_crossover(parents_a, parents_b, random):
+        assert (sorted(child) == list(range(60)))
+    for parent_a, parent_b in zip(parents_a, parents_b):
+        child, changed = edge_assembly_crossover(scenario, parent_a, parent_b, neighbors, random)
+        assert (sorted(child) == list(range(60)))
+    # children of a route and itself are the route
+    child, changed = edge_assembly_crossover(scenario, parents_a[0], parents_a[0], neighbors, random)
+    assert (np.array_equal(child, parents_a[0]) and len(changed) == 0)
+
+
+def test_genetic():
+    scenario = generate_scenario(50)
+    for crossover in ['ox', 'eax']:
+        routes = [genetic(scenario, pop_size=20, crossover=crossover, seed=3, budget=Budget(max_iterations=20)) for _ in range(2)]
+        assert (sorted(routes[0]) == list(range(50)))
+        assert (routes[0] == routes[1])
+    # polished, the route is about as short as local_search's or shorter
+    route = genetic(scenario, pop_size=10, crossover='eax', polish=True, budget=Budget(max_iterations=5))
+    assert (calculate_journey_distance(scenario[route]) < 1.05 * calculate_journey_distance(scenario[local_search(scenario)]))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, get_distance_oracle, ArrayTour, \
+    TwoLevelTour
+from .lin_kernighan import lin_kernighan, improve_lin_kernighan
+from .local_search import local_search
+
+
+def test_lin_kernighan():
+    np.random.seed(0)
+    scenario = generate_scenario(300)
+    neighbors = get_neighbor_lists(scenario)
+    descent = lin_kernighan(scenario, neighbors=neighbors)
+    assert (sorted(descent) == list(range(300)))
+
+    # kicks are only kept when the route gets no longer, on either tour structure
+    lengths = []
+    for tour in ['array', 'two_level']:
+        route = lin_kernighan(scenario, neighbors=neighbors, num_kicks=50, tour=tour,
+                              callback=lambda route: lengths.append(calculate_journey_distance(scenario[route])))
+        assert (sorted(route) == list(range(300)))
+        assert (calculate_journey_distance(scenario[route]) <= lengths[0] + 1e-9)
+        assert (calculate_journey_distance(scenario[route]) <
+                calculate_journey_distance(scenario[local_search(scenario, neighbors=neighbors, use_queue=True)]))
+        lengths.clear()
+
+    with pytest.raises(ValueError):
+        lin_kernighan(scenario, tour='linked_list')
+
+
+def test_improve_lin_kernighan():
+    # the returned change is the change in the route length
+    scenario = generate_scenario(100)
+    neighbors = get_neighbor_lists(scenario)
+    route = np.random.permutation(100)
+    for tour in [ArrayTour(route.copy()), TwoLevelTour(route)]:
+        change = improve_lin_kernighan(scenario, tour, np.arange(100), neighbors)
+        assert (change < 0)
+        assert (np.isclose(calculate_journey_distance(scenario[tour.sequence()]),
+                           calculate_journey_distance(scenario[route]) + change))
+
+
+def test_tours_over_oracle():
+    # the tour structures look single distances up, which the condensed oracle gives as scalars
+    scenario = generate_scenario(100)
+    neighbors = get_neighbor_lists(scenario)
+    oracle = get_distance_oracle(scenario, 'condensed', dtype=np.float64)
+    for tour in ['array', 'two_level']:
+        route = local_search(scenario, neighbors=neighbors, distance_matrix=oracle, use_queue=True, tour=tour)
+        assert (sorted(route) == list(range(100)))
+        route = lin_kernighan(scenario, neighbors=neighbors, distance_matrix=oracle, tour=tour)
+        assert (sorted(route) == list(range(100)))
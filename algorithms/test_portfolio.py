@@ -0,0 +1,30 @@
+import numpy as np
+from utils import generate_scenario, time_stamp
+from .portfolio import race
+from .local_search import local_search
+from .simulated_annealing import advanced
+
+
+def failing_solver(scenario, budget=None, callback=None):
+    raise ValueError('no route')
+
+
+def test_race():
+    # the winner's route is the shortest, a failing solver is reported, and with sharing the annealing
+    # restarts from the local search's route
+    scenario = generate_scenario(200)
+    solvers = [('local_search', local_search, {'use_queue': True}), ('annealing', advanced, {'use_queue': True}),
+               ('failing', failing_solver, {})]
+    stats = {}
+    route = race(scenario, solvers, time_limit=2000, share_interval=100, seed=0, stats=stats)
+    assert (sorted(route) == list(range(200)))
+    assert (stats['winner'] in ('local_search', 'annealing'))
+    lengths = [stats['solvers'][name]['length'] for name in ('local_search', 'annealing')]
+    assert (stats['solvers'][stats['winner']]['length'] == min(lengths))
+    assert ('no route' in stats['solvers']['failing']['error'] and stats['solvers']['failing']['time_to_best'] is None)
+    assert (stats['solvers']['annealing']['restarts'] > 0)
+
+    # any route reaches an infinite target, so the race stops long before its time limit
+    start = time_stamp()
+    race(scenario, solvers[:2], time_limit=20000, target_length=np.inf)
+    assert (time_stamp() - start < 10000)
@@ -0,0 +1,46 @@
+# how the ant colony scales with the amount of worker processes
+# run from the repository root: python -m benchmarks.aco_parallel [max_workers]
+
+import sys
+import os
+import numpy as np
+from utils import generate_scenario, get_distance_matrix, time_stamp
+from algorithms.ant_colony_optimization.ant_colony_optimization import get_initial_pheromones, release_ants_batched
+from algorithms.ant_colony_optimization.parallel import AntPool
+
+
+def run(sizes=(200, 1000), max_workers=None, iterations=3):
+    max_workers = max_workers or os.cpu_count()
+    np.random.seed(0)
+
+    for num_nodes in sizes:
+        scenario = generate_scenario(num_nodes)
+        edge_lengths = get_distance_matrix(scenario)
+        pheromones = get_initial_pheromones(edge_lengths)
+
+        # the serial batched colony is the baseline, one ant per node for each iteration
+        start = time_stamp()
+        for _ in range(iterations):
+            release_ants_batched(pheromones, edge_lengths, num_nodes, 1)
+        serial_time = (time_stamp() - start) / iterations
+        print('n = {}, serial: {:.1f} ms per iteration'.format(num_nodes, serial_time))
+
+        num_workers = 1
+        while num_workers <= max_workers:
+            with AntPool(num_nodes, num_workers, seed=0) as pool:
+                pool.set_edge_lengths(edge_lengths)
+                # warm up, the first task of each worker pays for the process start
+                pool.release_ants(pheromones, 1)
+
+                start = time_stamp()
+                for _ in range(iterations):
+                    pool.release_ants(pheromones, 1)
+                parallel_time = (time_stamp() - start) / iterations
+
+            print('    {:>3} workers: {:>10.1f} ms per iteration, speedup {:.2f}'.format(
+                num_workers, parallel_time, serial_time / parallel_time))
+            num_workers *= 2
+
+
+if __name__ == '__main__':
+    run(max_workers=int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,51 @@
+# throughput of algorithms.batch on many small scenarios, against solving them one after another in process
+# run from the repository root: python -m benchmarks.batch [num_scenarios] [num_workers]
+
+import sys
+import os
+import asyncio
+import numpy as np
+from utils import generate_scenario, time_stamp
+
+
+def run(num_scenarios=200, num_workers=None, sizes=(50, 300)):
+    from algorithms import local_search, SolverPool
+    num_workers = num_workers or os.cpu_count()
+    np.random.seed(0)
+    scenarios = [generate_scenario(num_nodes) for num_nodes in np.random.randint(sizes[0], sizes[1] + 1, num_scenarios)]
+    params = {'use_queue': True}
+    print('{} scenarios of {} to {} nodes, {} workers (on {} cpus)'.format(num_scenarios, sizes[0], sizes[1], num_workers, os.cpu_count()))
+
+    start = time_stamp()
+    timings = []
+    for scenario in scenarios:
+        solve_start = time_stamp()
+        local_search(scenario, **params)
+        timings.append(time_stamp() - solve_start)
+    report('in process', time_stamp() - start, timings)
+
+    start = time_stamp()
+    with SolverPool(num_workers) as pool:
+        report('pool start', time_stamp() - start, [])
+
+        start = time_stamp()
+        results = pool.solve_batch(scenarios, local_search, **params)
+        report('solve_batch', time_stamp() - start, [milliseconds for _, _, milliseconds in results])
+
+        async def solve_all():
+            return await asyncio.gather(*[pool.solve(scenario, local_search, **params) for scenario in scenarios])
+
+        start = time_stamp()
+        results = asyncio.run(solve_all())
+        report('async solve', time_stamp() - start, [milliseconds for _, _, milliseconds in results])
+
+
+def report(name, milliseconds, timings):
+    line = '    {:<14}{:>10.0f} ms'.format(name, milliseconds)
+    if timings:
+        line += '{:>10.1f} ms per item (median {:.1f})'.format(milliseconds / len(timings), np.median(timings))
+    print(line)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200, int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,36 @@
+# the lower bound of utils.get_lower_bound, and how soon the solvers stop with a target_gap against their full budget
+# run from the repository root: python -m benchmarks.bounds [target_gap] [sizes...]
+
+import sys
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, get_lower_bound, time_stamp
+
+
+def run(sizes=(1000, 5000), target_gap=0.05, time_limit=20000):
+    from algorithms import local_search, lin_kernighan
+    from algorithms.simulated_annealing import advanced
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        neighbors = get_neighbor_lists(scenario)
+
+        for name, iterations in [('1-tree', 0), ('held-karp', 100)]:
+            start = time_stamp()
+            bound = get_lower_bound(scenario, neighbors, max_iterations=iterations)
+            print('n = {}, {} bound {:.1f} in {:.0f} ms'.format(num_nodes, name, bound, time_stamp() - start))
+
+        for name, solve in [
+                ('local_search', lambda **kwargs: local_search(scenario, neighbors=neighbors, use_queue=True, **kwargs)),
+                ('lin_kernighan', lambda **kwargs: lin_kernighan(scenario, neighbors, num_kicks=10 ** 6, time_limit=time_limit, **kwargs)),
+                ('advanced', lambda **kwargs: advanced(scenario, time_limit, neighbors=neighbors, use_queue=True, **kwargs))]:
+            for kwargs in [{}, {'target_gap': target_gap}]:
+                start = time_stamp()
+                route = solve(**kwargs)
+                milliseconds = time_stamp() - start
+                length = calculate_journey_distance(scenario[route])
+                print('    {:<14}{:<18}{:>10.0f} ms{:>12.1f}  {:>6.2%} over the bound'.format(
+                    name, 'target_gap {}'.format(target_gap) if kwargs else 'full budget', milliseconds, length, length / bound - 1))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[2:]] or (1000, 5000), float(sys.argv[1]) if len(sys.argv) > 1 else 0.05)
@@ -0,0 +1,31 @@
+# time to re-solve a scenario with a few stops changed, cold against warm started from algorithms.SolutionCache
+# run from the repository root: python -m benchmarks.cache [changed stops] [sizes...]
+
+import sys
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, time_stamp
+
+
+def run(sizes=(1000, 5000), num_changes=5):
+    from algorithms import local_search, SolutionCache
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        changed = np.concatenate([np.delete(scenario, np.random.choice(num_nodes, num_changes, replace=False), axis=0),
+                                  generate_scenario(num_changes)])
+        print('n = {}, {} stops removed and {} added'.format(num_nodes, num_changes, num_changes))
+
+        cache = SolutionCache()
+        for name, solve in [('cold', lambda: local_search(changed, neighbors=get_neighbor_lists(changed), use_queue=True)),
+                            ('first solve', lambda: cache.solve(scenario, local_search, neighbors=get_neighbor_lists(scenario), use_queue=True)),
+                            ('exact hit', lambda: cache.solve(scenario, local_search, neighbors=get_neighbor_lists(scenario), use_queue=True)),
+                            ('near hit', lambda: cache.solve(changed, local_search, neighbors=get_neighbor_lists(changed), use_queue=True))]:
+            start = time_stamp()
+            route = solve()
+            milliseconds = time_stamp() - start
+            points = scenario if name in ('first solve', 'exact hit') else changed
+            print('    {:<14}{:>10.0f} ms{:>14.1f}'.format(name, milliseconds, calculate_journey_distance(points[route])))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[2:]] or (1000, 5000), int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,30 @@
+# throughput of algorithms.decomposition on large scenarios, in cities per second
+# run from the repository root: python -m benchmarks.decomposition [num_workers] [sizes...]
+
+import sys
+import os
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, Stats
+
+
+def run(sizes=(50000, 200000), num_workers=None, cluster_size=1000):
+    from algorithms import decomposition
+    num_workers = num_workers or os.cpu_count()
+    np.random.seed(0)
+
+    for num_nodes in sizes:
+        scenario = generate_scenario(num_nodes)
+        stats = Stats()
+        route = decomposition(scenario, cluster_size, num_workers=num_workers, seed=0, stats=stats)
+
+        # the length of a random uniform scenario's optimal route is about 0.7124 * sqrt(num_nodes * area)
+        ratio = calculate_journey_distance(scenario[route]) / np.sqrt(num_nodes * 100 ** 2)
+        phases = ', '.join('{} {:.1f} s'.format(phase, timing['milliseconds'] / 1000)
+                           for phase, timing in stats['timers'].items()
+                           if phase in ('partition', 'solve_clusters', 'stitch', 'repair'))
+        print('n = {}, {} workers: {:.0f} cities per second, length / sqrt(n * area) = {:.4f} ({})'.format(
+            num_nodes, num_workers, stats['cities_per_second'], ratio, phases))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[2:]] or (50000, 200000), int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,60 @@
+# peak memory of building the distances of a scenario with each backend of utils.get_distance_oracle
+# run from the repository root: python -m benchmarks.distance_memory [sizes...]
+# every measurement runs in a fresh process, so the peaks don't mix
+
+import sys
+import resource
+import subprocess
+import numpy as np
+from utils import generate_scenario, get_distance_oracle, time_stamp
+
+
+def legacy_distance_matrix(scenario):
+    # the original get_distance_matrix, an n x n x 2 temporary before the matrix itself
+    return np.linalg.norm(scenario[:, :] - scenario[:, None], axis=2)
+
+
+def measure(num_nodes, backend):
+    # build the distances in this process, prints its peak RSS in MB and the build time in ms, then
+    # the peak after random lookups. the memmap pages read by lookups count as RSS but are
+    # reclaimable page cache
+    scenario = generate_scenario(num_nodes)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time_stamp()
+    if backend == 'legacy':
+        distances = legacy_distance_matrix(scenario)
+    else:
+        distances = get_distance_oracle(scenario, backend)
+    elapsed = time_stamp() - start
+    build_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    distances[np.random.randint(num_nodes, size=1000), np.random.randint(num_nodes, size=1000)]
+    lookup_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('{:.1f} {:.1f} {:.1f}'.format((build_peak - baseline) / 1024, elapsed, (lookup_peak - baseline) / 1024))
+
+    if backend == 'memmap':
+        distances.close()
+
+
+def run(sizes=(5000, 20000)):
+    backends = ['legacy', 'dense', 'condensed', 'memmap', 'euclidean']
+    for num_nodes in sizes:
+        print('n = {}'.format(num_nodes))
+        for backend in backends:
+            # the legacy temporaries alone would take about 10 GB at 20k nodes
+            if backend == 'legacy' and num_nodes > 10000:
+                print('    {:<12}{:>12}'.format(backend, 'skipped'))
+                continue
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.distance_memory', '--measure', str(num_nodes), backend],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            print('    {:<12}{:>10} MB peak{:>12} ms to build{:>10} MB peak after lookups'.format(backend, *output))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+        measure(int(sys.argv[2]), sys.argv[3])
+    else:
+        run([int(size) for size in sys.argv[1:]] or (5000, 20000))
@@ -0,0 +1,34 @@
+# latency of dynamic.update_route against the size of the change, and against solving the changed scenario again
+# run from the repository root: python -m benchmarks.dynamic [sizes...]
+
+import sys
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, time_stamp
+
+
+def run(sizes=(10000,), changes=(1, 10, 100)):
+    from algorithms import local_search, update_route
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        neighbors = get_neighbor_lists(scenario)
+        route = local_search(scenario, neighbors=neighbors, use_queue=True)
+        print('n = {}'.format(num_nodes))
+
+        for num_changes in changes:
+            added = generate_scenario(num_changes)
+            removed = np.random.choice(num_nodes, num_changes, replace=False)
+            start = time_stamp()
+            new_scenario, new_route, _, _ = update_route(scenario, route, added, removed, neighbors)
+            milliseconds = time_stamp() - start
+
+            start = time_stamp()
+            resolved = local_search(new_scenario, neighbors=get_neighbor_lists(new_scenario), use_queue=True)
+            resolve_milliseconds = time_stamp() - start
+            print('    {:>4} added and removed{:>10.1f} ms{:>12.1f}    new solve{:>10.0f} ms{:>12.1f}'.format(
+                num_changes, milliseconds, calculate_journey_distance(new_scenario[new_route]),
+                resolve_milliseconds, calculate_journey_distance(new_scenario[resolved])))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or (10000,))
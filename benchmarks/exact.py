@@ -0,0 +1,40 @@
+# time and route length of algorithms.held_karp against the heuristics on small scenarios, and of
+# optimize_windows on a local_search route
+# run from the repository root: python -m benchmarks.exact [sizes...]
+
+import sys
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, time_stamp
+
+
+def run(sizes=(8, 10, 12, 14, 16, 18, 20), num_scenarios=5):
+    from algorithms import held_karp, local_search, simulated_annealing, optimize_windows
+    solvers = [('held_karp', held_karp),
+               ('local_search', lambda scenario: local_search(scenario, use_queue=True)),
+               ('sa advanced', lambda scenario: simulated_annealing.advanced(scenario, time_limit=100))]
+    print('{:>6}{:>16}{:>12}{:>16}'.format('n', 'solver', 'ms', 'over optimal'))
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenarios = [generate_scenario(num_nodes) for _ in range(num_scenarios)]
+        optimal = None
+        for name, solve in solvers:
+            start = time_stamp()
+            lengths = np.array([calculate_journey_distance(scenario[solve(scenario)]) for scenario in scenarios])
+            milliseconds = (time_stamp() - start) / num_scenarios
+            optimal = lengths if optimal is None else optimal
+            print('{:>6}{:>16}{:>12.1f}{:>15.2f}%'.format(num_nodes, name, milliseconds, 100 * (lengths / optimal - 1).mean()))
+
+    np.random.seed(0)
+    scenario = generate_scenario(1000)
+    route = np.array(local_search(scenario, use_queue=True))
+    length = calculate_journey_distance(scenario[route])
+    for window in (6, 8, 10):
+        windowed = route.copy()
+        start = time_stamp()
+        optimize_windows(scenario, windowed, window)
+        print('local_search route of 1000 nodes, windows of {}: {:.1f} to {:.1f} in {:.0f} ms'.format(
+            window, length, calculate_journey_distance(scenario[windowed]), time_stamp() - start))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or (8, 10, 12, 14, 16, 18, 20))
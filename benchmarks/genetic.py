@@ -0,0 +1,35 @@
+# route lengths of algorithms.genetic against simulated_annealing.advanced at the same time limits, the
+# genetic runs with every crossover, polished, and breeding in a pool of workers when there are cpus for it
+# run from the repository root: python -m benchmarks.genetic [seconds] [sizes...]
+
+import sys
+import os
+import time
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance
+
+
+def run(seconds=10, sizes=(200, 1000)):
+    from algorithms import genetic, simulated_annealing
+    num_workers = os.cpu_count()
+    runs = [('sa advanced', lambda scenario: simulated_annealing.advanced(scenario, time_limit=1000 * seconds)),
+            ('genetic ox', lambda scenario: genetic(scenario, crossover='ox', time_limit=1000 * seconds, seed=0)),
+            ('genetic eax', lambda scenario: genetic(scenario, crossover='eax', time_limit=1000 * seconds, seed=0)),
+            ('genetic eax polished', lambda scenario: genetic(scenario, pop_size=30, crossover='eax', polish=True,
+                                                              time_limit=1000 * seconds, seed=0))]
+    if num_workers > 1:
+        runs.append(('genetic eax, {} workers'.format(num_workers),
+                     lambda scenario: genetic(scenario, crossover='eax', num_workers=num_workers, time_limit=1000 * seconds, seed=0)))
+
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        print('n = {}, {} s each (cpu seconds of this process)'.format(num_nodes, seconds))
+        for name, solve in runs:
+            start = time.process_time()
+            route = solve(scenario)
+            print('    {:<26}{:>12.1f}{:>10.1f} s'.format(name, calculate_journey_distance(scenario[route]), time.process_time() - start))
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 10, [int(size) for size in sys.argv[2:]] or (200, 1000))
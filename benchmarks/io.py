@@ -0,0 +1,47 @@
+# time to get a scenario into a process: parsing a TSPLIB file, reading it as an in-memory array, or opening
+# the binary format as a memory map, and the same in worker processes
+# run from the repository root: python -m benchmarks.io [num_nodes]
+
+import sys
+import os
+import tempfile
+import numpy as np
+from multiprocessing import Pool
+from utils import generate_scenario, time_stamp, write_tsplib, read_tsplib, save_scenario, open_scenario
+
+
+def run(num_nodes=1000000):
+    np.random.seed(0)
+    scenario = generate_scenario(num_nodes)
+    directory = tempfile.mkdtemp()
+    tsp_path, npy_path, bin_path = [os.path.join(directory, name) for name in ['scenario.tsp', 'scenario.npy', 'scenario.bin']]
+    write_tsplib(tsp_path, scenario)
+    np.save(npy_path, scenario)
+    save_scenario(bin_path, scenario)
+    print('n = {}'.format(num_nodes))
+
+    for name, load in [('tsplib', lambda: read_tsplib(tsp_path)[0]), ('np.load', lambda: np.load(npy_path)),
+                       ('open_scenario', lambda: open_scenario(bin_path))]:
+        start = time_stamp()
+        loaded = load()
+        opened = time_stamp() - start
+        loaded[:, 0].sum()
+        print('    {:<16}{:>10.1f} ms to open{:>10.1f} ms with a pass over it'.format(name, opened, time_stamp() - start))
+
+    # each worker maps the same pages instead of getting a copy
+    with Pool(2) as pool:
+        start = time_stamp()
+        pool.map(sum_scenario, [bin_path] * 4)
+        print('    {:<16}{:>10.1f} ms for 4 tasks on 2 workers'.format('workers', time_stamp() - start))
+
+    for path in [tsp_path, npy_path, bin_path]:
+        os.remove(path)
+    os.rmdir(directory)
+
+
+def sum_scenario(path):
+    return float(open_scenario(path)[:, 0].sum())
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,51 @@
+# time to quality of algorithms.lin_kernighan against the existing solvers: how long the iterated search
+# takes to reach the length of a full simulated_annealing.advanced run, and where it gets in the same time
+# run from the repository root: python -m benchmarks.lin_kernighan [annealing_seconds] [sizes...]
+
+import sys
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, time_stamp
+
+
+def run(sizes=(1000,), annealing_time=40000):
+    from algorithms import local_search, lin_kernighan
+    from algorithms.simulated_annealing import advanced
+
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        neighbors = get_neighbor_lists(scenario)
+        results = []
+
+        def time_solver(name, solver, **kwargs):
+            start = time_stamp()
+            route = solver(scenario, **kwargs)
+            results.append((name, (time_stamp() - start) / 1000, calculate_journey_distance(scenario[route])))
+
+        time_solver('simulated_annealing.advanced', advanced, time_limit=annealing_time)
+        time_solver('simulated_annealing.advanced (queue)', advanced, time_limit=annealing_time, neighbors=neighbors,
+                    use_queue=True)
+        time_solver('local_search (queue)', local_search, neighbors=neighbors, use_queue=True, construction='greedy_edge')
+        time_solver('lin_kernighan', lin_kernighan, neighbors=neighbors)
+
+        # the iterated search reports every improvement, the first one at least as short as the annealing
+        # is the time to its quality
+        improvements = []
+        start = time_stamp()
+        time_solver('lin_kernighan (kicks)', lin_kernighan, neighbors=neighbors, num_kicks=np.inf,
+                    time_limit=annealing_time, callback=lambda route: improvements.append(
+                        ((time_stamp() - start) / 1000, calculate_journey_distance(scenario[route]))))
+        target = results[0][2]
+        reached = next((seconds for seconds, length in improvements if length <= target), None)
+
+        # the length of a random uniform scenario's optimal route is about 0.7124 * sqrt(num_nodes * area)
+        print('n = {}'.format(num_nodes))
+        for name, seconds, length in results:
+            print('    {:<40}{:>8.2f} s{:>12.1f}  (length / sqrt(n * area) = {:.4f})'.format(
+                name, seconds, length, length / np.sqrt(num_nodes * 100 ** 2)))
+        print('    lin_kernighan (kicks) reached the annealing length after {}'.format(
+            'never' if reached is None else '{:.2f} s'.format(reached)))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[2:]] or (1000,), float(sys.argv[1]) * 1000 if len(sys.argv) > 1 else 40000)
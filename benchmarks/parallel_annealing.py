@@ -0,0 +1,36 @@
+# route quality of simulated_annealing.parallel_annealing at a fixed wall time, against a single chain
+# run from the repository root: python -m benchmarks.parallel_annealing [seconds] [num_workers] [sizes...]
+
+import sys
+import os
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists
+
+
+def run(sizes=(1000,), time_limit=10000, num_workers=None, seeds=(0, 1, 2)):
+    from algorithms.simulated_annealing import basic, advanced, parallel_annealing
+    num_workers = num_workers or os.cpu_count()
+
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        neighbors = get_neighbor_lists(scenario)
+        print('n = {}, {} s, {} workers (on {} cpus), mean length over {} seeds'.format(
+            num_nodes, time_limit / 1000, num_workers, os.cpu_count(), len(seeds)))
+
+        for variant, single, kwargs in [('basic', basic, {}), ('advanced', advanced, {'neighbors': neighbors, 'use_queue': True})]:
+            lengths = {'single chain': [], 'multi_start': [], 'tempering': []}
+            for seed in seeds:
+                np.random.seed(seed)
+                lengths['single chain'].append(calculate_journey_distance(scenario[single(scenario, time_limit=time_limit, **kwargs)]))
+                for mode in ['multi_start', 'tempering']:
+                    route = parallel_annealing(scenario, variant, mode, num_workers, time_limit, seed=seed, **kwargs)
+                    lengths[mode].append(calculate_journey_distance(scenario[route]))
+
+            for name, values in lengths.items():
+                print('    {:<10}{:<16}{:>12.1f}'.format(variant, name, np.mean(values)))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[3:]] or (1000,), float(sys.argv[1]) * 1000 if len(sys.argv) > 1 else 10000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else None)
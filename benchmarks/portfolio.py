@@ -0,0 +1,39 @@
+# algorithms.race against each of its solvers run alone with the same time limit, with and without sharing
+# the incumbent, reporting the winner and its time to the best route
+# run from the repository root: python -m benchmarks.portfolio [seconds] [sizes...]
+
+import os
+import sys
+import numpy as np
+from utils import generate_scenario, calculate_journey_distance, get_neighbor_lists, time_stamp, Budget
+
+
+def run(seconds=10, sizes=(1000,)):
+    from algorithms import race, PORTFOLIO
+    print('{} cpus, the racing solvers share them'.format(os.cpu_count()))
+    for num_nodes in sizes:
+        np.random.seed(0)
+        scenario = generate_scenario(num_nodes)
+        neighbors = get_neighbor_lists(scenario)
+        print('n = {}, {} s'.format(num_nodes, seconds))
+        for name, algorithm, params in PORTFOLIO:
+            start = time_stamp()
+            route = algorithm(scenario, neighbors=neighbors, budget=Budget(1000 * seconds), **params)
+            print('    {:<34}{:>10.1f}{:>10.0f} ms'.format(name + ' alone', calculate_journey_distance(scenario[route]),
+                                                         time_stamp() - start))
+
+        for label, kwargs in [('race', {}), ('race, sharing every 500 ms', {'share_interval': 500}),
+                              ('race, 2 s patience', {'patience': 2000})]:
+            stats = {}
+            start = time_stamp()
+            route = race(scenario, time_limit=1000 * seconds, seed=0, stats=stats, **kwargs)
+            print('    {:<34}{:>10.1f}{:>10.0f} ms, won by {} after {:.0f} ms'.format(
+                label, calculate_journey_distance(scenario[route]), time_stamp() - start, stats['winner'], stats['time_to_best']))
+            for name, solver_stats in stats['solvers'].items():
+                print('        {:<30}{:>10.1f}  best after {} ms, {} restarts'.format(
+                    name, solver_stats['length'], 'never' if solver_stats['time_to_best'] is None else round(solver_stats['time_to_best']),
+                    solver_stats['restarts']))
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 10, [int(size) for size in sys.argv[2:]] or (1000,))
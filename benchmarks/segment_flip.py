@@ -0,0 +1,57 @@
+# compare the vectorized utils.find_segment_flip against the original nested loop version
+# run from the repository root: python -m benchmarks.segment_flip
+
+import numpy as np
+from utils import generate_scenario, random_arange, find_segment_flip, get_distance_matrix, time_stamp
+
+
+def legacy_find_segment_flip(route, threshold=0):
+    # the original implementation, kept here as the reference for the benchmark
+    for i in random_arange(len(route) - 1):
+        for j in random_arange(i + 3, len(route) + 1):
+            n1, n2, n3, n4 = np.array([i, i + 1, j - 1, j]) % len(route)
+            matrix = route[[n1, n2, n1, n3]] - route[[n3, n4, n2, n4]]
+            magnitudes = np.linalg.norm(matrix, axis=1)
+            distance_change = (magnitudes[:2] - magnitudes[2:]).sum()
+            if distance_change < threshold and (i != 0 or j != len(route)):
+                return i, j
+    return None, None
+
+
+def time_call(function, repeats):
+    # average run time of the function in milliseconds
+    start = time_stamp()
+    for _ in range(repeats):
+        function()
+    return (time_stamp() - start) / repeats
+
+
+def run(sizes=(100, 500, 2000), repeats=20):
+    np.random.seed(0)
+    for num_nodes in sizes:
+        scenario = generate_scenario(num_nodes)
+        distance_matrix = get_distance_matrix(scenario)
+        route = np.random.permutation(num_nodes)
+        xy_route = scenario[route]
+
+        # a full scan is what every move costs once the route is close to a local optimum,
+        # a threshold that nothing passes forces it
+        legacy_repeats = repeats if num_nodes <= 100 else 1
+        results = {
+            'legacy first': time_call(lambda: legacy_find_segment_flip(xy_route), repeats),
+            'legacy full scan': time_call(lambda: legacy_find_segment_flip(xy_route, -np.inf), legacy_repeats),
+            'first': time_call(lambda: find_segment_flip(xy_route), repeats),
+            'full scan': time_call(lambda: find_segment_flip(xy_route, -np.inf), repeats),
+            'best': time_call(lambda: find_segment_flip(xy_route, mode='best'), repeats),
+            'best (distance matrix)': time_call(
+                lambda: find_segment_flip(route, mode='best', distance_matrix=distance_matrix), repeats),
+            'threshold': time_call(lambda: find_segment_flip(xy_route, 1, mode='threshold'), repeats),
+        }
+
+        print('n = {}'.format(num_nodes))
+        for name, milliseconds in results.items():
+            print('    {:<24}{:>12.3f} ms'.format(name, milliseconds))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,182 @@
+# the solvers on a fixed set of scenarios, recording their wall time, peak memory, speed and route length,
+# and comparing two such runs to catch regressions. replaces run_test of the notebook
+# run from the repository root:
+#     python -m benchmarks.suite run [--sizes 100 200] [--seeds 0 1 2] [--output results.json]
+#     python -m benchmarks.suite compare baseline.json results.json
+
+import sys
+import json
+import argparse
+import resource
+import platform
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import algorithms
+from utils import generate_scenario, calculate_journey_distance, time_stamp, Budget, Stats
+
+
+# each solver is called as solve(scenario, budget, stats), the budget caps the ones that take one
+SOLVERS = {
+    'greedy': lambda scenario, budget, stats: algorithms.greedy(scenario, stats=stats),
+    'local_search': lambda scenario, budget, stats: algorithms.local_search(scenario, budget=budget, stats=stats),
+    'simulated_annealing.basic': lambda scenario, budget, stats: algorithms.simulated_annealing.basic(
+        scenario, budget=budget, stats=stats),
+    'simulated_annealing.advanced':
+        lambda scenario, budget, stats: algorithms.simulated_annealing.advanced(scenario, budget=budget, stats=stats),
+    'ant_colony_optimization':
+        lambda scenario, budget, stats: algorithms.ant_colony_optimization.ant_colony_optimization(
+            scenario, budget=budget, stats=stats),
+}
+
+# the iterations each solver gets by default (see utils.Budget), unlike a time limit they make the routes
+# the same on every machine and every run
+ITERATIONS = {
+    'simulated_annealing.basic': 20000,
+    'simulated_annealing.advanced': 2000,
+    'ant_colony_optimization': 30,
+}
+
+
+def get_scenario(num_nodes, seed):
+    # the instance for a size and a seed is always the same, whatever ran before it
+    np.random.seed([num_nodes, seed])
+    return generate_scenario(num_nodes)
+
+
+def run_case(solver, num_nodes, seed, time_limit, by_time=False):
+    # solve one scenario in this (fresh) process, so the peak memory is the solver's own
+
+    # by_time: stop the solver by the time limit alone, instead of its amount of iterations
+    scenario = get_scenario(num_nodes, seed)
+    np.random.seed(seed)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    budget = Budget(time_limit, max_iterations=np.inf if by_time else ITERATIONS.get(solver, np.inf))
+    stats = Stats()
+
+    start = time_stamp()
+    route = SOLVERS[solver](scenario, budget, stats)
+    wall_time = time_stamp() - start
+
+    return {
+        'solver': solver,
+        'num_nodes': num_nodes,
+        'seed': seed,
+        'wall_time': wall_time,
+        'peak_memory': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024,
+        'iterations_per_second': budget.iterations / max(wall_time / 1000, 1e-9),
+        'moves_per_second': stats['moves_per_second'] if 'moves_evaluated' in stats else None,
+        'route_length': float(calculate_journey_distance(scenario[route])),
+        'valid': sorted(np.asarray(route).tolist()) == list(range(num_nodes)),
+        'timers': stats['timers'],
+    }
+
+
+def run(solvers, sizes, seeds, time_limit, by_time=False, num_workers=None):
+    # every case runs in its own worker process, the results are sorted the same way whatever finished first
+    cases = [(solver, num_nodes, seed) for solver in solvers for num_nodes in sizes for seed in seeds]
+    with ProcessPoolExecutor(num_workers, max_tasks_per_child=1) as pool:
+        futures = [pool.submit(run_case, solver, num_nodes, seed, time_limit, by_time) for solver, num_nodes, seed in cases]
+        results = [future.result() for future in futures]
+
+    return {
+        'config': {'solvers': solvers, 'sizes': sizes, 'seeds': seeds, 'time_limit': time_limit, 'by_time': by_time},
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine()},
+        'results': results,
+    }
+
+
+def summarize(results):
+    # the mean of each measure over the seeds, by (solver, num_nodes)
+    groups = {}
+    for result in results:
+        groups.setdefault((result['solver'], result['num_nodes']), []).append(result)
+    return {
+        key: {
+            measure: np.mean([result[measure] for result in group]) if group[0][measure] is not None else None
+            for measure in ['wall_time', 'peak_memory', 'iterations_per_second', 'moves_per_second', 'route_length']
+        }
+        for key, group in groups.items()
+    }
+
+
+def compare(baseline, current, speed_tolerance=0.1, quality_tolerance=0.01, min_wall_time=50):
+    # the regressions of the current run against the baseline, as a list of messages.
+    # a case is slower when its wall time grew or its iterations per second dropped by more than
+    # speed_tolerance (time limited solvers always take about the same wall time), and worse when
+    # its mean route length grew by more than quality_tolerance
+    # min_wall_time: cases faster than this many milliseconds in the baseline are too short to time reliably,
+    # only their quality is compared
+    baseline_summary, current_summary = summarize(baseline['results']), summarize(current['results'])
+    regressions = []
+
+    for key in sorted(set(baseline_summary) & set(current_summary)):
+        old, new = baseline_summary[key], current_summary[key]
+        name = '{} n={}'.format(*key)
+
+        if old['wall_time'] >= min_wall_time:
+            if new['wall_time'] > old['wall_time'] * (1 + speed_tolerance):
+                regressions.append('{}: wall time {:.1f} -> {:.1f} ms'.format(name, old['wall_time'], new['wall_time']))
+            if new['iterations_per_second'] < old['iterations_per_second'] / (1 + speed_tolerance):
+                regressions.append('{}: iterations per second {:.1f} -> {:.1f}'.format(
+                    name, old['iterations_per_second'], new['iterations_per_second']))
+        if new['route_length'] > old['route_length'] * (1 + quality_tolerance):
+            regressions.append('{}: route length {:.2f} -> {:.2f}'.format(name, old['route_length'], new['route_length']))
+
+    return regressions
+
+
+def print_summary(results):
+    print('{:<30}{:>7}{:>12}{:>10}{:>14}{:>14}{:>12}'.format(
+        'solver', 'n', 'wall ms', 'peak MB', 'iterations/s', 'moves/s', 'length'))
+    for (solver, num_nodes), summary in summarize(results).items():
+        print('{:<30}{:>7}{:>12.1f}{:>10.1f}{:>14.1f}{:>14}{:>12.2f}'.format(
+            solver, num_nodes, summary['wall_time'], summary['peak_memory'], summary['iterations_per_second'],
+            '-' if summary['moves_per_second'] is None else '{:.0f}'.format(summary['moves_per_second']),
+            summary['route_length']))
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the solvers and write the results')
+    run_parser.add_argument('--solvers', nargs='+', choices=list(SOLVERS), default=list(SOLVERS))
+    run_parser.add_argument('--sizes', nargs='+', type=int, default=[100, 200, 500])
+    run_parser.add_argument('--seeds', nargs='+', type=int, default=[0, 1, 2])
+    run_parser.add_argument('--time-limit', type=float, default=60000, help='milliseconds per case at most')
+    run_parser.add_argument('--by-time', action='store_true',
+                            help='run the solvers for the whole time limit instead of a fixed amount of iterations')
+    run_parser.add_argument('--workers', type=int, default=None)
+    run_parser.add_argument('--output', default='benchmark_results.json')
+
+    compare_parser = commands.add_parser('compare', help='flag the regressions of a run against a baseline run')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--speed-tolerance', type=float, default=0.1)
+    compare_parser.add_argument('--quality-tolerance', type=float, default=0.01)
+
+    arguments = parser.parse_args(arguments)
+
+    if arguments.command == 'run':
+        results = run(arguments.solvers, arguments.sizes, arguments.seeds, arguments.time_limit, arguments.by_time,
+                      arguments.workers)
+        with open(arguments.output, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+        print_summary(results['results'])
+        invalid = [result for result in results['results'] if not result['valid']]
+        return 1 if invalid else 0
+
+    with open(arguments.baseline) as baseline_file, open(arguments.current) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+    if baseline['config'] != current['config']:
+        print('warning: the runs were made with different configurations')
+
+    regressions = compare(baseline, current, arguments.speed_tolerance, arguments.quality_tolerance)
+    for regression in regressions:
+        print(regression)
+    print('{} regressions'.format(len(regressions)))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
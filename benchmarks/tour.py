@@ -0,0 +1,67 @@
+# per move cost of the tour structures of utils.tour, against reversing the path in the route array
+# and updating the positions as improve_from_queue used to
+# run from the repository root: python -m benchmarks.tour [sizes...]
+
+import sys
+import numpy as np
+from utils import generate_scenario, get_neighbor_lists, get_positions, get_hilbert_order, ArrayTour, TwoLevelTour, time_stamp
+
+
+class PlainTour:
+    # the path is always reversed in the route array, whatever its length
+    def __init__(self, route):
+        self.route = route
+        self.positions = get_positions(route)
+
+    def flip(self, a, b):
+        start, end = self.positions[a], self.positions[b]
+        if start > end:
+            start, end = end, start
+        self.route[start: end + 1] = self.route[start: end + 1][::-1]
+        self.positions[self.route[start: end + 1]] = np.arange(start, end + 1)
+
+    def next(self, nodes):
+        return self.route[(self.positions[nodes] + 1) % len(self.route)]
+
+
+def time_moves(tour, moves):
+    # average microseconds per flip
+    start = time_stamp()
+    for a, b in moves:
+        tour.flip(a, b)
+    return (time_stamp() - start) * 1000 / len(moves)
+
+
+def run(sizes=(10000, 100000), num_moves=2000):
+    np.random.seed(0)
+    for num_nodes in sizes:
+        scenario = generate_scenario(num_nodes)
+        route = get_hilbert_order(scenario).astype(np.int32)
+        neighbors = get_neighbor_lists(scenario)
+
+        # flips between random nodes, and flips between close nodes as 2-opt over neighbor lists makes them
+        # (from a node's successor to one of its neighbors), which can still span much of the route
+        random_moves = np.random.randint(num_nodes, size=(num_moves, 2)).tolist()
+        nodes = np.random.randint(num_nodes, size=num_moves)
+        close_moves = np.stack([nodes, neighbors[nodes, np.random.randint(neighbors.shape[1], size=num_moves)]], axis=1)
+
+        print('n = {}'.format(num_nodes))
+        for name, structure in [('plain array', PlainTour), ('ArrayTour', ArrayTour), ('TwoLevelTour', TwoLevelTour)]:
+            results = []
+            for moves in (random_moves, close_moves):
+                tour = structure(route.copy())
+                if moves is close_moves:
+                    moves = [(int(tour.next(a)), int(b)) for a, b in moves]
+                results.append(time_moves(tour, moves))
+
+            tour = structure(route.copy())
+            start = time_stamp()
+            for node in nodes.tolist():
+                tour.next(node)
+            next_time = (time_stamp() - start) * 1000 / num_moves
+            print('    {:<16}random flip {:>9.1f} us    close flip {:>9.1f} us    next {:>6.1f} us'.format(
+                name, *results, next_time))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or (10000, 100000))
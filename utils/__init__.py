@@ -1,2 +1,11 @@
-from .utils import generate_scenario, calculate_journey_distance, time_stamp ,xy_route_to_indices_route, random_arange, find_pop, find_segment_flip, get_average_edge_length, get_distance_matrix
-
+from .utils import generate_scenario, calculate_journey_distance, calculate_journey_distances, time_stamp, random_arange, find_pop, find_segment_flip, \
+    apply_pop, apply_segment_flip, get_average_edge_length, get_distance_matrix, get_node_distances, get_position_distances, get_positions, count, \
+    sorted_sum
+from .neighbors import get_neighbor_lists
+from .distances import get_distance_oracle, EuclideanOracle, DenseOracle, CondensedOracle, MemmapOracle, TsplibOracle
+from .budget import Budget
+from .instrumentation import Stats, MemorySink, JsonLinesSink, timer, record, sample_route, summarize
+from .partition import get_partition, get_hilbert_order
+from .tour import ArrayTour, TwoLevelTour, move_node
+from .io import read_tsplib, write_tsplib, read_tour, write_tour, save_scenario, open_scenario, load_scenario
+from .bounds import get_lower_bound, GapTarget, watch_target_gap
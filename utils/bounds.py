@@ -0,0 +1,231 @@
+import numpy as np
+from .utils import get_node_distances, calculate_journey_distance, time_stamp, count
+from .neighbors import get_neighbor_lists
+from .partition import get_hilbert_order
+from .budget import Budget
+
+
+def get_lower_bound(scenario, neighbors=None, max_iterations=100, upper_bound=None, budget=None, exact_size=5000,
+                    stats=None):
+    # a lower bound on the length of any route through the scenario: the Held-Karp bound, the longest minimum
+    # 1-tree (a spanning tree of all the nodes but one, plus that node's two shortest edges) found by
+    # subgradient optimization over node penalties, which get added to the lengths of the node's edges and
+    # push every node towards two edges, like in a route. with max_iterations=0 it's the plain 1-tree bound.
+    # the trees are built on the candidate edges of the neighbor lists (joined along a Hilbert curve so they
+    # stay connected) rather than a distance matrix. a minimum tree over fewer edges can only be longer, so the
+    # final bound is computed on all the edges for scenarios of up to exact_size nodes, a true lower bound.
+    # larger ones get the candidate graph's bound, which is the same unless a tree edge is missing from it
+
+    # neighbors: candidate neighbor lists (see get_neighbor_lists), built when not given
+    # max_iterations: subgradient steps, each builds one tree
+    # upper_bound: the length of a known route, sizes the steps. estimated from the first tree when not given
+    # budget: a utils.Budget to stop the steps by, an iteration is one step
+    # exact_size: up to this many nodes the final tree is built on all the edges, in time growing with the
+    # square of the nodes but without a distance matrix
+    # stats: a dict or a utils.Stats for the 'bound_iterations'
+
+    num_nodes = len(scenario)
+    if num_nodes < 3:
+        return calculate_journey_distance(scenario) if num_nodes > 1 else 0.0
+    budget = budget or Budget(max_iterations=max_iterations)
+    max_iterations = min(max_iterations, budget.max_iterations)
+    neighbors = get_neighbor_lists(scenario) if neighbors is None else neighbors
+    edges, lengths = get_candidate_edges(scenario, neighbors)
+
+    penalties = np.zeros(num_nodes)
+    tree_length, degrees = get_one_tree(scenario, edges, lengths, penalties)
+    best_bound, best_penalties = tree_length, penalties.copy()
+    upper_bound = upper_bound or 1.25 * tree_length
+    # the step scale is halved whenever the bound stalls for a while
+    scale, stalled, previous_direction = 2.0, 0, np.zeros(num_nodes)
+
+    for _ in range(max_iterations):
+        if budget.exhausted():
+            break
+        budget.spend()
+        count(stats, 'bound_iterations')
+        directions = degrees - 2
+        if not directions.any():
+            # the tree is a route, and so the optimal one
+            break
+        # mixing in the previous direction dampens the zig zag of plain subgradient steps
+        direction = 0.7 * directions + 0.3 * previous_direction
+        step = scale * max(upper_bound - best_bound, 1e-9 * upper_bound) / np.dot(direction, direction)
+        penalties += step * direction
+        previous_direction = direction
+
+        tree_length, degrees = get_one_tree(scenario, edges, lengths, penalties)
+        bound = tree_length - 2 * penalties.sum()
+        if bound > best_bound:
+            best_bound, best_penalties, stalled = bound, penalties.copy(), 0
+        else:
+            stalled += 1
+            if stalled >= 5:
+                scale, stalled = scale / 2, 0
+                if scale < 1e-3:
+                    break
+
+    if num_nodes <= exact_size:
+        return get_exact_one_tree(scenario, best_penalties) - 2 * best_penalties.sum()
+    return best_bound
+
+
+def get_candidate_edges(scenario, neighbors):
+    # the edges to every node's candidate neighbors and between nodes one or two apart on a Hilbert curve, so
+    # the edges connect all the nodes even without any one of them. each edge is there once as (low node,
+    # high node), returned with their lengths
+    order = get_hilbert_order(scenario) if scenario.shape[1] >= 2 else np.argsort(scenario[:, 0])
+    edges = np.concatenate([
+        np.column_stack([np.repeat(np.arange(len(scenario)), neighbors.shape[1]), neighbors.ravel()]),
+        np.column_stack([order[:-1], order[1:]]),
+        np.column_stack([order[:-2], order[2:]]),
+    ])
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    return edges, get_node_distances(scenario, edges[:, 0], edges[:, 1])
+
+
+def get_one_tree(scenario, edges, lengths, penalties, special_node=0):
+    # the minimum 1-tree on the candidate edges with the penalties added to their lengths: a spanning tree of
+    # the nodes but special_node, by Boruvka's algorithm, and special_node's two shortest edges to any node.
+    # returns its penalized length and the degree of every node in it
+    num_nodes = len(scenario)
+    costs = lengths + penalties[edges[:, 0]] + penalties[edges[:, 1]]
+    kept = (edges[:, 0] != special_node) & (edges[:, 1] != special_node)
+    tree = get_spanning_tree(num_nodes, edges[kept], costs[kept])
+    degrees = np.bincount(edges[kept][tree].ravel(), minlength=num_nodes)
+    tree_length = costs[kept][tree].sum()
+
+    special_costs = get_node_distances(scenario, special_node, np.arange(num_nodes)) + penalties[special_node] + penalties
+    special_costs[special_node] = np.inf
+    closest = np.argpartition(special_costs, 1)[:2]
+    degrees[closest] += 1
+    degrees[special_node] += 2
+    return tree_length + special_costs[closest].sum(), degrees
+
+
+def get_spanning_tree(num_nodes, edges, costs):
+    # the edges (a boolean mask) of a minimum spanning forest of the nodes, by Boruvka's algorithm:
+    # in every round each component takes its cheapest edge out, which at least halves the components. ties
+    # are broken by the edge's index, so the picked edges never close a cycle
+    order = np.argsort(costs, kind='stable')
+    edges = edges[order]
+    components = np.arange(num_nodes)
+    tree = np.zeros(len(edges), dtype=bool)
+
+    while True:
+        low, high = components[edges[:, 0]], components[edges[:, 1]]
+        # the edges are in order of their costs, so the first outgoing edge of each component is its cheapest
+        outgoing = np.flatnonzero(low != high)
+        if len(outgoing) == 0:
+            break
+        cheapest = np.full(num_nodes, len(edges))
+        np.minimum.at(cheapest, low[outgoing], outgoing)
+        np.minimum.at(cheapest, high[outgoing], outgoing)
+        picked = np.unique(cheapest[cheapest < len(edges)])
+        tree[picked] = True
+        components = merge_components(components, low[picked], high[picked])
+
+    mask = np.zeros(len(edges), dtype=bool)
+    mask[order] = tree
+    return mask
+
+
+def merge_components(components, low, high):
+    # relabel every node with the smallest label connected to it by the (low, high) label pairs, hooking
+    # labels onto smaller ones and then following the labels to their ends
+    labels = np.arange(len(components))
+    while True:
+        smallest = np.minimum(labels[low], labels[high])
+        np.minimum.at(labels, labels[low], smallest)
+        np.minimum.at(labels, labels[high], smallest)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels[low], labels[high]):
+            return labels[components]
+
+
+def get_exact_one_tree(scenario, penalties, special_node=0):
+    # the penalized length of the minimum 1-tree on all the edges, by Prim's algorithm with the distances
+    # from each node added to the tree computed as it's added, so no distance matrix is needed
+    num_nodes = len(scenario)
+    others = np.delete(np.arange(num_nodes), special_node)
+    in_tree = np.zeros(num_nodes, dtype=bool)
+    in_tree[special_node] = True
+    costs = np.full(num_nodes, np.inf)
+    node = others[0]
+    tree_length = 0.0
+
+    for _ in range(len(others) - 1):
+        in_tree[node] = True
+        costs = np.minimum(costs, get_node_distances(scenario, node, np.arange(num_nodes)) + penalties[node] + penalties)
+        costs[in_tree] = np.inf
+        node = int(np.argmin(costs))
+        tree_length += costs[node]
+
+    special_costs = get_node_distances(scenario, special_node, others) + penalties[special_node] + penalties[others]
+    return tree_length + np.partition(special_costs, 1)[:2].sum()
+
+
+class GapTarget:
+    # a cancel token (see Budget) that gets set once a route checked by it is within a gap of a lower bound,
+    # so a solver stops as soon as its route is good enough. the routes are checked by the solver's callback
+    # (see watch), at most so often that the checks take about a tenth of the time
+
+    # bound: a lower bound on the length of the routes (see get_lower_bound)
+    # gap: how much longer than the bound a route may be, 0.01 for 1%
+    # cancel_token: another token to stop by, such as the budget's own
+
+    def __init__(self, scenario, bound, gap, cancel_token=None):
+        self.scenario = scenario
+        self.target = bound * (1 + gap)
+        self.cancel_token = cancel_token
+        self.reached = False
+        self.next_check = 0
+
+    def check(self, route):
+        if self.reached or time_stamp() < self.next_check:
+            return
+        start = time_stamp()
+        self.reached = calculate_journey_distance(self.scenario[np.asarray(route)]) <= self.target
+        self.next_check = start + 10 * (time_stamp() - start)
+
+    def watch(self, callback=None):
+        # a callback that checks the route and then calls the solver's own callback
+        def watching_callback(route):
+            self.check(route)
+            if callback is not None:
+                callback(route)
+        return watching_callback
+
+    def is_set(self):
+        return self.reached or (self.cancel_token is not None and self.cancel_token.is_set())
+
+
+class GapBudget(Budget):
+    # a solver's own copy of the caller's budget that also stops by a GapTarget, so the caller's budget keeps
+    # its cancel token and can be used again. the iterations are spent on both
+
+    def __init__(self, budget, cancel_token):
+        self.__dict__.update(vars(budget))
+        self.budget = budget
+        self.cancel_token = cancel_token
+
+    def spend(self, iterations=1):
+        self.iterations += iterations
+        self.budget.spend(iterations)
+
+
+def watch_target_gap(scenario, target_gap, budget, callback=None, neighbors=None, stats=None):
+    # set up a solver for its target_gap: a GapTarget on the lower bound of the scenario, which may take a
+    # tenth of the budget's time, checks the routes the solver's callback gets.
+    # returns the budget to run by instead of the given one, which stops once the target is reached too, and
+    # the callback
+    remaining = budget.deadline - time_stamp()
+    bound_budget = Budget(time_limit=0.1 * remaining) if remaining < np.inf else None
+    bound = get_lower_bound(scenario, neighbors, budget=bound_budget, stats=stats)
+    target = GapTarget(scenario, bound, target_gap, budget.cancel_token)
+    return GapBudget(budget, target), target.watch(callback)
@@ -0,0 +1,40 @@
+import numpy as np
+from .utils import time_stamp
+
+
+class Budget:
+    # when a solver has to stop: after a time limit, at a deadline, after an amount of iterations or once it is
+    # cancelled, whichever comes first. all the times are milliseconds of utils.time_stamp, a monotonic clock
+
+    # time_limit: milliseconds from the creation of the budget
+    # deadline: the time_stamp() to stop at
+    # max_iterations: the amount of iterations to stop after, each solver counts its own (see spend)
+    # cancel_token: anything with an is_set() method, such as a threading.Event, the solver stops once it is set
+
+    def __init__(self, time_limit=np.inf, deadline=np.inf, max_iterations=np.inf, cancel_token=None):
+        self.start_time = time_stamp()
+        self.deadline = min(self.start_time + time_limit, deadline)
+        self.max_iterations = max_iterations
+        self.cancel_token = cancel_token
+        self.iterations = 0
+
+    def spend(self, iterations=1):
+        self.iterations += iterations
+
+    def exhausted(self):
+        return self.iterations >= self.max_iterations or \
+            (self.cancel_token is not None and self.cancel_token.is_set()) or \
+            time_stamp() >= self.deadline
+
+    def elapsed(self):
+        return time_stamp() - self.start_time
+
+    def progress(self):
+        # the part of the budget used so far between 0 and 1, by time or by iterations, whichever is further
+        # along. stays 0 for a budget that is only stopped by its cancel token
+        progress = 0
+        if self.deadline < np.inf:
+            progress = self.elapsed() / max(self.deadline - self.start_time, 1e-9)
+        if self.max_iterations < np.inf:
+            progress = max(progress, self.iterations / max(self.max_iterations, 1))
+        return min(progress, 1)
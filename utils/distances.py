@@ -0,0 +1,154 @@
+import os
+import tempfile
+import numpy as np
+from .utils import get_node_distances, get_distance_matrix, get_block_size
+
+
+# distance oracles give the distances between nodes of a scenario without the solvers caring how they are
+# stored. they are indexed like a distance matrix, oracle[nodes_a, nodes_b] with index arrays broadcast against
+# each other, so any of them can be passed wherever a distance_matrix is taken (see utils.find_segment_flip)
+
+
+class EuclideanOracle:
+    # computes the distances from the coordinates on every lookup, no memory beyond the scenario itself
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.shape = (scenario.shape[0], scenario.shape[0])
+
+    def __getitem__(self, nodes):
+        nodes_a, nodes_b = nodes
+        return get_node_distances(self.scenario, nodes_a, nodes_b)
+
+
+class DenseOracle:
+    # a full distance matrix, in float32 it takes half the memory of get_distance_matrix's default
+
+    def __init__(self, scenario, dtype=np.float32, block_size=None):
+        self.matrix = get_distance_matrix(scenario, dtype, block_size)
+        self.shape = self.matrix.shape
+
+    def __getitem__(self, nodes):
+        return self.matrix[nodes]
+
+
+class CondensedOracle:
+    # only the upper right triangle of the distance matrix, stored row after row in a flat array,
+    # about half the memory of a dense matrix of the same dtype
+
+    def __init__(self, scenario, dtype=np.float32, block_size=None):
+        num_nodes = scenario.shape[0]
+        self.shape = (num_nodes, num_nodes)
+        self.distances = np.empty(num_nodes * (num_nodes - 1) // 2, dtype=dtype)
+
+        # fill a block of rows at a time, each row holds the distances to the nodes after it
+        block_size = block_size or get_block_size(num_nodes)
+        for start in range(0, num_nodes, block_size):
+            rows = np.arange(start, min(start + block_size, num_nodes))
+            columns = np.arange(num_nodes)
+            block = get_node_distances(scenario, rows[:, None], columns)
+            upper = columns > rows[:, None]
+            self.distances[self.get_offsets(rows[0], rows[0] + 1): self.get_offsets(rows[-1], num_nodes)] = block[upper]
+
+    def get_offsets(self, nodes_a, nodes_b):
+        # where the distance between each pair of nodes is kept, for nodes_a < nodes_b
+        num_nodes = self.shape[0]
+        return nodes_a * num_nodes - nodes_a * (nodes_a + 1) // 2 + nodes_b - nodes_a - 1
+
+    def __getitem__(self, nodes):
+        nodes_a, nodes_b = np.broadcast_arrays(*[np.asarray(node, dtype=np.int64) for node in nodes])
+        low, high = np.minimum(nodes_a, nodes_b), np.maximum(nodes_a, nodes_b)
+
+        # the diagonal isn't stored, point it anywhere and zero it after the lookup. a lookup of two single
+        # nodes gives a scalar, like a matrix does
+        same = low == high
+        return np.where(same, 0, self.distances[np.where(same, 0, self.get_offsets(low, high))])[()]
+
+
+class MemmapOracle:
+    # a full distance matrix kept in a file and mapped into memory, so only the pages in use take RAM.
+    # the file is built block by block, and can be opened again by other processes
+
+    # path: the file for the matrix, a temporary file that is deleted by close() when not given
+
+    def __init__(self, scenario, dtype=np.float32, path=None, block_size=None):
+        num_nodes = scenario.shape[0]
+        self.temporary = path is None
+        if self.temporary:
+            handle, path = tempfile.mkstemp(suffix='.distances')
+            os.close(handle)
+        self.path = path
+
+        # written as a plain file rather than through the mapping, so the written pages don't stay resident
+        block_size = block_size or get_block_size(num_nodes)
+        with open(path, 'wb') as matrix_file:
+            for start in range(0, num_nodes, block_size):
+                rows = np.arange(start, min(start + block_size, num_nodes))
+                get_node_distances(scenario, rows[:, None], np.arange(num_nodes)).astype(dtype).tofile(matrix_file)
+
+        self.matrix = np.memmap(path, dtype=dtype, mode='r', shape=(num_nodes, num_nodes))
+        self.shape = self.matrix.shape
+
+    def __getitem__(self, nodes):
+        return self.matrix[nodes]
+
+    def close(self):
+        del self.matrix
+        if self.temporary:
+            os.remove(self.path)
+
+
+class TsplibOracle:
+    # the integer distances of a TSPLIB edge weight type, computed from the coordinates on every lookup, so
+    # route lengths can be compared to the published optima (see utils.io.read_tsplib)
+
+    # edge_weight_type: 'EUC_2D', 'EUC_3D' and 'CEIL_2D' round the euclidean distance to the nearest or the next
+    # integer, 'ATT' is the pseudo-euclidean distance and 'GEO' the distance on the earth in kilometers of
+    # coordinates in DDD.MM degrees and minutes
+
+    def __init__(self, scenario, edge_weight_type='EUC_2D'):
+        if edge_weight_type not in ('EUC_2D', 'EUC_3D', 'CEIL_2D', 'ATT', 'GEO'):
+            raise ValueError("edge_weight_type should be one of 'EUC_2D', 'EUC_3D', 'CEIL_2D', 'ATT' or 'GEO', got {!r}".format(edge_weight_type))
+        self.scenario = scenario
+        self.edge_weight_type = edge_weight_type
+        self.shape = (scenario.shape[0], scenario.shape[0])
+        if edge_weight_type == 'GEO':
+            # latitude and longitude in radians, by TSPLIB's own value of pi
+            degrees = np.trunc(scenario)
+            self.radians = 3.141592 * (degrees + 5 * (scenario - degrees) / 3) / 180
+
+    def __getitem__(self, nodes):
+        nodes_a, nodes_b = nodes
+        if self.edge_weight_type == 'GEO':
+            latitude_a, longitude_a = self.radians[nodes_a, 0], self.radians[nodes_a, 1]
+            latitude_b, longitude_b = self.radians[nodes_b, 0], self.radians[nodes_b, 1]
+            q1 = np.cos(longitude_a - longitude_b)
+            q2 = np.cos(latitude_a - latitude_b)
+            q3 = np.cos(latitude_a + latitude_b)
+            distances = np.floor(6378.388 * np.arccos(np.clip(0.5 * ((1 + q1) * q2 - (1 - q1) * q3), -1, 1)) + 1)
+            # the formula gives 1 for a node to itself
+            return np.where(np.asarray(nodes_a) == np.asarray(nodes_b), 0, distances)
+
+        distances = get_node_distances(self.scenario, nodes_a, nodes_b)
+        if self.edge_weight_type == 'CEIL_2D':
+            return np.ceil(distances)
+        if self.edge_weight_type == 'ATT':
+            pseudo = distances / np.sqrt(10)
+            rounded = np.floor(pseudo + 0.5)
+            return np.where(rounded < pseudo, rounded + 1, rounded)
+        return np.floor(distances + 0.5)
+
+
+def get_distance_oracle(scenario, backend='euclidean', dtype=np.float32, path=None, block_size=None):
+    # backend: 'euclidean' (computed on the fly), 'dense', 'condensed' (upper triangle only) or 'memmap'
+    # dtype: the type the distances are stored in, not used by 'euclidean'
+    # path: the file of the 'memmap' backend
+    if backend == 'euclidean':
+        return EuclideanOracle(scenario)
+    if backend == 'dense':
+        return DenseOracle(scenario, dtype, block_size)
+    if backend == 'condensed':
+        return CondensedOracle(scenario, dtype, block_size)
+    if backend == 'memmap':
+        return MemmapOracle(scenario, dtype, path, block_size)
+    raise ValueError("backend should be one of 'euclidean', 'dense', 'condensed' or 'memmap', got {!r}".format(backend))
@@ -0,0 +1,119 @@
+import json
+from contextlib import nullcontext
+import numpy as np
+from .utils import time_stamp, get_edge_lengths
+
+
+# the solvers take a stats argument to report where their time goes. a plain dict only gets the counters
+# (see utils.count), a Stats object also gets per phase timers, histories and route length samples and
+# passes them on to a sink. with stats=None every hook returns right away, so leaving it out costs nothing
+
+
+class Stats(dict):
+    # counters are the dict's own items, such as 'moves_evaluated' or 'moves_accepted'. the timers are kept
+    # under 'timers' as {phase: {'milliseconds': total, 'calls': amount}} and the histories as lists of values,
+    # such as 'convergence_scores' or 'route_lengths' ([elapsed, length] samples)
+
+    # sink: called with every event as a dict, such as a MemorySink or a JsonLinesSink. events are the
+    # history records as they happen and a summary of everything at the end of each solver run
+    # sample_interval: milliseconds between two samples of the route length (see sample_route), not sampled
+    # when not given
+
+    def __init__(self, sink=None, sample_interval=None):
+        super().__init__()
+        self.sink = sink
+        self.sample_interval = sample_interval
+        self.start_time = time_stamp()
+        self.last_sample = -np.inf
+        self['timers'] = {}
+
+    def timer(self, phase):
+        return Timer(self, phase)
+
+    def record(self, key, value):
+        # add a value to a history and pass it on to the sink
+        self.setdefault(key, []).append(value)
+        if self.sink is not None:
+            self.sink({'event': 'record', 'key': key, 'value': value, 'elapsed': time_stamp() - self.start_time})
+
+    def summarize(self, solver):
+        # pass everything gathered so far on to the sink, at the end of a solver run
+        if self.sink is not None:
+            self.sink({'event': 'summary', 'solver': solver, 'elapsed': time_stamp() - self.start_time,
+                       'stats': dict(self)})
+
+
+class Timer:
+    # adds the time spent inside a with block to a phase of a Stats object
+    __slots__ = ('stats', 'phase', 'start')
+
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time_stamp()
+
+    def __exit__(self, *exception):
+        timing = self.stats['timers'].setdefault(self.phase, {'milliseconds': 0, 'calls': 0})
+        timing['milliseconds'] += time_stamp() - self.start
+        timing['calls'] += 1
+
+
+class MemorySink(list):
+    # keeps the events in memory, in order
+    def __call__(self, event):
+        self.append(event)
+
+
+class JsonLinesSink:
+    # writes every event to a file as a line of JSON
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def __call__(self, event):
+        self.file.write(json.dumps(event, default=to_json) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def to_json(value):
+    # numpy values are written as the python values they hold
+    return value.tolist() if isinstance(value, np.ndarray) else value.item()
+
+
+NO_TIMER = nullcontext()
+
+
+def timer(stats, phase):
+    # a with block timing a phase, does nothing unless stats is a Stats object
+    return stats.timer(phase) if isinstance(stats, Stats) else NO_TIMER
+
+
+def record(stats, key, value):
+    # add a value to a history of a Stats object
+    if isinstance(stats, Stats):
+        stats.record(key, value)
+
+
+def sample_route(stats, route, scenario=None, distance_matrix=None):
+    # record the length of the route under 'route_lengths', unless it was sampled less than
+    # the sample interval of the Stats object ago
+    if not isinstance(stats, Stats) or stats.sample_interval is None:
+        return
+    stamp = time_stamp()
+    if stamp - stats.last_sample >= stats.sample_interval:
+        stats.last_sample = stamp
+        route = np.asarray(route)
+        length = get_edge_lengths(route, scenario, distance_matrix).sum()
+        stats.record('route_lengths', [stamp - stats.start_time, float(length)])
+
+
+def summarize(stats, solver, start_time):
+    # the elapsed seconds and evaluated moves per second of a solver run, passed on to the sink of a Stats object
+    if stats is not None:
+        stats['elapsed'] = (time_stamp() - start_time) / 1000
+        stats['moves_per_second'] = stats.get('moves_evaluated', 0) / max(stats['elapsed'], 1e-9)
+    if isinstance(stats, Stats):
+        stats.summarize(solver)
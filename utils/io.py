@@ -0,0 +1,158 @@
+import os
+import re
+import numpy as np
+
+# the binary scenario format: a fixed size header followed by the raw coordinates, row after row, in little
+# endian. the header holds MAGIC, the format version, the coordinate type's code and the shape, padded with zeros
+MAGIC = b'TSPSCN'
+VERSION = 1
+HEADER_SIZE = 64
+DTYPE_CODES = {1: np.dtype('<f4'), 2: np.dtype('<f8')}
+
+# the characters read_numbers parses at a time, and where the numbers of a section end (EOF or the next section)
+CHUNK_SIZE = 2 ** 22
+SECTION_END = re.compile(r'^\s*[A-Za-z]', re.MULTILINE)
+
+
+def read_tsplib(path):
+    # read the coordinates of a TSPLIB .tsp file (NODE_COORD_SECTION), reading the file once from start to
+    # end. returns (scenario, header): a float64 array shaped (num_nodes, dimensions), node i of the file at
+    # row i - 1, and a dict of the specification lines such as 'NAME' and 'EDGE_WEIGHT_TYPE' (see TsplibOracle)
+    header = {}
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('NODE_COORD_SECTION'):
+                break
+            if line.startswith('EOF'):
+                raise ValueError('{} has no NODE_COORD_SECTION'.format(path))
+            key, _, value = line.partition(':')
+            header[key.strip()] = value.strip()
+        else:
+            raise ValueError('{} has no NODE_COORD_SECTION'.format(path))
+
+        num_nodes = int(header['DIMENSION'])
+        dimensions = 3 if header.get('EDGE_WEIGHT_TYPE', '').endswith('_3D') else 2
+        rows = read_numbers(file, num_nodes * (dimensions + 1))
+    rows = rows[: len(rows) // (dimensions + 1) * (dimensions + 1)].reshape(-1, dimensions + 1)
+
+    if rows.shape != (num_nodes, dimensions + 1):
+        raise ValueError('{} should have {} nodes with {} coordinates, got {} values'.format(
+            path, num_nodes, dimensions, rows.shape))
+    ids = rows[:, 0].astype(np.int64) - 1
+    scenario = rows[:, 1:]
+    if not np.array_equal(ids, np.arange(num_nodes)):
+        scenario = np.empty_like(scenario)
+        scenario[ids] = rows[:, 1:]
+    return np.ascontiguousarray(scenario), header
+
+
+def read_numbers(file, max_numbers):
+    # up to max_numbers whitespace separated numbers from a text file, until a line that starts with a word.
+    # the file is read in chunks of whole lines that numpy parses at once, much faster than line by line
+    parts, rest, amount = [], '', 0
+    while amount < max_numbers:
+        chunk = file.read(CHUNK_SIZE)
+        chunk, rest = (rest + chunk, '') if not chunk else split_last_line(rest + chunk)
+        end = SECTION_END.search(chunk)
+        if end is not None:
+            chunk = chunk[:end.start()]
+        parts.append(np.fromstring(chunk, sep=' '))
+        amount += len(parts[-1])
+        if end is not None or not chunk:
+            break
+    return np.concatenate(parts)[:max_numbers] if parts else np.empty(0)
+
+
+def split_last_line(text):
+    # text up to its last line break, and the unfinished line after it
+    cut = text.rfind('\n') + 1
+    return text[:cut], text[cut:]
+
+
+def write_tsplib(path, scenario, name=None, edge_weight_type='EUC_2D', comment=None):
+    # write a scenario as a TSPLIB .tsp file
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'w') as file:
+        file.write('NAME : {}\n'.format(name))
+        if comment:
+            file.write('COMMENT : {}\n'.format(comment))
+        file.write('TYPE : TSP\nDIMENSION : {}\nEDGE_WEIGHT_TYPE : {}\nNODE_COORD_SECTION\n'.format(len(scenario), edge_weight_type))
+        rows = np.column_stack([np.arange(1, len(scenario) + 1), scenario])
+        np.savetxt(file, rows, fmt=['%d'] + ['%.17g'] * scenario.shape[1])
+        file.write('EOF\n')
+
+
+def read_tour(path):
+    # read the first tour of a TSPLIB .tour file (TOUR_SECTION), returns an int32 index route
+    with open(path) as file:
+        for line in file:
+            if line.strip().startswith('TOUR_SECTION'):
+                break
+        else:
+            raise ValueError('{} has no TOUR_SECTION'.format(path))
+
+        nodes = []
+        for line in file:
+            values = line.split()
+            if not values or values[0] == 'EOF':
+                break
+            ids = [int(value) for value in values]
+            if -1 in ids:
+                nodes.extend(ids[:ids.index(-1)])
+                break
+            nodes.extend(ids)
+    return np.array(nodes, dtype=np.int32) - 1
+
+
+def write_tour(path, route, name=None, comment=None):
+    # write an index route as a TSPLIB .tour file
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'w') as file:
+        file.write('NAME : {}\n'.format(name))
+        if comment:
+            file.write('COMMENT : {}\n'.format(comment))
+        file.write('TYPE : TOUR\nDIMENSION : {}\nTOUR_SECTION\n'.format(len(route)))
+        np.savetxt(file, np.asarray(route, dtype=np.int64) + 1, fmt='%d')
+        file.write('-1\nEOF\n')
+
+
+def save_scenario(path, scenario, dtype=np.float64):
+    # write a scenario in the binary format, to be opened by open_scenario
+    # dtype: np.float32 halves the file, the coordinates are rounded to about 7 digits
+    dtype = np.dtype(dtype).newbyteorder('<')
+    codes = {value: key for key, value in DTYPE_CODES.items()}
+    if dtype not in codes:
+        raise ValueError('dtype should be float32 or float64, got {}'.format(dtype))
+
+    header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+    fields = np.array([VERSION, codes[dtype], scenario.shape[0], scenario.shape[1]], dtype='<u8').view(np.uint8)
+    header[:len(MAGIC)] = np.frombuffer(MAGIC, dtype=np.uint8)
+    header[8: 8 + len(fields)] = fields
+
+    with open(path, 'wb') as file:
+        header.tofile(file)
+        np.ascontiguousarray(scenario, dtype=dtype).tofile(file)
+
+
+def open_scenario(path, mode='r'):
+    # open a scenario of the binary format as an np.memmap without reading it, the pages are read when they
+    # are first used and shared by every process that maps the same file. workers should get the path and
+    # open it themselves, a pickled memmap is sent as a copy
+    # mode: 'r' for read only, 'r+' to change the coordinates in the file, 'c' to change them in memory only
+    header = np.fromfile(path, dtype=np.uint8, count=HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:len(MAGIC)].tobytes() != MAGIC:
+        raise ValueError('{} is not a scenario file'.format(path))
+    version, code, num_nodes, dimensions = header[8: 40].view('<u8')
+    if version != VERSION or code not in DTYPE_CODES:
+        raise ValueError('{} has an unknown version {} or coordinate type {}'.format(path, version, code))
+    return np.memmap(path, dtype=DTYPE_CODES[code], mode=mode, offset=HEADER_SIZE, shape=(int(num_nodes), int(dimensions)))
+
+
+def load_scenario(path):
+    # a scenario from a TSPLIB .tsp file or a file of the binary format, by its extension
+    if path.endswith('.tsp'):
+        return read_tsplib(path)[0]
+    return open_scenario(path)
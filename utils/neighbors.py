@@ -0,0 +1,101 @@
+import numpy as np
+from .utils import get_node_distances
+
+
+def get_neighbor_lists(scenario, num_neighbors=10, points_per_cell=2):
+    # find the num_neighbors nearest nodes of every node in the scenario, built once per scenario
+    # and shared by the solvers to restrict their move search to promising candidates.
+    # returns an int32 array shaped (num_nodes, num_neighbors), each row sorted from near to far
+
+    # points_per_cell: average amount of nodes in each cell of the grid used for the search
+
+    num_nodes = scenario.shape[0]
+    num_neighbors = min(num_neighbors, num_nodes - 1)
+    neighbors = np.empty((num_nodes, max(num_neighbors, 0)), dtype=np.int32)
+
+    if num_neighbors <= 0:
+        return neighbors
+
+    # the grid only works on the plane, anything else is searched by brute force
+    if scenario.shape[1] != 2:
+        return get_brute_force_neighbor_lists(scenario, num_neighbors)
+
+    # bucket the nodes in a square grid, nodes of a cell are contiguous in the sorted order
+    grid_size = max(1, int(np.sqrt(num_nodes / points_per_cell)))
+    corner = scenario.min(axis=0)
+    cell_width = max((scenario.max(axis=0) - corner).max() / grid_size, np.finfo(float).tiny)
+
+    cells = np.minimum(((scenario - corner) / cell_width).astype(np.int64), grid_size - 1)
+    cell_ids = cells[:, 0] * grid_size + cells[:, 1]
+    order = np.argsort(cell_ids, kind='stable').astype(np.int32)
+    cell_starts = np.searchsorted(cell_ids[order], np.arange(grid_size ** 2 + 1))
+
+    # the amount of cells around a node that is expected to hold enough candidates
+    initial_radius = max(1, int(np.ceil((np.sqrt(num_neighbors / points_per_cell) - 1) / 2)))
+
+    # nodes are handled in tiles of consecutive cells of a grid column, big enough to keep
+    # the per tile overhead low and small enough to keep the candidate sets local
+    tile_size = max(1, 32 // points_per_cell)
+
+    for cell_x in range(grid_size):
+        for tile_low_y in range(0, grid_size, tile_size):
+            tile_high_y = min(tile_low_y + tile_size, grid_size) - 1
+            nodes = order[cell_starts[cell_x * grid_size + tile_low_y]: cell_starts[cell_x * grid_size + tile_high_y + 1]]
+            radius = initial_radius
+
+            # grow the searched rectangle until the kth nearest candidate of every node is closer than
+            # any node outside of it could be
+            while len(nodes) > 0:
+                low_x, high_x = max(cell_x - radius, 0), min(cell_x + radius, grid_size - 1)
+                low_y, high_y = max(tile_low_y - radius, 0), min(tile_high_y + radius, grid_size - 1)
+                candidates = np.concatenate([
+                    order[cell_starts[x * grid_size + low_y]: cell_starts[x * grid_size + high_y + 1]]
+                    for x in range(low_x, high_x + 1)
+                ])
+
+                if len(candidates) <= num_neighbors:
+                    radius *= 2
+                    continue
+
+                distances = get_node_distances(scenario, nodes[:, None], candidates)
+                distances[nodes[:, None] == candidates] = np.inf
+                nearest = np.argpartition(distances, num_neighbors - 1, axis=1)[:, :num_neighbors]
+                nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+                sorting = np.argsort(nearest_distances, axis=1)
+                neighbors[nodes] = candidates[np.take_along_axis(nearest, sorting, axis=1)]
+
+                # distance from each node to the closest side of the searched rectangle that has nodes beyond it
+                margins = np.full(len(nodes), np.inf)
+                rectangle_low = corner + np.array([low_x, low_y]) * cell_width
+                rectangle_high = corner + (np.array([high_x, high_y]) + 1) * cell_width
+                for axis, (low, high) in enumerate([(low_x, high_x), (low_y, high_y)]):
+                    if low > 0:
+                        margins = np.minimum(margins, scenario[nodes, axis] - rectangle_low[axis])
+                    if high < grid_size - 1:
+                        margins = np.minimum(margins, rectangle_high[axis] - scenario[nodes, axis])
+
+                nodes = nodes[nearest_distances.max(axis=1) > margins]
+                radius *= 2
+
+    return neighbors
+
+
+def get_brute_force_neighbor_lists(scenario, num_neighbors=10, block_size=1024):
+    # same as get_neighbor_lists by comparing every node to every other one, block by block
+    num_nodes = scenario.shape[0]
+    num_neighbors = min(num_neighbors, num_nodes - 1)
+    neighbors = np.empty((num_nodes, max(num_neighbors, 0)), dtype=np.int32)
+    all_nodes = np.arange(num_nodes)
+
+    if num_neighbors <= 0:
+        return neighbors
+
+    for start in range(0, num_nodes, block_size):
+        nodes = all_nodes[start: start + block_size]
+        distances = get_node_distances(scenario, nodes[:, None], all_nodes)
+        distances[np.arange(len(nodes)), nodes] = np.inf
+        nearest = np.argpartition(distances, num_neighbors - 1, axis=1)[:, :num_neighbors]
+        sorting = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1)
+        neighbors[nodes] = np.take_along_axis(nearest, sorting, axis=1)
+
+    return neighbors
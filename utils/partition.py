@@ -0,0 +1,106 @@
+import numpy as np
+
+
+# partitions split a scenario into spatial clusters of nodes, returned as a list of index arrays
+# in the order the clusters should be visited, so neighboring clusters are usually adjacent
+
+
+def get_partition(scenario, cluster_size=1000, method='grid', seed=None):
+    # cluster_size: the average amount of nodes in a cluster
+    # method: 'grid' (square cells visited in a snake order), 'kmeans' (clusters around k-means
+    #         centers, visited along a Hilbert curve over the centers) or 'hilbert' (consecutive runs
+    #         of the nodes along a Hilbert curve)
+    # seed: seeds the initial k-means centers
+    num_clusters = max(1, int(np.ceil(scenario.shape[0] / cluster_size)))
+    if method == 'grid':
+        return partition_grid(scenario, num_clusters)
+    if method == 'kmeans':
+        return partition_kmeans(scenario, num_clusters, seed=seed)
+    if method == 'hilbert':
+        return partition_hilbert(scenario, num_clusters)
+    raise ValueError("method should be one of 'grid', 'kmeans' or 'hilbert', got {!r}".format(method))
+
+
+def partition_grid(scenario, num_clusters):
+    # about num_clusters square cells, row after row with every other row reversed
+    grid_size = max(1, int(np.ceil(np.sqrt(num_clusters))))
+    corner = scenario[:, :2].min(axis=0)
+    cell_width = max((scenario[:, :2].max(axis=0) - corner).max() / grid_size, np.finfo(float).tiny)
+
+    cells = np.minimum(((scenario[:, :2] - corner) / cell_width).astype(np.int64), grid_size - 1)
+    columns = np.where(cells[:, 0] % 2 == 0, cells[:, 1], grid_size - 1 - cells[:, 1])
+    return split_by_labels(cells[:, 0] * grid_size + columns)
+
+
+def partition_kmeans(scenario, num_clusters, iterations=10, seed=None, block_size=4096):
+    # lloyd's k-means from random nodes as the centers, every iteration compares all the nodes
+    # to all the centers, a block of nodes at a time
+    random = np.random.RandomState(seed)
+    centers = scenario[random.choice(scenario.shape[0], num_clusters, replace=False)].astype(float)
+
+    for _ in range(iterations):
+        labels = get_nearest_centers(scenario, centers, block_size)
+        sizes = np.bincount(labels, minlength=num_clusters)
+        for axis in range(scenario.shape[1]):
+            sums = np.bincount(labels, weights=scenario[:, axis], minlength=num_clusters)
+            # a center left without nodes stays where it is
+            centers[:, axis] = np.where(sizes > 0, sums / np.maximum(sizes, 1), centers[:, axis])
+
+    labels = get_nearest_centers(scenario, centers, block_size)
+    clusters = split_by_labels(labels)
+
+    # visit the clusters in the order of their centers along a Hilbert curve
+    centers = np.array([scenario[cluster].mean(axis=0) for cluster in clusters])
+    return [clusters[index] for index in get_hilbert_order(centers)]
+
+
+def get_nearest_centers(scenario, centers, block_size=4096):
+    # the index of the closest center to each node
+    labels = np.empty(scenario.shape[0], dtype=np.int64)
+    for start in range(0, scenario.shape[0], block_size):
+        nodes = np.arange(start, min(start + block_size, scenario.shape[0]))
+        points = scenario[nodes]
+        squared = 0
+        for axis in range(scenario.shape[1]):
+            deltas = points[:, axis, None] - centers[:, axis]
+            squared = squared + deltas * deltas
+        labels[nodes] = np.argmin(squared, axis=1)
+    return labels
+
+
+def partition_hilbert(scenario, num_clusters):
+    # runs of about the same amount of consecutive nodes along the curve
+    return np.array_split(get_hilbert_order(scenario), num_clusters)
+
+
+def get_hilbert_order(scenario, bits=16):
+    # the nodes sorted by their position along a Hilbert curve over the bounding square of the scenario,
+    # nodes close along the curve are close on the plane
+    corner = scenario[:, :2].min(axis=0)
+    side = max((scenario[:, :2].max(axis=0) - corner).max(), np.finfo(float).tiny)
+    grid = ((scenario[:, :2] - corner) / side * (2 ** bits - 1)).astype(np.int64)
+    x, y = grid[:, 0], grid[:, 1]
+
+    distances = np.zeros(scenario.shape[0], dtype=np.int64)
+    level = 2 ** (bits - 1)
+    while level > 0:
+        rx = (x & level) > 0
+        ry = (y & level) > 0
+        distances += level * level * ((3 * rx) ^ ry)
+
+        # rotate the quadrant so the curve inside it starts and ends at the right corners
+        flip = ~ry & rx
+        x = np.where(flip, 2 ** bits - 1 - x, x)
+        y = np.where(flip, 2 ** bits - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        level //= 2
+
+    return np.argsort(distances, kind='stable')
+
+
+def split_by_labels(labels):
+    # the nodes of each label, labels in increasing order and empty ones left out
+    order = np.argsort(labels, kind='stable')
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, boundaries)
+
@@ -0,0 +1,65 @@
+import itertools
+import numpy as np
+from algorithms.local_search import local_search
+from algorithms.simulated_annealing import advanced
+from .bounds import get_lower_bound, get_candidate_edges, get_one_tree, get_exact_one_tree, GapTarget
+from .budget import Budget
+from .neighbors import get_neighbor_lists
+from .utils import generate_scenario, calculate_journey_distance
+
+
+def test_lower_bound():
+    # the bound is below the shortest route, found by trying every route of a small scenario
+    for seed in range(3):
+        np.random.seed(seed)
+        scenario = generate_scenario(8)
+        shortest = min(calculate_journey_distance(scenario[[0, *route]]) for route in itertools.permutations(range(1, 8)))
+        one_tree = get_lower_bound(scenario, max_iterations=0)
+        bound = get_lower_bound(scenario)
+        assert (one_tree <= bound <= shortest + 1e-9)
+        # the candidate graph's bound can't be below the one on all the edges
+        assert (get_lower_bound(scenario, exact_size=0) >= bound - 1e-9)
+
+
+def test_one_tree():
+    # the 1-tree on the candidate edges is the one on all the edges, here with penalties too
+    scenario = generate_scenario(300)
+    edges, lengths = get_candidate_edges(scenario, get_neighbor_lists(scenario))
+    penalties = np.random.uniform(-1, 1, 300)
+    tree_length, degrees = get_one_tree(scenario, edges, lengths, penalties)
+    assert (np.isclose(tree_length, get_exact_one_tree(scenario, penalties)))
+    assert (degrees.sum() == 2 * 300 and degrees.min() >= 1)
+
+
+def test_gap_target():
+    # the token is set once a checked route is within the gap of the bound
+    scenario = generate_scenario(20)
+    route = np.arange(20)
+    length = calculate_journey_distance(scenario[route])
+
+    target = GapTarget(scenario, length / 1.2, 0.1)
+    target.watch()(route)
+    assert (not target.is_set())
+
+    target = GapTarget(scenario, length / 1.05, 0.1)
+    target.watch()(route)
+    assert (target.is_set())
+
+
+def test_target_gap():
+    # the solvers stop once their route is within the target of the lower bound, before the budget runs out
+    scenario = generate_scenario(60)
+    budget = Budget(max_iterations=6000)
+    route = advanced(scenario, budget=budget, target_gap=0.3, use_queue=True, neighbors=get_neighbor_lists(scenario))
+    assert (budget.iterations < 6000 and sorted(route) == list(range(60)))
+    assert (calculate_journey_distance(scenario[route]) <= 1.3 * get_lower_bound(scenario) + 1e-9)
+
+    stats = {}
+    budget = Budget()
+    local_search(scenario, target_gap=0.5, budget=budget, stats=stats)
+    assert (stats['bound_iterations'] > 0)
+    # the caller's budget is left as it was, run again without a target it goes on to the local optimum
+    assert (budget.cancel_token is None)
+    stopped_at = budget.iterations
+    local_search(scenario, budget=budget)
+    assert (0 < stopped_at < budget.iterations - stopped_at)
@@ -0,0 +1,33 @@
+from .distances import get_distance_oracle
+from .utils import generate_scenario, get_distance_matrix, find_segment_flip
+import numpy as np
+import os
+
+
+def test_distance_oracles():
+    # every backend gives the same distances as the dense matrix, for any broadcast of nodes
+    scenario = generate_scenario(50)
+    expected_distances = get_distance_matrix(scenario)
+    nodes_a, nodes_b = np.random.randint(50, size=(7, 1)), np.random.randint(50, size=9)
+
+    for backend in ['euclidean', 'dense', 'condensed', 'memmap']:
+        oracle = get_distance_oracle(scenario, backend, block_size=7)
+        assert (oracle.shape == (50, 50))
+        assert (np.allclose(oracle[nodes_a, nodes_b], expected_distances[nodes_a, nodes_b], rtol=1e-6))
+        assert (np.all(oracle[np.arange(50), np.arange(50)] == 0))
+        # single nodes give scalars
+        assert (np.isclose(oracle[3, 17], expected_distances[3, 17], rtol=1e-6) and oracle[4, 4] == 0)
+        assert (np.ndim(oracle[3, 17]) == 0)
+
+        if backend == 'memmap':
+            oracle.close()
+            assert (not os.path.exists(oracle.path))
+
+
+def test_oracle_moves():
+    # the move search gives the same result over an oracle as over the scenario
+    scenario = generate_scenario(30)
+    route = np.random.permutation(30)
+    oracle = get_distance_oracle(scenario, 'condensed', dtype=np.float64)
+    assert (find_segment_flip(route, mode='best', distance_matrix=oracle) ==
+            find_segment_flip(route, mode='best', scenario=scenario))
@@ -0,0 +1,48 @@
+import json
+import numpy as np
+from .utils import generate_scenario
+from .instrumentation import Stats, MemorySink, JsonLinesSink, timer, record, sample_route, summarize
+
+
+def test_stats():
+    sink = MemorySink()
+    stats = Stats(sink, sample_interval=0)
+
+    with timer(stats, 'phase'):
+        record(stats, 'scores', 1.5)
+    with timer(stats, 'phase'):
+        pass
+    assert (stats['timers']['phase']['calls'] == 2 and stats['timers']['phase']['milliseconds'] >= 0)
+    assert (stats['scores'] == [1.5])
+
+    # the route length of an indices route is sampled, every time with a zero interval
+    scenario = np.array([[0, 0], [0, 3], [4, 3], [4, 0]])
+    sample_route(stats, np.array([0, 1, 2, 3]), scenario)
+    sample_route(stats, np.array([0, 2, 1, 3]), scenario)
+    assert ([length for _, length in stats['route_lengths']] == [14, 18])
+
+    summarize(stats, 'solver', stats.start_time)
+    assert ([event['event'] for event in sink] == ['record', 'record', 'record', 'summary'])
+    assert (sink[-1]['solver'] == 'solver' and sink[-1]['stats']['scores'] == [1.5])
+
+
+def test_disabled_stats():
+    # without a Stats object the hooks do nothing, a plain dict only gets the summary counters
+    for stats in [None, {}]:
+        with timer(stats, 'phase'):
+            record(stats, 'scores', 1)
+        sample_route(stats, np.arange(4), generate_scenario(4))
+        summarize(stats, 'solver', 0)
+        assert (stats is None or set(stats) == {'elapsed', 'moves_per_second'})
+
+
+def test_json_lines_sink(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    sink = JsonLinesSink(str(path))
+    stats = Stats(sink)
+    record(stats, 'scores', np.float32(2))
+    summarize(stats, 'solver', stats.start_time)
+    sink.close()
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert (events[0]['value'] == 2 and events[1]['event'] == 'summary')
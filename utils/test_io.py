@@ -0,0 +1,53 @@
+import os
+import numpy as np
+from .io import read_tsplib, write_tsplib, read_tour, write_tour, save_scenario, open_scenario, load_scenario
+from .distances import TsplibOracle
+from .utils import generate_scenario
+
+
+def test_tsplib(tmp_path):
+    # the coordinates, the header and the tour come back as written, nodes placed by their ids
+    path = str(tmp_path / 'small.tsp')
+    with open(path, 'w') as file:
+        file.write('NAME: small\nTYPE: TSP\nCOMMENT : three nodes\nDIMENSION: 3\nEDGE_WEIGHT_TYPE: EUC_2D\n'
+                   'NODE_COORD_SECTION\n2 3.5 4\n1 0 0\n 3   1e1 2 \nEOF\n')
+    scenario, header = read_tsplib(path)
+    assert (np.array_equal(scenario, [[0, 0], [3.5, 4], [10, 2]]))
+    assert (header['NAME'] == 'small' and header['DIMENSION'] == '3' and header['EDGE_WEIGHT_TYPE'] == 'EUC_2D')
+
+    scenario = generate_scenario(40)
+    write_tsplib(path, scenario)
+    assert (np.array_equal(read_tsplib(path)[0], scenario))
+    assert (np.array_equal(load_scenario(path), scenario))
+
+    route = np.random.permutation(40)
+    write_tour(str(tmp_path / 'small.tour'), route)
+    assert (np.array_equal(read_tour(str(tmp_path / 'small.tour')), route))
+
+
+def test_binary_scenario(tmp_path):
+    scenario = generate_scenario(100)
+    for dtype in [np.float64, np.float32]:
+        path = str(tmp_path / 'scenario.bin')
+        save_scenario(path, scenario, dtype)
+        opened = open_scenario(path)
+        assert (isinstance(opened, np.memmap) and opened.dtype == dtype and not opened.flags.writeable)
+        assert (np.array_equal(opened, scenario.astype(dtype)))
+        assert (os.path.getsize(path) == 64 + scenario.size * np.dtype(dtype).itemsize)
+        del opened
+    assert (np.array_equal(load_scenario(path), scenario.astype(np.float32)))
+
+
+def test_tsplib_distances():
+    # the rounding of each edge weight type
+    scenario = np.array([[0, 0], [3, 4.4], [10, 0]])
+    assert (TsplibOracle(scenario, 'EUC_2D')[0, 1] == 5)
+    assert (TsplibOracle(scenario, 'CEIL_2D')[0, 1] == 6)
+    # sqrt(100 / 10) = 3.16 rounds down to 3, which is below it, so 4
+    assert (TsplibOracle(scenario, 'ATT')[0, 2] == 4)
+
+    # a degree of longitude along the equator is about 111 km, 30 minutes about half of that
+    geo = np.array([[0, 0], [0, 1], [0, 0.3]])
+    oracle = TsplibOracle(geo, 'GEO')
+    assert (oracle[0, 1] == 112 and oracle[0, 2] == 56)
+    assert (np.array_equal(oracle[np.arange(3), np.arange(3)], [0, 0, 0]))
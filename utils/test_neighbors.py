@@ -0,0 +1,37 @@
+from .neighbors import get_neighbor_lists, get_brute_force_neighbor_lists
+from .utils import generate_scenario, calculate_journey_distance, get_node_distances, find_segment_flip, find_pop, apply_pop
+import numpy as np
+
+
+def test_get_neighbor_lists():
+    # the grid search finds the same distances as comparing all nodes, also with crowded areas
+    scenario = generate_scenario(500)
+    scenario[:200] /= 20
+
+    neighbors = get_neighbor_lists(scenario, 8)
+    expected_neighbors = get_brute_force_neighbor_lists(scenario, 8)
+
+    assert (neighbors.shape == (500, 8) and not (neighbors == np.arange(500)[:, None]).any())
+    assert (np.allclose(get_node_distances(scenario, np.arange(500)[:, None], neighbors),
+                        get_node_distances(scenario, np.arange(500)[:, None], expected_neighbors)))
+
+    # can't have more neighbors than other nodes
+    assert (get_neighbor_lists(generate_scenario(4), 10).shape == (4, 3))
+
+
+def test_moves_over_neighbors():
+    scenario = generate_scenario(100)
+    neighbors = get_neighbor_lists(scenario, 5)
+    route = np.random.permutation(100)
+    pre_distance = calculate_journey_distance(scenario[route])
+
+    for mode in ['first', 'best']:
+        i, j = find_segment_flip(route, mode=mode, scenario=scenario, neighbors=neighbors)
+        flipped = route.copy()
+        flipped[i + 1: j] = route[j - 1: i: -1]
+        assert (calculate_journey_distance(scenario[flipped]) < pre_distance)
+
+    pop_from, place_at = find_pop(route, scenario=scenario, neighbors=neighbors)
+    popped = route.copy()
+    apply_pop(popped, pop_from, place_at)
+    assert (calculate_journey_distance(scenario[popped]) < pre_distance)
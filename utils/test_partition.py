@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from .utils import generate_scenario
+from .partition import get_partition, get_hilbert_order
+
+
+def test_get_partition():
+    # every node is in exactly one cluster
+    scenario = generate_scenario(500)
+    for method in ['grid', 'kmeans', 'hilbert']:
+        clusters = get_partition(scenario, 50, method, seed=0)
+        assert (np.array_equal(np.sort(np.concatenate(clusters)), np.arange(500)))
+        assert (all(len(cluster) > 0 for cluster in clusters))
+
+    with pytest.raises(ValueError):
+        get_partition(scenario, 50, 'voronoi')
+
+
+def test_get_hilbert_order():
+    # the curve over a 4 x 4 grid visits the neighboring cells one after the other
+    scenario = np.array([[x, y] for x in range(4) for y in range(4)], dtype=float)
+    ordered = scenario[get_hilbert_order(scenario, bits=2)]
+    assert (np.all(np.abs(np.diff(ordered, axis=0)).sum(axis=1) == 1))
@@ -0,0 +1,81 @@
+import numpy as np
+from .tour import ArrayTour, TwoLevelTour, move_node
+from .utils import apply_pop, apply_segment_flip
+
+
+def get_cycle(route):
+    # the route from node 0 on, in the direction of its smaller neighbor, to compare cycles
+    route = np.roll(route, -list(route).index(0)).tolist()
+    return route if route[1] < route[-1] else [0] + route[:0:-1]
+
+
+def test_flip():
+    # every tour gives the same route as reversing the path by hand, small segments force rebuilds
+    rng = np.random.default_rng(0)
+    route = rng.permutation(30)
+    expected = route.tolist()
+    tours = [ArrayTour(route.copy()), TwoLevelTour(route), TwoLevelTour(route, segment_size=2)]
+
+    for a, b in rng.integers(30, size=(200, 2)).tolist():
+        start = expected.index(a)
+        path = [(start + offset) % 30 for offset in range((expected.index(b) - start) % 30 + 1)]
+        for position, node in zip(path, [expected[position] for position in path][::-1]):
+            expected[position] = node
+
+        for tour in tours:
+            tour.flip(a, b)
+            assert (list(np.roll(tour.sequence(), -list(tour.sequence()).index(0))) ==
+                    list(np.roll(expected, -expected.index(0))))
+
+    # queries follow the direction of the route, for single nodes and arrays
+    for tour in tours:
+        nodes = np.arange(30)
+        assert (tour.next(nodes).tolist() == [expected[(expected.index(node) + 1) % 30] for node in nodes])
+        assert (tour.prev(nodes).tolist() == [expected[expected.index(node) - 1] for node in nodes])
+        assert (tour.next(expected[-1]) == expected[0])
+        assert (tour.between(expected[3], expected[5], expected[8]))
+        assert (not tour.between(expected[3], expected[9], expected[8]))
+        assert (tour.between(expected[28], expected[1], expected[2]))
+
+
+def test_step_node():
+    # single node steps agree with the array queries, also once a flip turned the direction around
+    for tour in [ArrayTour(np.arange(10)), TwoLevelTour(np.arange(10), segment_size=3)]:
+        for a, b in [(0, 0), (2, 8), (7, 3)]:
+            tour.flip(a, b)
+            nodes = np.arange(10)
+            assert ([tour.step_node(node, True) for node in range(10)] == tour.next(nodes).tolist())
+            assert ([tour.step_node(node, False) for node in range(10)] == tour.prev(nodes).tolist())
+            assert ([tour.next(node) for node in range(10)] == tour.next(nodes).tolist())
+
+
+def test_move_node():
+    for tour in [ArrayTour(np.arange(10)), TwoLevelTour(np.arange(10), segment_size=3)]:
+        move_node(tour, 2, 6)
+        assert (get_cycle(tour.sequence()) == [0, 1, 3, 4, 5, 6, 2, 7, 8, 9])
+        move_node(tour, 8, 0)
+        assert (get_cycle(tour.sequence()) == [0, 8, 1, 3, 4, 5, 6, 2, 7, 9])
+
+
+def test_array_tour_moves():
+    # the route moves of utils give the same cycles on an ArrayTour, with up to date positions
+    rng = np.random.default_rng(1)
+    for _ in range(100):
+        route = rng.permutation(12)
+        tour = ArrayTour(route.copy())
+        segment_start = rng.integers(10)
+        segment_end = rng.integers(segment_start + 2, 13)
+        apply_segment_flip(route, segment_start, segment_end)
+        tour.apply_segment_flip(segment_start, segment_end)
+        assert (get_cycle(tour.route) == get_cycle(route))
+
+        # the tour's route may be the same cycle the other way around, start from the same one again
+        tour = ArrayTour(route.copy())
+        segment_length = rng.integers(1, 4)
+        pop_from = rng.integers(13 - segment_length)
+        place_at = rng.choice([position for position in range(13) if not pop_from <= position <= pop_from + segment_length])
+        apply_pop(route, pop_from, place_at, segment_length)
+        tour.apply_pop(pop_from, place_at, segment_length)
+
+        assert (get_cycle(tour.route) == get_cycle(route))
+        assert (np.array_equal(tour.positions[tour.route], np.arange(12)))
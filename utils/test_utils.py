@@ -1,4 +1,4 @@
-from .utils import calculate_journey_distance, xy_route_to_indices_route, generate_scenario, get_distance_matrix
+from .utils import calculate_journey_distance, generate_scenario, get_distance_matrix, find_segment_flip, find_pop, apply_pop
 import numpy as np
 
 
@@ -6,12 +6,23 @@ def test_calculate_journey_distance():
     assert (calculate_journey_distance(np.array([[0, 0], [4, -3], [8, 0]])) == 18)
 
 
-def test_xy_route_to_indices_route():
-    scenario = generate_scenario(10)
-    route = np.random.permutation(np.arange(10))
-    xy_route = scenario[route]
-    recreated_route = xy_route_to_indices_route(scenario, xy_route)
-    assert (np.array_equal(route, np.array(recreated_route)))
+def test_apply_pop():
+    # popping a node and inserting it before another one, same as list pop() and insert()
+    for pop_from, place_at in [(1, 5), (6, 2), (0, 7)]:
+        route = np.arange(8)
+        apply_pop(route, pop_from, place_at)
+
+        expected_route = list(range(8))
+        node = expected_route.pop(pop_from)
+        expected_route.insert(place_at if pop_from > place_at else place_at - 1, node)
+        assert (route.tolist() == expected_route)
+
+    # a segment is moved as a whole
+    route = np.arange(8)
+    apply_pop(route, 5, 1, segment_length=3)
+    assert (route.tolist() == [0, 5, 6, 7, 1, 2, 3, 4])
+    apply_pop(route, 1, 8, segment_length=3)
+    assert (route.tolist() == list(range(8)))
 
 
 def test_get_distance_matrix():
@@ -22,4 +33,94 @@ def test_get_distance_matrix():
                        [8, 5, 0, 5],
                        [5, 6, 5, 0]]
     distance_matrix = get_distance_matrix(scenario)
-    assert (np.allclose(distance_matrix, expected_result))
\ No newline at end of file
+    assert (np.allclose(distance_matrix, expected_result))
+
+def test_find_segment_flip():
+    scenario = generate_scenario(30)
+    pre_distance = calculate_journey_distance(scenario)
+
+    for mode in ['first', 'best', 'threshold']:
+        i, j = find_segment_flip(scenario, mode=mode)
+        assert (i is not None and i + 3 <= j <= len(scenario) and (i, j) != (0, len(scenario)))
+
+        flipped = scenario.copy()
+        flipped[i + 1: j] = scenario[j - 1: i: -1]
+        assert (calculate_journey_distance(flipped) < pre_distance)
+
+    # the best flip can't be beaten by any other flip
+    i, j = find_segment_flip(scenario, mode='best', block_size=4)
+    best = scenario.copy()
+    best[i + 1: j] = scenario[j - 1: i: -1]
+    for other_i, other_j in [(a, b) for a in range(29) for b in range(a + 3, 31) if (a, b) != (0, 30)]:
+        other = scenario.copy()
+        other[other_i + 1: other_j] = scenario[other_j - 1: other_i: -1]
+        assert (calculate_journey_distance(other) >= calculate_journey_distance(best) - 1e-9)
+
+
+def test_find_segment_flip_distance_matrix():
+    # an index route over a cached distance matrix gives the same gains as the coordinates route
+    scenario = generate_scenario(20)
+    route = np.random.permutation(20)
+    assert (find_segment_flip(route, mode='best', distance_matrix=get_distance_matrix(scenario)) ==
+            find_segment_flip(scenario[route], mode='best') ==
+            find_segment_flip(route, mode='best', scenario=scenario))
+
+    # no flip on a route that can't be improved
+    square = np.array([[0, 0], [0, 1], [1, 1], [1, 0]])
+    assert (find_segment_flip(square) == (None, None))
+
+
+def test_find_pop_indices_route():
+    # an indices route finds the same pops as the coordinates route, even when nodes share coordinates
+    scenario = generate_scenario(15)
+    scenario[7] = scenario[3]
+    route = np.random.permutation(15)
+
+    pop_from, place_at = find_pop(route, scenario=scenario)
+    popped = route.copy()
+    apply_pop(popped, pop_from, place_at)
+    assert (sorted(popped) == list(range(15)))
+    assert (calculate_journey_distance(scenario[popped]) < calculate_journey_distance(scenario[route]))
+
+
+def test_find_segment_flip_around_nodes():
+    # only flips removing an edge of the given node are checked, the best of them is found
+    scenario = generate_scenario(12)
+    route = np.random.permutation(12)
+    node = route[0]
+
+    i, j = find_segment_flip(route, threshold=np.inf, mode='best', scenario=scenario, nodes=[node])
+    assert (node in route[[i, i + 1, j - 1, j % 12]])
+
+    def flip_length(a, b):
+        flipped = route.copy()
+        flipped[a + 1: b] = route[b - 1: a: -1]
+        return calculate_journey_distance(scenario[flipped])
+
+    touching = [(a, b) for a in range(11) for b in range(a + 3, 13)
+                if (a, b) != (0, 12) and node in route[[a, a + 1, b - 1, b % 12]]]
+    assert (np.isclose(flip_length(i, j), min(flip_length(a, b) for a, b in touching)))
+
+
+def test_find_pop_segments():
+    # the best pop of each segment length can't be beaten by moving the segment anywhere else
+    scenario = generate_scenario(14)
+    route = np.random.permutation(14)
+    route_length = calculate_journey_distance(scenario[route])
+
+    def pop_length(a, b, segment_length):
+        popped = route.copy()
+        apply_pop(popped, a, b, segment_length)
+        return calculate_journey_distance(scenario[popped])
+
+    for segment_length in [1, 2, 3]:
+        i, j = find_pop(route, threshold=np.inf, mode='best', scenario=scenario, segment_length=segment_length, block_size=3)
+        legal = [(a, b) for a in range(15 - segment_length) for b in range(14)
+                 if (b - a) % 14 > segment_length and (segment_length > 1 or (b - a) % 14 not in (2, 13))]
+        assert ((i, j) in legal)
+        assert (np.isclose(pop_length(i, j, segment_length), min(pop_length(a, b, segment_length) for a, b in legal)))
+
+        # first and threshold mode only return pops below the threshold
+        for mode in ['first', 'threshold']:
+            i, j = find_pop(route, mode=mode, scenario=scenario, segment_length=segment_length)
+            assert (i is None or pop_length(i, j, segment_length) < route_length)
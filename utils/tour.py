@@ -0,0 +1,278 @@
+import numpy as np
+from .utils import get_positions
+
+
+# tour structures keep a route as a cycle of nodes, with fast queries and in place segment reversals.
+# both have the same interface:
+#     next(nodes), prev(nodes): the node after / before each of the given nodes (a node or an array of them)
+#     between(a, b, c): whether b is on the way from a forward to c, a and c included
+#     flip(a, b): reverse the path from a forward to b, so afterwards the route goes prev(a), b, ..., a, next(b)
+#     sequence(): the route as an array of nodes, starting anywhere
+# a flip may reverse the rest of the route instead of the path, which is the same cycle walked the other way
+# around, so the tours keep a direction flag that next, prev and between follow
+
+
+class ArrayTour:
+    # the route as an array with the position of each node, flips reverse the shorter of the path and
+    # the rest of the route, at most n / 2 nodes
+
+    # route: an array of node indices, it is kept and changed in place
+
+    def __init__(self, route):
+        self.route = route
+        self.positions = get_positions(route)
+        self.backwards = False
+
+    def __len__(self):
+        return len(self.route)
+
+    def step_node(self, node, forward):
+        # the neighbor of a single node along the route (forward) or against it, with python numbers as numpy
+        # is slow on those
+        step = 1 if forward != self.backwards else -1
+        return int(self.route[(int(self.positions[node]) + step) % len(self.route)])
+
+    def next(self, nodes):
+        if np.ndim(nodes) == 0:
+            return self.step_node(int(nodes), True)
+        return self.route[(self.positions[nodes] + (-1 if self.backwards else 1)) % len(self.route)]
+
+    def prev(self, nodes):
+        if np.ndim(nodes) == 0:
+            return self.step_node(int(nodes), False)
+        return self.route[(self.positions[nodes] + (1 if self.backwards else -1)) % len(self.route)]
+
+    def between(self, a, b, c):
+        if self.backwards:
+            a, c = c, a
+        position_a = self.positions[a]
+        return (self.positions[b] - position_a) % len(self.route) <= (self.positions[c] - position_a) % len(self.route)
+
+    def flip(self, a, b):
+        if self.backwards:
+            a, b = b, a
+        start, end = self.positions[a], self.positions[b]
+        length = (end - start) % len(self.route) + 1
+
+        # the path or the rest of the route, walking the other one backwards gives the same cycle
+        if 2 * length > len(self.route):
+            start, length = end + 1, len(self.route) - length
+            self.backwards = not self.backwards
+        self.reverse_positions(start, length)
+
+    def reverse_positions(self, start, length):
+        # reverse the length positions of the route from start on, wrapping around its end
+        route_len = len(self.route)
+        start %= route_len
+        if start + length <= route_len:
+            self.route[start: start + length] = self.route[start: start + length][::-1]
+            self.positions[self.route[start: start + length]] = np.arange(start, start + length)
+            return
+
+        # the part up to the end of the route and the part from its start, as slices
+        wrapped = start + length - route_len
+        nodes = np.concatenate([self.route[start:], self.route[:wrapped]])[::-1]
+        self.route[start:], self.route[:wrapped] = nodes[:route_len - start], nodes[route_len - start:]
+        self.positions[self.route[start:]] = np.arange(start, route_len)
+        self.positions[self.route[:wrapped]] = np.arange(wrapped)
+
+    def rotate_positions(self, start, length, shift):
+        # roll the length positions of the route from start on by shift, wrapping around its end
+        changed = np.arange(start, start + length) % len(self.route)
+        self.route[changed] = np.roll(self.route[changed], shift)
+        self.positions[self.route[changed]] = changed
+
+    def apply_segment_flip(self, segment_start, segment_end):
+        # utils.apply_segment_flip, reversing route[segment_start + 1: segment_end] or the rest of the route
+        length = segment_end - segment_start - 1
+        if 2 * length > len(self.route):
+            self.reverse_positions(segment_end, len(self.route) - length)
+        else:
+            self.reverse_positions(segment_start + 1, length)
+
+    def apply_pop(self, pop_from, place_at, segment_length=1):
+        # utils.apply_pop, moving the segment past the nodes between it and its new spot or, the other way
+        # around, past all the rest of the route
+        route_len = len(self.route)
+        if place_at > pop_from:
+            passed = place_at - pop_from - segment_length
+            if passed + segment_length <= route_len - passed:
+                self.rotate_positions(pop_from, passed + segment_length, -segment_length)
+            else:
+                self.rotate_positions(place_at, route_len - passed, segment_length)
+        else:
+            passed = pop_from - place_at
+            if passed + segment_length <= route_len - passed:
+                self.rotate_positions(place_at, passed + segment_length, segment_length)
+            else:
+                self.rotate_positions(pop_from, route_len - passed, -segment_length)
+
+    def sequence(self):
+        return self.route[::-1].copy() if self.backwards else self.route.copy()
+
+
+class TwoLevelTour:
+    # the route split into about sqrt(n) segments of consecutive nodes, each with a reversal bit and a rank
+    # in the order of the segments (as in LKH). a flip splits at most two segments at its ends and reverses
+    # the order of the segments in between, toggling their bits, so it costs O(sqrt(n)). the segments
+    # are rebuilt evenly once the splits double their amount
+
+    # route: an array of node indices, the tour keeps its own copy
+    # segment_size: the amount of nodes in each segment when (re)built, about sqrt(n) when not given
+
+    def __init__(self, route, segment_size=None):
+        num_nodes = len(route)
+        self.segment_size = segment_size or max(1, int(np.sqrt(num_nodes)))
+        self.capacity = 2 * (num_nodes // self.segment_size + 1) + 4
+        self.nodes = np.array(route)
+        self.indices = np.empty(num_nodes, dtype=np.int64)
+        self.segments = np.empty(num_nodes, dtype=np.int64)
+        self.starts = np.empty(self.capacity, dtype=np.int64)
+        self.ends = np.empty(self.capacity, dtype=np.int64)
+        self.reversed = np.zeros(self.capacity, dtype=bool)
+        self.ranks = np.empty(self.capacity, dtype=np.int64)
+        # the segments by rank are the start of a buffer with room for the new ones
+        self.buffer = np.empty(self.capacity, dtype=np.int64)
+        self.build(self.nodes)
+
+    def build(self, route):
+        # spread the route evenly over the segments, all in order and none reversed
+        num_nodes = len(route)
+        self.nodes[:] = route
+        self.indices[route] = np.arange(num_nodes)
+        self.starts[:] = 0
+        num_segments = (num_nodes + self.segment_size - 1) // self.segment_size
+        self.starts[:num_segments] = np.arange(num_segments) * self.segment_size
+        self.ends[:num_segments] = np.minimum(self.starts[:num_segments] + self.segment_size, num_nodes)
+        self.segments[route] = np.arange(num_nodes) // self.segment_size
+        self.reversed[:] = False
+        self.buffer[:num_segments] = np.arange(num_segments)
+        self.order = self.buffer[:num_segments]
+        self.ranks[:num_segments] = self.order
+        self.backwards = False
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def first(self, segments):
+        # the first node of each segment along the route
+        return self.nodes[np.where(self.reversed[segments], self.ends[segments] - 1, self.starts[segments])]
+
+    def last(self, segments):
+        return self.nodes[np.where(self.reversed[segments], self.starts[segments], self.ends[segments] - 1)]
+
+    def step(self, nodes, forward):
+        # the neighbor of each node along the route (forward) or against it, within its segment if it
+        # isn't at its end, else the closest end of the neighboring segment
+        if np.ndim(nodes) == 0:
+            return self.step_node(int(nodes), forward)
+        segments, indices = self.segments[nodes], self.indices[nodes]
+        direction = np.where(self.reversed[segments] != forward, 1, -1) * (-1 if self.backwards else 1)
+        neighbor_indices = indices + direction
+        inside = (neighbor_indices >= self.starts[segments]) & (neighbor_indices < self.ends[segments])
+
+        forward = forward != self.backwards
+        neighbor_segments = self.order[(self.ranks[segments] + (1 if forward else -1)) % len(self.order)]
+        crossing = self.first(neighbor_segments) if forward else self.last(neighbor_segments)
+        return np.where(inside, self.nodes[np.where(inside, neighbor_indices, 0)], crossing)
+
+    def step_node(self, node, forward):
+        # step for a single node, with python numbers as numpy is slow on those
+        segment, index = self.segments[node], self.indices[node]
+        forward = forward != self.backwards
+        index += 1 if forward != self.reversed[segment] else -1
+        if self.starts[segment] <= index < self.ends[segment]:
+            return int(self.nodes[index])
+        neighbor_segment = self.order[(self.ranks[segment] + (1 if forward else -1)) % len(self.order)]
+        if forward == self.reversed[neighbor_segment]:
+            return int(self.nodes[self.ends[neighbor_segment] - 1])
+        return int(self.nodes[self.starts[neighbor_segment]])
+
+    def next(self, nodes):
+        return self.step(nodes, True)
+
+    def prev(self, nodes):
+        return self.step(nodes, False)
+
+    def get_keys(self, nodes):
+        # numbers that increase along the route from the start of the segment of rank 0
+        segments, indices = self.segments[nodes], self.indices[nodes]
+        offsets = np.where(self.reversed[segments], self.ends[segments] - 1 - indices, indices - self.starts[segments])
+        return self.ranks[segments] * len(self.nodes) + offsets
+
+    def between(self, a, b, c):
+        if self.backwards:
+            a, c = c, a
+        key_a, key_b, key_c = self.get_keys(a), self.get_keys(b), self.get_keys(c)
+        span = len(self.order) * len(self.nodes)
+        return (key_b - key_a) % span <= (key_c - key_a) % span
+
+    def split_before(self, node):
+        # make the node the first of its segment along the (unflagged) route, the nodes before it in the
+        # segment become a segment of their own
+        segment, index = int(self.segments[node]), int(self.indices[node])
+        start, end, is_reversed = int(self.starts[segment]), int(self.ends[segment]), bool(self.reversed[segment])
+        if index == (end - 1 if is_reversed else start):
+            return
+
+        # the array ranges of the part before the node and the part from it on
+        boundary = index + 1 if is_reversed else index
+        earlier, later = ((boundary, end), (start, boundary)) if is_reversed else ((start, boundary), (boundary, end))
+
+        # the smaller part moves to a new segment, placed before or after the old one
+        new_segment = len(self.order)
+        new_is_earlier = earlier[1] - earlier[0] <= later[1] - later[0]
+        (self.starts[new_segment], self.ends[new_segment]), (self.starts[segment], self.ends[segment]) = \
+            (earlier, later) if new_is_earlier else (later, earlier)
+        self.reversed[new_segment] = is_reversed
+        self.segments[self.nodes[self.starts[new_segment]: self.ends[new_segment]]] = new_segment
+
+        # shift the later ranks by one to make room for the new segment
+        rank = int(self.ranks[segment]) + (0 if new_is_earlier else 1)
+        self.buffer[rank + 1: new_segment + 1] = self.buffer[rank: new_segment]
+        self.buffer[rank] = new_segment
+        self.order = self.buffer[:new_segment + 1]
+        self.ranks[self.order[rank:]] = np.arange(rank, len(self.order))
+
+    def flip(self, a, b):
+        if a == b:
+            return
+        # rebuild once there's no room left for the two splits of a flip
+        if len(self.order) + 2 > self.capacity:
+            self.build(self.sequence())
+        if self.backwards:
+            a, b = b, a
+
+        after_b = self.step(b, not self.backwards)
+        self.split_before(a)
+        self.split_before(after_b)
+
+        # the path is now made of whole segments, reverse it or the rest of the route if the path wraps
+        # around the order of the segments
+        low, high = int(self.ranks[self.segments[a]]), int(self.ranks[self.segments[b]])
+        if low > high:
+            low, high = high + 1, low - 1
+            self.backwards = not self.backwards
+        if low <= high:
+            segments = self.order[low: high + 1][::-1].copy()
+            self.order[low: high + 1] = segments
+            self.ranks[segments] = np.arange(low, high + 1)
+            self.reversed[segments] = ~self.reversed[segments]
+
+    def sequence_forward(self):
+        # the route along the segments' order, ignoring the direction flag
+        return np.concatenate([
+            self.nodes[self.starts[segment]: self.ends[segment]][::-1 if self.reversed[segment] else 1]
+            for segment in self.order
+        ])
+
+    def sequence(self):
+        route = self.sequence_forward()
+        return route[::-1].copy() if self.backwards else route
+
+
+def move_node(tour, node, after):
+    # move a node of a tour to right after another one, with two flips
+    following = tour.next(node)
+    tour.flip(node, after)
+    tour.flip(after, following)
@@ -1,5 +1,5 @@
+import time
 import numpy as np
-from datetime import datetime
 
 
 def generate_scenario(num_nodes, map_size=100):
@@ -10,69 +10,348 @@ def calculate_journey_distance(route_in_xy):
     return np.linalg.norm(route_in_xy - np.roll(route_in_xy, 1, axis=0), axis=1).sum()
 
 
-def time_stamp():
-    return datetime.now().timestamp() * 1000
+def calculate_journey_distances(routes_in_xy):
+    # calculate_journey_distance of many routes at once, routes_in_xy is shaped (num_routes, num_nodes, dimensions)
+    return np.linalg.norm(routes_in_xy - np.roll(routes_in_xy, 1, axis=1), axis=2).sum(axis=1)
 
 
-# translate route between coordinates to route between indices pointing to
-# these coordinates in the scenario
-def xy_route_to_indices_route(scenario, xy_route):
-    return [np.where((scenario == node).all(axis=1))[0][0] for node in xy_route]
+def time_stamp():
+    # milliseconds on a monotonic clock, only meaningful relative to other stamps
+    return time.monotonic() * 1000
 
 
 def random_arange(*args):
     return np.random.permutation(np.arange(*args))
 
 
-def find_segment_flip(route, threshold=0):
+def find_segment_flip(route, threshold=0, mode='first', scenario=None, distance_matrix=None, neighbors=None,
+                      nodes=None, positions=None, stats=None, block_size=None):
     # find a segment of the route to flip so the route length is shortened
+    # returns the endpoints (i, j) of the flip, route[i + 1: j] is the segment to reverse
 
     # threshold: any change in the route below that number is being accepted
+    # mode: 'first' - the first flip below the threshold, start positions are checked in random order
+    #       'best' - the flip that shortens the route the most, if it is below the threshold
+    #       'threshold' - a uniformly random flip out of all the flips below the threshold
+    # scenario: when given, the route holds indices into it instead of coordinates
+    # distance_matrix: cached distances between the nodes of the scenario, looked up by the indices
+    #                  of an indices route instead of computing them from the coordinates
+    # neighbors: candidate neighbor lists (see utils.get_neighbor_lists), when given only flips adding an
+    #            edge between a node and one of its candidates are checked. needs an indices route
+    # nodes: when given, only flips touching one of these nodes (of an indices route) are checked
+    # positions: the position of each node in an indices route (see get_positions), saves recomputing it
+    # stats: a dict to count the evaluated moves in, under 'moves_evaluated'
+    # block_size: the amount of start positions evaluated together, the memory used is about
+    #             block_size * len(route) floats
+    # when neighbors or nodes are given all the checked flips are evaluated at once, so 'first'
+    # picks like 'threshold'
+
+    if mode not in ('first', 'best', 'threshold'):
+        raise ValueError("mode should be one of 'first', 'best' or 'threshold', got {!r}".format(mode))
+
+    if neighbors is not None or nodes is not None:
+        if positions is None:
+            positions = get_positions(route)
+        if neighbors is not None:
+            starts, ends = get_candidate_segment_flips(route, neighbors, positions, nodes)
+        else:
+            starts, ends = get_touching_segment_flips(len(route), positions[nodes])
+        count(stats, 'moves_evaluated', len(starts))
+        gains = get_segment_flip_gains(route, starts, ends, scenario, distance_matrix)
+        return pick_move(starts, ends, gains, threshold, mode)
+
+    all_ends = np.arange(len(route) + 1)
+
+    def get_block_gains(starts):
+        count(stats, 'moves_evaluated', np.maximum(len(route) - starts - 2, 0).sum() - np.count_nonzero(starts == 0))
+        return get_segment_flip_gains(route, starts[:, None], all_ends, scenario, distance_matrix)
+
+    return search_start_blocks(np.arange(len(route) - 1), get_block_gains, len(route), threshold, mode, block_size)
+
+
+def search_start_blocks(starts, get_block_gains, route_len, threshold, mode, block_size=None):
+    # go over the start positions of a move a block at a time, get_block_gains(block) gives the gains
+    # of the moves of each start in the block against every end, shaped (len(block), num_ends).
+    # returns the picked (start, end) by the mode, same as in find_segment_flip, or (None, None)
+
+    best_move, best_gain, num_accepted = (None, None), np.inf, 0
+
+    for block in iterate_start_blocks(starts, route_len, mode, block_size):
+        gains = get_block_gains(block)
+
+        if mode == 'best':
+            row, j = np.unravel_index(np.argmin(gains), gains.shape)
+            if gains[row, j] < best_gain:
+                best_move, best_gain = (int(block[row]), int(j)), gains[row, j]
+            continue
+
+        accepted = gains < threshold
+
+        if mode == 'first':
+            # the first start position (in the random order) having any move below the threshold,
+            # and a random one of its moves, same as checking both i and j in random order
+            rows = np.flatnonzero(accepted.any(axis=1))
+            if rows.size > 0:
+                return int(block[rows[0]]), int(np.random.choice(np.flatnonzero(accepted[rows[0]])))
+            continue
+
+        # threshold mode, reservoir sampling over the blocks keeps the pick uniform
+        block_accepted = np.count_nonzero(accepted)
+        num_accepted += block_accepted
+        if block_accepted > 0 and np.random.random() * num_accepted < block_accepted:
+            rows, ends = np.nonzero(accepted)
+            pick = np.random.randint(block_accepted)
+            best_move = int(block[rows[pick]]), int(ends[pick])
+
+    if mode == 'best' and best_gain >= threshold:
+        return None, None
+    return best_move
+
+
+def get_segment_flip_gains(route, starts, ends, scenario=None, distance_matrix=None):
+    # change in route length for the flips (starts, ends), broadcast against each other.
+    # flips that aren't legal (end < start + 3, or flipping the whole route) get np.inf
+
+    route_len = len(route)
+
+    # positions of the nodes involved, the edges (n1, n2) and (n3, n4) are replaced by (n1, n3) and (n2, n4)
+    n1, n2, n3, n4 = starts, (starts + 1) % route_len, (ends - 1) % route_len, ends % route_len
+
+    # subtract the removed edges from the added ones, both pairs are summed before subtracting
+    # so the reverse flip gets the exact negative gain and local search can't cycle on rounding
+    gains = (get_position_distances(route, n1, n3, scenario, distance_matrix) +
+             get_position_distances(route, n2, n4, scenario, distance_matrix)) - \
+            (get_position_distances(route, n1, n2, scenario, distance_matrix) +
+             get_position_distances(route, n3, n4, scenario, distance_matrix))
+
+    gains[(ends < starts + 3) | ((starts == 0) & (ends == route_len))] = np.inf
+    return gains
+
+
+def get_candidate_segment_flips(route, neighbors, positions, nodes=None):
+    # the flips adding an edge between a node and one of its candidate neighbors, as flat
+    # arrays of starts and ends
+
+    # nodes: when given, only the candidate edges of these nodes are used
+
+    route_len = len(route)
+    nodes = route if nodes is None else np.asarray(nodes)
+    node_positions = np.repeat(positions[nodes], neighbors.shape[1])
+    neighbor_positions = positions[neighbors[nodes]].ravel()
+    low, high = np.minimum(node_positions, neighbor_positions), np.maximum(node_positions, neighbor_positions)
+
+    # the new edge either joins the first ends of the flip or its second ends, a flip starting
+    # before the route's start is the same as flipping the rest of the route
+    starts = np.concatenate((low, np.where(low == 0, high - 1, low - 1)))
+    ends = np.concatenate((high + 1, np.where(low == 0, route_len, high)))
+
+    legal = (ends >= starts + 3) & ~((starts == 0) & (ends == route_len))
+    return starts[legal], ends[legal]
+
+
+def get_touching_segment_flips(route_len, node_positions):
+    # all the flips removing an edge next to one of the given route positions, as flat
+    # arrays of starts and ends
+    node_positions = np.asarray(node_positions)
+    all_starts, all_ends = np.arange(route_len - 1), np.arange(route_len + 1)
+
+    # the position can be either end of the first removed edge, or either end of the second one
+    # (the edge closing the route is only reachable as the second one, ending at route_len)
+    rows = np.concatenate((node_positions, node_positions - 1))
+    rows = rows[(rows >= 0) & (rows < route_len - 1)]
+    columns = np.concatenate((node_positions, node_positions + 1, np.where(node_positions == 0, route_len, -1)))
+    columns = columns[columns >= 0]
+
+    starts = np.concatenate((np.repeat(rows, len(all_ends)), np.tile(all_starts, len(columns))))
+    ends = np.concatenate((np.tile(all_ends, len(rows)), np.repeat(columns, len(all_starts))))
+
+    legal = (ends >= starts + 3) & ~((starts == 0) & (ends == route_len))
+    return starts[legal], ends[legal]
+
+
+def pick_move(starts, ends, gains, threshold, mode):
+    # pick one of the evaluated moves, the best one or a random one below the threshold
+    if mode == 'best':
+        if gains.size == 0 or gains.min() >= threshold:
+            return None, None
+        best = np.argmin(gains)
+        return int(starts[best]), int(ends[best])
+
+    accepted = np.flatnonzero(gains < threshold)
+    if accepted.size == 0:
+        return None, None
+    pick = np.random.choice(accepted)
+    return int(starts[pick]), int(ends[pick])
+
+
+def get_positions(route):
+    # the position of each node in an indices route
+    positions = np.empty(len(route), dtype=np.int64)
+    positions[route] = np.arange(len(route))
+    return positions
+
+
+def count(stats, key, amount=1):
+    # add to a counter of a stats dict, if the caller asked for one
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + int(amount)
+
+
+def iterate_start_blocks(starts, route_len, mode, block_size=None):
+    # split the start positions of a move search into blocks that are evaluated together.
+    # the first-improvement mode goes over them in random order with growing blocks, so a
+    # move found early is cheap while a full scan still runs at block speed
+
+    max_block = block_size or max(1, 2 ** 18 // max(route_len, 1))
+    starts = np.random.permutation(starts) if mode == 'first' else np.asarray(starts)
+    block = 1 if mode == 'first' else max_block
+
+    position = 0
+    while position < len(starts):
+        yield starts[position: position + block]
+        position += block
+        block = min(block * 2, max_block)
+
+
+def get_position_distances(route, positions_a, positions_b, scenario=None, distance_matrix=None):
+    # distances between the nodes at the given route positions (broadcast against each other)
+    # a route of coordinates is used as is, an indices route looks its nodes up in the
+    # distance matrix or the scenario
+    if distance_matrix is not None:
+        return distance_matrix[route[positions_a], route[positions_b]]
+    if scenario is None:
+        return get_node_distances(route, positions_a, positions_b)
+    return get_node_distances(scenario, route[positions_a], route[positions_b])
+
 
-    for i in random_arange(len(route) - 1):
-        for j in random_arange(i + 3, len(route) + 1):
-            # indices of the nodes involved
-            n1, n2, n3, n4 = np.array([i, i + 1, j - 1, j]) % len(route)
+def get_node_distances(scenario, nodes_a, nodes_b):
+    # distances between the given nodes of the scenario (broadcast against each other)
 
-            # calculate the magnitudes of both the newly formed edges and the edges removed by the segment_flip
-            matrix = route[[n1, n2, n1, n3]] - route[[n3, n4, n2, n4]]
-            magnitudes = np.linalg.norm(matrix, axis=1)
+    # one coordinate axis at a time, much faster than a norm over a trailing axis of size 2
+    squared = 0
+    for axis in range(scenario.shape[1]):
+        deltas = scenario[nodes_a, axis] - scenario[nodes_b, axis]
+        squared = squared + deltas * deltas
+    return np.sqrt(squared)
 
-            # subtract the removed edges from the added ones
-            distance_change = (magnitudes[:2] - magnitudes[2:]).sum()
 
-            # annoying conditioning since np.linalg isn't 100% precise..
-            # can give different results for same spots depending on order
-            if distance_change < threshold and (i != 0 or j != len(route)):
-                return i, j
-    return None, None
+def get_edge_lengths(route, scenario=None, distance_matrix=None):
+    # length of each edge of the route, edge i goes from route[i] to route[i + 1]
+    positions = np.arange(len(route))
+    return get_position_distances(route, positions, (positions + 1) % len(route), scenario, distance_matrix)
 
 
-def find_pop(route, threshold=0):
-    # find a node that is better off at a different location in the route
+def apply_segment_flip(route, segment_start, segment_end):
+    # reverse the segment between the two endpoints found by find_segment_flip, in place
+    route[segment_start + 1: segment_end] = route[segment_end - 1: segment_start: -1]
+
+
+def apply_pop(route, pop_from, place_at, segment_length=1):
+    # move the node (or segment) found by find_pop to its new spot, in place
+    # simulating a python list pop() and insert() using math
+    segment_end = pop_from + segment_length
+    if pop_from > place_at:
+        route[place_at:segment_end] = route[np.r_[pop_from:segment_end, place_at:pop_from]]
+    else:
+        route[pop_from:place_at] = route[np.r_[segment_end:place_at, pop_from:segment_end]]
+
+
+def find_pop(route, threshold=0, mode='first', scenario=None, distance_matrix=None, neighbors=None, nodes=None,
+             positions=None, stats=None, segment_length=1, block_size=None):
+    # find a node, or a segment of a few consecutive nodes (or-opt), that is better off at a different
+    # location in the route. returns (i, j), route[i: i + segment_length] is moved to right before route[j]
     # *** pops that can be represented as a segment flip are excluded (example: 1 to 3)
 
-    # threshold: any change in the route below that number is being accepted
+    # threshold, mode, block_size: same as in find_segment_flip
+    # scenario, distance_matrix: for a route of indices, same as in find_segment_flip
+    # neighbors: candidate neighbor lists, when given a segment is only placed right before or after a
+    #            candidate of one of its ends. needs an indices route
+    # nodes, positions, stats: same as in find_segment_flip, nodes are the ones allowed to be popped
+    # segment_length: the amount of consecutive nodes moved together, segments don't wrap around the route's end
+
+    if mode not in ('first', 'best', 'threshold'):
+        raise ValueError("mode should be one of 'first', 'best' or 'threshold', got {!r}".format(mode))
+
+    route_len = len(route)
+    starts = np.arange(max(route_len - segment_length + 1, 0))
+
+    if neighbors is not None or nodes is not None:
+        if positions is None:
+            positions = get_positions(route)
+        if nodes is not None:
+            # the segments holding any of the nodes
+            starts = np.unique((positions[nodes][:, None] - np.arange(segment_length)).ravel())
+            starts = starts[(starts >= 0) & (starts <= route_len - segment_length)]
+
+    if neighbors is not None:
+        starts, ends = get_candidate_pops(route, neighbors, positions, starts, segment_length)
+        count(stats, 'moves_evaluated', len(starts))
+        gains = get_pop_gains(route, starts, ends, segment_length, scenario, distance_matrix)
+        return pick_move(starts, ends, gains, threshold, mode)
+
+    all_ends = np.arange(route_len)
+
+    def get_block_gains(block):
+        count(stats, 'moves_evaluated', len(block) * max(route_len - segment_length - (3 if segment_length == 1 else 1), 0))
+        return get_pop_gains(route, block[:, None], all_ends, segment_length, scenario, distance_matrix)
 
-    for i in random_arange(len(route)):
-        # a list of available spots, removing the identity pop and pops that
-        # are identical to segment flips.
-        available_spots = np.random.permutation([x for x in range(len(route)) if 1 < (i - x) % len(route) < len(route) - 2])
+    return search_start_blocks(starts, get_block_gains, route_len, threshold, mode, block_size)
 
-        for j in available_spots:
-            # indices of the nodes involved, n0 is the popped one
-            n0, n1, n2, n3, n4 = np.array([i, i - 1, i + 1, j - 1, j]) % len(route)
 
-            # calculate the magnitudes of both the newly formed edges and the edges removed by the pop
-            matrix = route[[n1, n3, n4, n3, n1, n2]] - route[[n2, n0, n0, n4, n0, n0]]
-            magnitudes = np.linalg.norm(matrix, axis=1)
+def get_pop_gains(route, starts, ends, segment_length=1, scenario=None, distance_matrix=None):
+    # change in route length for moving the segments starting at starts to right before ends, broadcast
+    # against each other. pops that change nothing or are the same as a segment flip get np.inf
 
-            # subtract the removed edges from the added ones
-            distance_change = (magnitudes[:3] - magnitudes[3:]).sum()
+    route_len = len(route)
 
-            if distance_change < threshold:
-                return i, j
-    return None, None
+    # positions of the nodes involved, the segment (first .. last) is taken out from between prev and next
+    # and put between before and after
+    first, last = starts, starts + segment_length - 1
+    prev, next_ = (starts - 1) % route_len, (starts + segment_length) % route_len
+    before, after = (ends - 1) % route_len, ends % route_len
+
+    def distances(positions_a, positions_b):
+        return get_position_distances(route, positions_a, positions_b, scenario, distance_matrix)
+
+    # the removal gain is computed once per segment and broadcast over all the spots. each side is summed
+    # in sorted order so the reverse pop gets the exact negative gain and local search can't cycle on rounding
+    gains = sorted_sum(distances(prev, next_), distances(before, first), distances(last, after)) - \
+        sorted_sum(distances(prev, first), distances(last, next_), distances(before, after))
+
+    # spots inside the segment or right around it leave the route as is, and moving a single node
+    # past one of its neighbors is a flip of two nodes
+    offsets = (ends - starts) % route_len
+    excluded = offsets <= segment_length
+    if segment_length == 1:
+        excluded = excluded | (offsets == 2) | (offsets == route_len - 1)
+    return np.where(excluded, np.inf, gains)
+
+
+def sorted_sum(a, b, c):
+    # a + b + c added from the smallest to the largest, so the result doesn't depend on the order of the arguments
+    low, high = np.minimum(a, b), np.maximum(a, b)
+    middle = np.maximum(low, np.minimum(high, c))
+    return (np.minimum(low, c) + middle) + np.maximum(high, c)
+
+
+def get_candidate_pops(route, neighbors, positions, starts, segment_length=1):
+    # the pops of the segments at starts placing one of their ends next to one of its candidate neighbors,
+    # as flat arrays of starts and ends
+    route_len = len(route)
+    num_neighbors = neighbors.shape[1]
+
+    # the first node goes right after a candidate, or the last node right before one
+    first_spots = positions[neighbors[route[starts]]] + 1
+    last_spots = positions[neighbors[route[starts + segment_length - 1]]]
+
+    pop_starts = np.repeat(starts, 2 * num_neighbors)
+    pop_ends = np.concatenate((first_spots, last_spots), axis=1).ravel() % route_len
+
+    offsets = (pop_ends - pop_starts) % route_len
+    legal = offsets > segment_length
+    if segment_length == 1:
+        legal &= (offsets != 2) & (offsets != route_len - 1)
+    return pop_starts[legal], pop_ends[legal]
 
 
 def get_average_edge_length(scenario, num_samples=5):
@@ -85,8 +364,19 @@ def get_average_edge_length(scenario, num_samples=5):
     ) / scenario.shape[0]
 
 
-def get_distance_matrix(scenario):
-    # figure the distance between each two nodes in the scenario
-    return np.linalg.norm(scenario[:, :] - scenario[:, None], axis=2)
+def get_distance_matrix(scenario, dtype=np.float64, block_size=None):
+    # figure the distance between each two nodes in the scenario, a block of rows at a time
+    # so no temporary bigger than a block is needed
+    num_nodes = scenario.shape[0]
+    matrix = np.empty((num_nodes, num_nodes), dtype=dtype)
+    block_size = block_size or get_block_size(num_nodes)
+
+    for start in range(0, num_nodes, block_size):
+        rows = np.arange(start, min(start + block_size, num_nodes))
+        matrix[rows] = get_node_distances(scenario, rows[:, None], np.arange(num_nodes))
+    return matrix
 
 
+def get_block_size(num_nodes):
+    # rows per block when building distances, about 2 ** 20 distances each
+    return max(1, 2 ** 20 // max(num_nodes, 1))